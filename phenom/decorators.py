@@ -1,5 +1,6 @@
-from functools import reduce, partial
-from collections import Hashable
+from functools import reduce, partial, wraps
+from collections.abc import Hashable
+import inspect
 
 class memoized(object):
     '''Decorator. Caches a function's return value each time it is called.
@@ -28,3 +29,40 @@ class memoized(object):
     def __get__(self, obj, objtype):
         '''Support instance methods.'''
         return partial(self.__call__, obj)
+
+
+def cached_score(symmetric=False):
+    '''Decorator for methods scoring profile_a against profile_b, eg
+    SemanticSim.phenodigm_compare.  If the instance has a score_cache
+    (see phenom.utils.cache.ScoreCache) the score is looked up by the
+    encoded profiles and the remaining arguments before computing it.
+
+    symmetric is True if the score does not depend on the order of the
+    profiles, or the name of a boolean argument that makes it so
+    '''
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        def wrapper(self, profile_a, profile_b, *args, **kwargs):
+            score_cache = getattr(self, 'score_cache', None)
+            if score_cache is None:
+                return method(self, profile_a, profile_b, *args, **kwargs)
+            # profiles may be generators, which can only be read once
+            profile_a, profile_b = list(profile_a), list(profile_b)
+            arguments = signature.bind(self, profile_a, profile_b, *args, **kwargs)
+            arguments.apply_defaults()
+            params = tuple(list(arguments.arguments.items())[3:])
+            is_symmetric = symmetric if isinstance(symmetric, bool) \
+                else arguments.arguments[symmetric]
+            key = score_cache.make_key(
+                method.__name__,
+                score_cache.profile_key(profile_a, self.term_index),
+                score_cache.profile_key(profile_b, self.term_index),
+                params,
+                is_symmetric)
+            return score_cache.get_or_compute(
+                key, lambda: method(self, profile_a, profile_b, *args, **kwargs))
+
+        return wrapper
+    return decorator
@@ -1,13 +1,16 @@
-from phenom.similarity.semantic_sim import SemanticSim
-from phenom.similarity.semantic_dist import SemanticDist
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_dist import CorpusDist
+from phenom.similarity.semantic_dist import PairwiseDist
+from phenom.utils.pool import SharedArrays, stream_workers, with_prefix
 import argparse
 import logging
 import csv
 from rdflib import Graph
-from typing import Dict, List, Tuple, Any
-from itertools import combinations
+from scipy import sparse
+from typing import Callable, Dict, List, Optional, Sequence, Union
 import multiprocessing
-from multiprocessing import Process, Queue
+import numpy as np
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,10 +29,26 @@ def main():
     parser.add_argument('--processes', '-p', type=int, required=False,
                     default=int(multiprocessing.cpu_count()/2),
                     help='Number of processes to spawn')
+    parser.add_argument('--distance', '-dist', type=str, required=False,
+                        default='jin_conrath',
+                        choices=['jin_conrath', 'euclidean', 'groupwise_euclidean'],
+                        help='Matrix wise jin conrath or euclidean distance, '
+                             'or groupwise euclidean distance')
+    parser.add_argument('--neighbors', '-k', type=int, required=False,
+                        help='Only output the k nearest neighbours of each disease '
+                             'as a sparse graph (.npz) instead of the dense matrix')
+    parser.add_argument('--radius', '-r', type=float, required=False,
+                        help='Only output neighbours within this distance '
+                             'as a sparse graph (.npz) instead of the dense matrix')
     parser.add_argument('--output', '-o', type=str, required=False,
-                        help='Location of output file', default="./matrix.csv")
+                        help='Location of output file, defaults to ./matrix.csv, '
+                             'or ./neighbors.npz with --neighbors/--radius '
+                             '(numpy appends .npz to other names)')
 
     args = parser.parse_args()
+    is_graph = args.neighbors is not None or args.radius is not None
+    if args.output is None:
+        args.output = "./neighbors.npz" if is_graph else "./matrix.csv"
 
     root = "HP:0000118"
     hpo = Graph()
@@ -38,23 +57,10 @@ def main():
     # I/O
     disease_fh = open(args.diseases, 'r')
     ic_fh = open(args.ic_cache, 'r')
-    output = open(args.output, 'w')
-    csv_writer = csv.writer(output, delimiter=',')
     diseases = disease_fh.read().splitlines()
 
-    dist_matrix = [[0 for k in range(len(diseases))] for i in range(len(diseases))]
     ic_map: Dict[str, float] = {}
     disease2phen: Dict[str, List[str]] = {}
-    disease_map: Dict[str, int] = {}
-
-    # create dictionary of diseases and their index
-    index = 0
-    for disease in diseases:
-        disease_map[disease] = index
-        index += 1
-
-    # Create list of combinations of diseases
-    disease_combos = list(combinations(diseases, 2))
 
     for line in ic_fh.readlines():
         hpo_id, ic = line.rstrip("\n").split("\t")
@@ -70,63 +76,159 @@ def main():
             else:
                 disease2phen[mondo_id] = [phenotype_id]
 
-    procs = []
-    queue = Queue()  # create a queue object
-    result_list = []
-    #result_dict = {}
-
-    # Split into chunks depending on args.processes
-    for chunk in [disease_combos[i::args.processes] for i in range(args.processes)]:
-        proc = Process(target=get_resnik_sim,
-                       args=(chunk, disease2phen,hpo, root, ic_map, disease_map, queue))
-        proc.start()
-        procs.append(proc)
-
-    for i in range(args.processes):
-        result_list.extend(queue.get())
-
-    for proc in procs:
-        proc.join()
-
-    for dis_a_index, dis_b_index, score in result_list:
-        dist_matrix[dis_a_index][dis_b_index] = score
-        dist_matrix[dis_b_index][dis_a_index] = score
-
-    for row in dist_matrix:
-        csv_writer.writerow(row)
-
-
-def get_resnik_sim(combos, disease2phen, graph, root, ic_map, coordinates, queue):
-    #sem_sim = SemanticSim(graph, root, ic_map)
-    sem_dist = SemanticDist(graph, root, ic_map)
-    result_list: List[Tuple[int,int,Any]] = []
-    #result_dict = {}
-    for index, combo in enumerate(combos):
-        disease_a, disease_b = combo
-        disease_a_profile = disease2phen[disease_a]
-        disease_b_profile = disease2phen[disease_b]
-        #score = 1 - sem_sim.resnik_sim(
-        #    disease_a_profile, disease_b_profile, is_normalized=True, is_symmetric=True)
-        #score = 1 - sem_sim.cosine_sim(
-        #    disease_a_profile, disease_b_profile, ic_weighted=True)
-        score = sem_dist.euclidean_matrix(disease_a_profile, disease_b_profile, distance_measure='jin_conrath')
-        if score == 1 or score == 0:
-            result_list.append(
-                (coordinates[disease_a], coordinates[disease_b], int(score)))
-            #result_dict[
-            #    (coordinates[disease_a],coordinates[disease_b])
-            #] = int(score)
-        else:
-            result_list.append(
-                (coordinates[disease_a], coordinates[disease_b], "{:.4f}".format(score)))
-            #result_dict[
-            #    (coordinates[disease_a], coordinates[disease_b])
-            #] = "{:.4f}".format(score)
-
-        if index % 100000 == 0:
-            logger.info("Processed {} combinations out of {}".format(index, len(combos)))
-
-    queue.put(result_list)
+    logger.info("Building closure index")
+    closure_index = ClosureIndex.from_graph(
+        hpo, root, ic_map,
+        terms={pheno for disease in diseases for pheno in disease2phen[disease]})
+    corpus = ProfileCorpus(
+        closure_index, {disease: disease2phen[disease] for disease in diseases})
+
+    corpus_dist = CorpusDist(corpus)
+    distance_measure = None if args.distance == 'groupwise_euclidean' else args.distance
+
+    if is_graph:
+        graph = get_neighbor_graph(
+            corpus_dist, distance_measure, args.neighbors, args.radius, args.processes)
+        logger.info("{} neighbours of {} diseases".format(graph.nnz, len(diseases)))
+        sparse.save_npz(args.output, graph)
+        return
+
+    if args.distance == 'groupwise_euclidean':
+        # a single sparse product, no need for workers
+        distances = corpus_dist.euclidean_distances()
+    else:
+        logger.info("Computing {} distances between {} terms".format(
+            args.distance, len(corpus_dist.vocabulary)))
+        table = corpus_dist.distance_table(args.distance)
+
+        # Workers get handles to the index, corpus and distance table in
+        # shared memory and stream back blocks of consecutive rows of the
+        # condensed (upper triangle) distance matrix
+        distances = np.zeros(len(diseases) * (len(diseases) - 1) // 2)
+        processed = 0
+        with SharedArrays({
+            **with_prefix('index', closure_index.to_arrays()),
+            **with_prefix('corpus', corpus.to_arrays()),
+            'table': table
+        }) as shared_arrays:
+            # Split blocks into chunks depending on args.processes,
+            # the last row of the square matrix has nothing after it
+            blocks = row_blocks(len(diseases) - 1)
+            for offset, block in stream_workers(
+                    get_matrix_distances,
+                    [blocks[i::args.processes] for i in range(args.processes)],
+                    shared_arrays, (args.distance,)):
+                distances[offset:offset + len(block)] = block
+                processed += 1
+                logger.info("Processed {} blocks out of {}".format(processed, len(blocks)))
+
+    output = open(args.output, 'w')
+    csv_writer = csv.writer(output, delimiter=',')
+    for index in range(len(diseases)):
+        csv_writer.writerow([
+            int(score) if score == 1 or score == 0 else "{:.4f}".format(score)
+            for score in condensed_row(distances, index, len(diseases))
+        ])
+
+
+def get_neighbor_graph(
+        corpus_dist: CorpusDist,
+        distance_measure: Union[str, None],
+        k: Union[int, None],
+        radius: Union[float, None],
+        processes: int) -> sparse.csr_matrix:
+    """
+    CorpusDist.neighbor_graph with contiguous blocks of rows
+    spread over processes, stacked in order
+    """
+    size = len(corpus_dist.corpus)
+    if processes == 1:
+        return corpus_dist.neighbor_graph(distance_measure, k, radius)
+
+    arrays = {
+        **with_prefix('index', corpus_dist.closure_index.to_arrays()),
+        **with_prefix('corpus', corpus_dist.corpus.to_arrays())
+    }
+    if distance_measure is not None:
+        arrays['table'] = corpus_dist.distance_table(distance_measure)
+    blocks = {}
+    with SharedArrays(arrays) as shared_arrays:
+        chunks = [rows for rows in np.array_split(np.arange(size), processes) if len(rows)]
+        for start, block in stream_workers(
+                get_neighbors, chunks, shared_arrays, (distance_measure, k, radius)):
+            blocks[start] = block
+    return sparse.vstack([blocks[start] for start in sorted(blocks)], format='csr')
+
+
+def get_neighbors(
+        arrays: SharedArrays,
+        rows: np.ndarray,
+        emit: Callable,
+        distance: Union[str, None],
+        k: Union[int, None],
+        radius: Union[float, None]) -> None:
+    """
+    pool.stream_workers target, computes the neighbours of a contiguous
+    block of diseases, emitting (first row, rows of the neighbour graph)
+    """
+    closure_index = ClosureIndex.from_arrays(arrays.group('index'))
+    tables = {PairwiseDist(distance): arrays['table']} if distance is not None else None
+    corpus_dist = CorpusDist(
+        ProfileCorpus.from_arrays(closure_index, arrays.group('corpus')), tables)
+    graph = corpus_dist.neighbor_graph(distance, k, radius, rows=rows)
+    emit((int(rows[0]), graph[rows[0]:rows[-1] + 1]))
+
+
+def condensed_offset(
+        index: Union[int, np.ndarray],
+        size: int) -> Union[int, np.ndarray]:
+    """
+    Offset of (index, index + 1) in a condensed distance matrix,
+    see scipy.spatial.distance.squareform
+    """
+    return index * size - index * (index + 1) // 2
+
+
+def condensed_row(distances: np.ndarray, index: int, size: int) -> np.ndarray:
+    """
+    Row of the square distance matrix from a condensed distance matrix
+    """
+    row = np.zeros(size)
+    lower = np.arange(index)
+    row[:index] = distances[condensed_offset(lower, size) + index - lower - 1]
+    offset = condensed_offset(index, size)
+    row[index + 1:] = distances[offset:offset + size - index - 1]
+    return row
+
+
+def row_blocks(num_rows: int, block_size: Optional[int] = 100) -> List[range]:
+    """
+    Consecutive rows in blocks of block_size, the rows of a block are
+    contiguous in a condensed distance matrix
+    """
+    return [range(start, min(start + block_size, num_rows))
+            for start in range(0, num_rows, block_size)]
+
+
+def get_matrix_distances(
+        arrays: SharedArrays,
+        blocks: Sequence[range],
+        emit: Callable,
+        distance: str) -> None:
+    """
+    pool.stream_workers target, computes the matrix wise distance of each
+    disease in each block of rows (see row_blocks) against the diseases
+    after it from the shared distance table, emitting (offset, distances)
+    for each block of rows of the condensed matrix
+    """
+    closure_index = ClosureIndex.from_arrays(arrays.group('index'))
+    corpus_dist = CorpusDist(
+        ProfileCorpus.from_arrays(closure_index, arrays.group('corpus')),
+        {PairwiseDist(distance): arrays['table']})
+    size = len(corpus_dist.corpus)
+    for rows in blocks:
+        emit((condensed_offset(rows.start, size), np.concatenate(
+            [corpus_dist.euclidean_matrix_row(index, distance) for index in rows])))
 
 
 if __name__ == "__main__":
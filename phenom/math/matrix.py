@@ -1,73 +1,117 @@
-from typing import Union, Sequence, List
-from phenom.math import math_utils
-from itertools import chain
+from typing import Union, Sequence, NamedTuple
+import numpy as np
+
+
+"""
+Scores over pairwise similarity matrices
+
+Matrices can be a list of lists or a 2-D numpy array, in which case
+a float is returned, or a 3-D numpy array of matrices with the same
+shape, in which case an array with a score per matrix is returned
+"""
 
 
 # Union types
 Num = Union[int, float]
+Matrix = Union[Sequence[Sequence[Num]], np.ndarray]
+Score = Union[float, np.ndarray]
+
+
+class MatrixSummary(NamedTuple):
+    max: Score
+    bma: Score
+    sym_bma: Score
+    avg: Score
+    best_min_avg: Score
+
 
+def _as_array(matrix: Matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim not in (2, 3):
+        raise ValueError("Expected a matrix or a stack of matrices, "
+                         "got {} dimensions".format(matrix.ndim))
+    return matrix
 
-def flip_matrix(matrix: Sequence[Sequence]) -> List[List]:
+
+def _as_score(score: np.ndarray) -> Score:
+    return float(score) if np.ndim(score) == 0 else score
+
+
+def summarize(matrix: Matrix) -> MatrixSummary:
     """
-    swap rows and columns in a list of lists
+    max, bma, symmetric bma, average and best min average scores,
+    sharing the row and column reductions
     """
-    column_len = len(matrix)
-    row_len = len(matrix[0])  # assumes all rows same length
-    flipped_matrix = [[0 for x in range(column_len)] for y in range(row_len)]
-    for row_index, row in enumerate(matrix):
-        for col_index, cell in enumerate(row):
-            flipped_matrix[col_index][row_index] = cell
-    return flipped_matrix
+    matrix = _as_array(matrix)
+    row_max = matrix.max(axis=-1)
+    col_max = matrix.max(axis=-2)
+    num_rows, num_cols = matrix.shape[-2:]
+    return MatrixSummary(
+        max=_as_score(row_max.max(axis=-1)),
+        bma=_as_score(row_max.mean(axis=-1)),
+        sym_bma=_as_score(
+            (row_max.sum(axis=-1) + col_max.sum(axis=-1)) / (num_rows + num_cols)),
+        avg=_as_score(matrix.mean(axis=(-2, -1))),
+        best_min_avg=_as_score(matrix.min(axis=-1).mean(axis=-1))
+    )
+
+
+def flip_matrix(matrix: Matrix) -> np.ndarray:
+    """
+    swap rows and columns
+    """
+    return np.swapaxes(_as_array(matrix), -1, -2)
 
 
-def sym_bma_score(matrix: Sequence[Sequence[Num]]) -> float:
+def sym_bma_score(matrix: Matrix) -> Score:
     """
     symmetric best max average score
     """
-    forwards = [max(row) for row in matrix]
-    flipped = flip_matrix(matrix)
-    backwards = [max(row) for row in flipped]
-    combined_maxes = forwards + backwards
-    return mean(combined_maxes)
+    matrix = _as_array(matrix)
+    num_rows, num_cols = matrix.shape[-2:]
+    return _as_score(
+        (matrix.max(axis=-1).sum(axis=-1) + matrix.max(axis=-2).sum(axis=-1))
+        / (num_rows + num_cols))
 
 
-def max_score(matrix: Sequence[Sequence[Num]]) -> float:
-    return max(list(chain.from_iterable(matrix)))
+def max_score(matrix: Matrix) -> Score:
+    return _as_score(_as_array(matrix).max(axis=(-2, -1)))
 
 
-def bma_score(matrix: Sequence[Sequence[Num]]) -> float:
+def bma_score(matrix: Matrix) -> Score:
     """
     best max average score
     """
-    return math_utils.mean([max(row) for row in matrix])
+    return _as_score(_as_array(matrix).max(axis=-1).mean(axis=-1))
+
 
-def best_min_avg(matrix: Sequence[Sequence[Num]]) -> float:
+def best_min_avg(matrix: Matrix) -> Score:
     """
     best min average score
     """
-    return math_utils.mean([min(row) for row in matrix])
+    return _as_score(_as_array(matrix).min(axis=-1).mean(axis=-1))
 
 
-def avg_score(matrix: Sequence[Sequence[Num]]) -> float:
+def avg_score(matrix: Matrix) -> Score:
     """
     average of every value in the matrix
     """
-    return math_utils.mean(list(chain.from_iterable(matrix)))
+    return _as_score(_as_array(matrix).mean(axis=(-2, -1)))
 
 
 def max_percentage_score(
-        query_matrix: Sequence[Sequence[Num]],
-        optimal_matrix: Sequence[Sequence[float]]) -> float:
+        query_matrix: Matrix,
+        optimal_matrix: Matrix) -> Score:
     return max_score(query_matrix) / max_score(optimal_matrix)
 
 
 def bma_percentage_score(
-        query_matrix: Sequence[Sequence[Num]],
-        optimal_matrix: Sequence[Sequence[Num]]) -> float:
+        query_matrix: Matrix,
+        optimal_matrix: Matrix) -> Score:
     return sym_bma_score(query_matrix) / sym_bma_score(optimal_matrix)
 
 
 def avg_percentage_score(
-        query_matrix: Sequence[Sequence[Num]],
-        optimal_matrix: Sequence[Sequence[Num]]) -> float:
+        query_matrix: Matrix,
+        optimal_matrix: Matrix) -> Score:
     return avg_score(query_matrix) / avg_score(optimal_matrix)
@@ -2,8 +2,11 @@ import requests
 import logging
 import json
 from json import JSONDecodeError
-import copy
-from typing import Dict, Tuple, Set, Optional, List, Iterable
+from typing import Dict, Tuple, Set, Optional, List, Iterable, Iterator, Any
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+from phenom.utils.cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -27,24 +30,116 @@ session = requests.Session()
 adapter = requests.adapters.HTTPAdapter(max_retries=10)
 session.mount('https://', adapter)
 
+# Optional disk backed cache for GET requests, see configure_cache
+response_cache: Optional[ResponseCache] = None
 
-def get_solr_results(solr, params):
-    solr_params = copy.deepcopy(params)  # don't mutate input
-    result_count = solr_params['rows']
-    if 'start' not in solr_params: solr_params['start'] = 0
-    while solr_params['start'] < result_count:
-        solr_request = session.get(solr, params=solr_params)
-        response = solr_request.json()
-        result_count = response['response']['numFound']
-        solr_params['start'] += solr_params['rows']
+
+def configure_cache(
+        path: Optional[str],
+        ttl: Optional[float] = None,
+        offline: Optional[bool] = False) -> Optional[ResponseCache]:
+    """
+    Cache scigraph and solr responses in a sqlite database at path
+    so repeated analyses do not re-fetch, if path is None caching is disabled
+
+    :param ttl: seconds before a cached response is refetched, None never expires
+    :param offline: never use the network, a cache miss raises a LookupError
+    """
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = None
+    if path is not None:
+        response_cache = ResponseCache(path, ttl, offline)
+    return response_cache
+
+
+def get_json(url: str, params: Optional[Dict] = None) -> Any:
+    """
+    GET a json response, consulting the response cache if configured,
+    only successful responses are cached
+
+    :raises requests.HTTPError: on an error status
+    """
+    def fetch():
+        response = session.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    if response_cache is None:
+        return fetch()
+    return response_cache.fetch(url, params, fetch)
+
+
+def get_solr_results(
+        solr: str,
+        params: Dict,
+        workers: Optional[int] = 4) -> Iterator[Dict]:
+    """
+    Page through solr results yielding docs as a stream, in order
+
+    The first page is fetched to learn numFound, the remaining
+    start offset windows are then fetched concurrently, with at most
+    2 * workers pages held in memory at a time
+
+    :param workers: number of concurrent requests, 1 pages sequentially
+    """
+    solr_params = dict(params)  # don't mutate input
+    rows = solr_params['rows']
+    start = solr_params.get('start', 0)
+    if rows < 1:
+        raise ValueError("rows must be a positive integer")
+
+    def get_page(offset):
+        page_params = dict(solr_params)
+        page_params['start'] = offset
+        return get_json(solr, page_params)['response']
+
+    first_page = get_page(start)
+    for doc in first_page['docs']:
+        yield doc
+
+    offsets = iter(range(start + rows, first_page['numFound'], rows))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pages = deque(executor.submit(get_page, offset)
+                      for offset in islice(offsets, 2 * workers))
+        while pages:
+            response = pages.popleft().result()
+            offset = next(offsets, None)
+            if offset is not None:
+                pages.append(executor.submit(get_page, offset))
+            for doc in response['docs']:
+                yield doc
+
+
+def get_solr_cursor_results(
+        solr: str,
+        params: Dict,
+        unique_key: Optional[str] = 'id') -> Iterator[Dict]:
+    """
+    Page through solr results with cursorMark, yielding docs as a stream
+
+    Unlike start offsets, the cost of fetching a page does not grow
+    with its depth, but pages must be fetched sequentially.  Results
+    are sorted by the unique key of the index
+    """
+    solr_params = dict(params)  # don't mutate input
+    solr_params.pop('start', None)
+    solr_params['sort'] = '{} asc'.format(unique_key)
+    cursor_mark = '*'
+    while True:
+        solr_params['cursorMark'] = cursor_mark
+        response = get_json(solr, solr_params)
         for doc in response['response']['docs']:
             yield doc
+        if response['nextCursorMark'] == cursor_mark:
+            break
+        cursor_mark = response['nextCursorMark']
 
 
 def get_clique_leader(id):
     url = SCIGRAPH_URL + '/dynamic/cliqueLeader/{}.json'.format(id)
-    sci_request = session.get(url)
-    response = sci_request.json()
+    response = get_json(url)
     try:
         leader = {
             'id': response['nodes'][0]['id'],
@@ -60,8 +155,7 @@ def get_clique_leader(id):
 
 def get_label(id):
     url = SCIGRAPH_URL + '/graph/{}.json'.format(id)
-    sci_request = session.get(url)
-    response = sci_request.json()
+    response = get_json(url)
     try:
        label = response['nodes'][0]['lbl']
     except IndexError:
@@ -210,8 +304,7 @@ def get_diseases_with_pheno_annotations(
         'facet.limit': facet_limit,
         'facet.field': 'subject_closure'
     }
-    solr_req = requests.get(MONARCH_ASSOC, params=d2p_params)
-    facets = solr_req.json()
+    facets = get_json(MONARCH_ASSOC, d2p_params)
     facet_list = facets['facet_counts']['facet_fields']['subject_closure']
 
     if len(facet_list) > facet_limit:
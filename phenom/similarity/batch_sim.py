@@ -0,0 +1,291 @@
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.semantic_sim import PairwiseSim, MatrixMetric
+from phenom.similarity.semantic_dist import PairwiseDist
+from phenom.math.matrix import MatrixSummary
+import numpy as np
+
+
+class PairwiseTable():
+    """
+    Pairwise similarities and distances between every
+    pair of terms in a vocabulary of closure index term ids
+
+    The table is vocabulary size squared, so the vocabulary
+    should be the terms used by the profiles being compared,
+    eg CorpusSim.vocabulary, rather than the whole ontology
+    """
+
+    def __init__(
+            self,
+            closure_index: ClosureIndex,
+            vocabulary: Iterable[int]):
+        self.closure_index = closure_index
+        self.vocabulary = np.unique(np.asarray(vocabulary, dtype=np.int32))
+        self.position = np.full(len(closure_index), -1, dtype=np.int64)
+        self.position[self.vocabulary] = np.arange(len(self.vocabulary))
+        self.ic = closure_index.ic[self.vocabulary]
+        self.mica, self.jaccard = closure_index.pairwise_mica_jaccard(
+            self.vocabulary, self.vocabulary)
+        self._tables: Dict[Union[PairwiseSim, PairwiseDist], np.ndarray] = {}
+
+    def positions(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Positions of term ids in the vocabulary
+
+        :raises KeyError: if a term is not in the vocabulary
+        """
+        positions = self.position[np.asarray(term_ids, dtype=np.int64)]
+        if (positions < 0).any():
+            raise KeyError("Terms not in vocabulary: {}".format(
+                np.asarray(term_ids)[positions < 0].tolist()))
+        return positions
+
+    def table(self, measure: Union[PairwiseSim, PairwiseDist]) -> np.ndarray:
+        """
+        vocabulary x vocabulary table for a pairwise measure,
+        see SemanticSim._get_score_matrix and SemanticDist._get_score_matrix
+        """
+        if measure not in self._tables:
+            ic_a = self.ic[:, np.newaxis]
+            ic_b = self.ic[np.newaxis, :]
+            if measure == PairwiseSim.GEOMETRIC:
+                table = (self.jaccard * self.mica) ** (1/2)
+            elif measure == PairwiseSim.IC:
+                table = self.mica
+            elif measure == PairwiseSim.JACCARD:
+                table = self.jaccard
+            elif measure == PairwiseDist.EUCLIDEAN:
+                table = np.sqrt((ic_a - self.mica) ** 2 + (ic_b - self.mica) ** 2)
+            elif measure == PairwiseDist.JIN_CONRATH:
+                table = ic_a + ic_b - 2 * self.mica
+            else:
+                raise NotImplementedError
+            self._tables[measure] = table
+        return self._tables[measure]
+
+
+def pad_profiles(profiles: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pad ragged profiles to the length of the longest
+
+    :return: profiles x max length array padded with 0, and a
+             boolean mask of the same shape, False for padding
+    """
+    sizes = np.array([len(profile) for profile in profiles], dtype=np.int64)
+    mask = np.arange(sizes.max(initial=0))[np.newaxis, :] < sizes[:, np.newaxis]
+    padded = np.zeros(mask.shape, dtype=np.int64)
+    if len(profiles):
+        padded[mask] = np.concatenate(profiles)
+    return padded, mask
+
+
+def score_matrices(
+        table: np.ndarray,
+        query_positions: Sequence[np.ndarray],
+        target_positions: Sequence[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score matrices for each query and target pair in one gather
+
+    :return: pairs x max query length x max target length array of
+             scores, and the row and column masks
+    """
+    queries, row_mask = pad_profiles(query_positions)
+    targets, col_mask = pad_profiles(target_positions)
+    matrices = table[queries[:, :, np.newaxis], targets[:, np.newaxis, :]]
+    return matrices, row_mask, col_mask
+
+
+def masked_summary(
+        matrices: np.ndarray,
+        row_mask: np.ndarray,
+        col_mask: np.ndarray) -> MatrixSummary:
+    """
+    matrix.summarize for padded score matrices, ignoring padding
+    """
+    cell_mask = row_mask[:, :, np.newaxis] & col_mask[:, np.newaxis, :]
+    num_rows = row_mask.sum(axis=1)
+    num_cols = col_mask.sum(axis=1)
+
+    row_max = np.where(cell_mask, matrices, -np.inf).max(axis=2)
+    col_max = np.where(cell_mask, matrices, -np.inf).max(axis=1)
+    row_min = np.where(cell_mask, matrices, np.inf).min(axis=2)
+    row_max_sum = np.where(row_mask, row_max, 0).sum(axis=1)
+    col_max_sum = np.where(col_mask, col_max, 0).sum(axis=1)
+
+    return MatrixSummary(
+        max=row_max.max(axis=1),
+        bma=row_max_sum / num_rows,
+        sym_bma=(row_max_sum + col_max_sum) / (num_rows + num_cols),
+        avg=np.where(cell_mask, matrices, 0).sum(axis=(1, 2)) / (num_rows * num_cols),
+        best_min_avg=np.where(row_mask, row_min, 0).sum(axis=1) / num_rows
+    )
+
+
+class BatchSim():
+    """
+    Many profile vs profile comparisons per numpy call, by gathering padded
+    batches of score matrices from a PairwiseTable
+
+    Profiles are closure index term ids, eg ProfileCorpus.profile(i), and
+    are compared pairwise: queries[i] against targets[i].  Scores are the
+    same as SemanticSim and SemanticDist
+    """
+
+    def __init__(
+            self,
+            pairwise_table: PairwiseTable,
+            batch_size: Optional[int] = 1000):
+        self.pairwise_table = pairwise_table
+        self.batch_size = batch_size
+
+    def phenodigm_scores(
+            self,
+            queries: Sequence[np.ndarray],
+            targets: Sequence[np.ndarray],
+            is_symmetric: Optional[bool] = False,
+            sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC
+    ) -> np.ndarray:
+        """
+        see SemanticSim.phenodigm_compare
+        """
+        if not isinstance(sim_measure, PairwiseSim):
+            sim_measure = PairwiseSim(sim_measure.lower())
+
+        scores = []
+        for query_positions, target_positions, summary in self._batches(
+                queries, targets, sim_measure):
+            query_max, query_bma = self._optimal(query_positions, sim_measure)
+            batch_scores = 100 * ((summary.max / query_max + summary.sym_bma / query_bma) / 2)
+            if is_symmetric:
+                # the flipped matrix has the same max and symmetric bma
+                target_max, target_bma = self._optimal(target_positions, sim_measure)
+                b2a_scores = 100 * ((summary.max / target_max
+                                     + summary.sym_bma / target_bma) / 2)
+                batch_scores = (batch_scores + b2a_scores) / 2
+            scores.append(batch_scores)
+        return np.concatenate(scores) if scores else np.zeros(0)
+
+    def resnik_scores(
+            self,
+            queries: Sequence[np.ndarray],
+            targets: Sequence[np.ndarray],
+            matrix_metric: Union[MatrixMetric, str, None] = MatrixMetric.BMA,
+            is_symmetric: Optional[bool] = False,
+            is_normalized: Optional[bool] = False) -> np.ndarray:
+        """
+        see SemanticSim.resnik_sim
+        """
+        if not isinstance(matrix_metric, MatrixMetric):
+            matrix_metric = MatrixMetric(matrix_metric.lower())
+
+        scores = []
+        for query_positions, target_positions, summary in self._batches(
+                queries, targets, PairwiseSim.IC):
+            if matrix_metric == MatrixMetric.BMA:
+                a2b, b2a = summary.sym_bma, summary.sym_bma
+            elif matrix_metric == MatrixMetric.MAX:
+                a2b, b2a = summary.max, summary.max
+            else:
+                a2b, b2a = summary.avg, summary.avg
+
+            if is_normalized:
+                a2b = a2b / self._optimal_resnik(query_positions, matrix_metric)
+                b2a = b2a / self._optimal_resnik(target_positions, matrix_metric)
+            elif matrix_metric == MatrixMetric.BMA:
+                # un-normalized bma only uses the best match per row
+                a2b = summary.bma
+                if is_symmetric:
+                    b2a = self._col_bma(query_positions, target_positions)
+
+            scores.append((a2b + b2a) / 2 if is_symmetric else a2b)
+        return np.concatenate(scores) if scores else np.zeros(0)
+
+    def euclidean_matrix_distances(
+            self,
+            queries: Sequence[np.ndarray],
+            targets: Sequence[np.ndarray],
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN
+    ) -> np.ndarray:
+        """
+        see SemanticDist.euclidean_matrix
+        """
+        if not isinstance(distance_measure, PairwiseDist):
+            distance_measure = PairwiseDist(distance_measure.lower())
+
+        table = self.pairwise_table.table(distance_measure)
+        distances = []
+        for start in range(0, len(queries), self.batch_size):
+            matrices, row_mask, col_mask = score_matrices(
+                table,
+                [self.pairwise_table.positions(query)
+                 for query in queries[start:start + self.batch_size]],
+                [self.pairwise_table.positions(target)
+                 for target in targets[start:start + self.batch_size]])
+            cell_mask = row_mask[:, :, np.newaxis] & col_mask[:, np.newaxis, :]
+            masked = np.where(cell_mask, matrices, np.inf)
+            # the BA matrix is the transpose of AB, so its
+            # best min average is over the columns of AB
+            ab = np.where(row_mask, masked.min(axis=2), 0).sum(axis=1) / row_mask.sum(axis=1)
+            ba = np.where(col_mask, masked.min(axis=1), 0).sum(axis=1) / col_mask.sum(axis=1)
+            distances.append((ab + ba) / 2)
+        return np.concatenate(distances) if distances else np.zeros(0)
+
+    def _batches(
+            self,
+            queries: Sequence[np.ndarray],
+            targets: Sequence[np.ndarray],
+            sim_measure: PairwiseSim):
+        if len(queries) != len(targets):
+            raise ValueError("Expected as many queries as targets")
+        table = self.pairwise_table.table(sim_measure)
+        for start in range(0, len(queries), self.batch_size):
+            query_positions = [self.pairwise_table.positions(query)
+                               for query in queries[start:start + self.batch_size]]
+            target_positions = [self.pairwise_table.positions(target)
+                                for target in targets[start:start + self.batch_size]]
+            summary = masked_summary(*score_matrices(table, query_positions, target_positions))
+            yield query_positions, target_positions, summary
+
+    def _col_bma(
+            self,
+            query_positions: Sequence[np.ndarray],
+            target_positions: Sequence[np.ndarray]) -> np.ndarray:
+        # best match average of the flipped IC matrices
+        summary = masked_summary(*score_matrices(
+            self.pairwise_table.table(PairwiseSim.IC), target_positions, query_positions))
+        return summary.bma
+
+    def _optimal(
+            self,
+            positions: Sequence[np.ndarray],
+            sim_measure: PairwiseSim) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        max and symmetric bma of the optimal (self vs self) matrix
+        of each profile, see SemanticSim._get_optimal_matrix
+        """
+        padded, mask = pad_profiles(positions)
+        if sim_measure == PairwiseSim.GEOMETRIC:
+            optimal = self.pairwise_table.ic[padded] ** (1/2)
+        elif sim_measure == PairwiseSim.IC:
+            optimal = self.pairwise_table.ic[padded]
+        else:
+            raise NotImplementedError
+        optimal = np.where(mask, optimal, 0)
+        optimal_max = optimal.max(axis=1)
+        optimal_bma = (optimal.sum(axis=1) + optimal_max) / (mask.sum(axis=1) + 1)
+        return optimal_max, optimal_bma
+
+    def _optimal_resnik(
+            self,
+            positions: Sequence[np.ndarray],
+            matrix_metric: MatrixMetric) -> np.ndarray:
+        optimal_max, optimal_bma = self._optimal(positions, PairwiseSim.IC)
+        if matrix_metric == MatrixMetric.BMA:
+            return optimal_bma
+        elif matrix_metric == MatrixMetric.MAX:
+            return optimal_max
+        padded, mask = pad_profiles(positions)
+        return np.where(mask, self.pairwise_table.ic[padded], 0).sum(axis=1) \
+            / mask.sum(axis=1)
@@ -0,0 +1,252 @@
+from typing import Dict, Iterable, List, Mapping, Optional, Set, TextIO, Tuple
+from phenom.utils import owl_utils
+from phenom.math import math_utils
+from rdflib import Graph, URIRef, RDFS
+from scipy import sparse
+import numpy as np
+
+
+class ClosureIndex():
+    """
+    Integer encoded reflexive closures of ontology terms
+
+    Terms are sorted and numbered 0..n-1.  ancestors is a sparse boolean
+    matrix where row i is the closure of term i, descendants is its
+    transpose, and ic holds the information content of each term
+
+    This allows vectorized computation of pairwise metrics across many
+    terms, rather than graph traversals and set operations per pair
+    """
+
+    def __init__(
+            self,
+            closures: Dict[str, Iterable[str]],
+            ic_map: Optional[Dict[str, float]] = None):
+        """
+        :param closures: term: reflexive closure of the term
+        :param ic_map: information content of every term in the closures,
+                       if None every term has an IC of 0, eg when the
+                       index is only used for set operations
+        """
+        terms = set(closures.keys())
+        for closure in closures.values():
+            terms.update(closure)
+        self.terms = sorted(terms)
+        self.term_index = {term: index for index, term in enumerate(self.terms)}
+        if ic_map is not None:
+            self.ic = np.array([ic_map[term] for term in self.terms], dtype=np.float64)
+        else:
+            self.ic = np.zeros(len(self.terms))
+
+        rows = list(range(len(self.terms)))
+        cols = list(range(len(self.terms)))
+        for term, closure in closures.items():
+            for ancestor in closure:
+                rows.append(self.term_index[term])
+                cols.append(self.term_index[ancestor])
+
+        # duplicate entries are summed, so build as ints and binarize
+        ancestors = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(self.terms), len(self.terms)))
+        ancestors.sum_duplicates()
+        ancestors.data[:] = 1
+        self.ancestors = ancestors.astype(bool)
+        self.descendants = self.ancestors.T.tocsr()
+        self.closure_size = np.diff(self.ancestors.indptr)
+
+    @staticmethod
+    def from_graph(
+            graph: Graph,
+            root: str,
+            ic_map: Optional[Dict[str, float]] = None,
+            terms: Optional[Iterable[str]] = None,
+            predicate: Optional[URIRef] = RDFS['subClassOf']) -> 'ClosureIndex':
+        """
+        Build an index from an rdflib graph with the same closures
+        as owl_utils.get_closure
+
+        :param terms: terms to index along with their ancestors,
+                      defaults to every term in ic_map
+        """
+        if terms is None:
+            if ic_map is None:
+                raise ValueError("terms are required without an ic_map")
+            terms = ic_map.keys()
+        closures: Dict[str, Set[str]] = {}
+        to_visit = set(terms)
+        while to_visit:
+            term = to_visit.pop()
+            closures[term] = owl_utils.get_closure(graph, term, predicate, root)
+            to_visit.update(closures[term].difference(closures))
+        return ClosureIndex(closures, ic_map)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The numeric parts of the index, eg to publish to
+        worker processes with pool.SharedArrays
+        """
+        return {
+            'ic': self.ic,
+            'ancestors_indptr': self.ancestors.indptr,
+            'ancestors_indices': self.ancestors.indices,
+            'descendants_indptr': self.descendants.indptr,
+            'descendants_indices': self.descendants.indices,
+        }
+
+    @staticmethod
+    def from_arrays(
+            arrays: Mapping[str, np.ndarray],
+            terms: Optional[List[str]] = None) -> 'ClosureIndex':
+        """
+        Rebuild an index from to_arrays() without copying the arrays
+
+        :param terms: term labels, only needed to encode or decode profiles
+        """
+        closure_index = ClosureIndex.__new__(ClosureIndex)
+        closure_index.ic = arrays['ic']
+        num_terms = len(closure_index.ic)
+        closure_index.terms = terms if terms is not None else []
+        closure_index.term_index = {term: index for index, term in enumerate(closure_index.terms)}
+        closure_index.ancestors, closure_index.descendants = [
+            sparse.csr_matrix(
+                (np.ones(len(arrays[indices]), dtype=bool),
+                 arrays[indices], arrays[indptr]),
+                shape=(num_terms, num_terms), copy=False)
+            for indptr, indices in [('ancestors_indptr', 'ancestors_indices'),
+                                    ('descendants_indptr', 'descendants_indices')]
+        ]
+        closure_index.closure_size = np.diff(closure_index.ancestors.indptr)
+        return closure_index
+
+    def __len__(self) -> int:
+        return len(self.ic)
+
+    def encode(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        Sorted, deduplicated term ids of a profile
+
+        :raises KeyError: if a term is not in the index
+        """
+        return np.unique(np.array(
+            [self.term_index[term] for term in profile], dtype=np.int32))
+
+    def decode(self, term_ids: Iterable[int]) -> Set[str]:
+        return {self.terms[term_id] for term_id in term_ids}
+
+    def closure(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Sorted term ids in the closure of a profile,
+        see owl_utils.get_profile_closure
+        """
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        return np.unique(self.ancestors[term_ids].indices)
+
+    def negated_closure(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Sorted term ids implied absent by negated phenotypes, their
+        reflexive descendants, see owl_utils.get_profile_closure(negative=True)
+        """
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        return np.unique(self.descendants[term_ids].indices)
+
+    def non_redundant(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Sorted term ids of the most specific terms of a profile,
+        see owl_utils.get_non_redundant_profile
+        """
+        term_ids = np.unique(np.asarray(term_ids, dtype=np.int32))
+        ancestors = self.ancestors[term_ids].tocoo()
+        is_proper = ancestors.col != term_ids[ancestors.row]
+        return term_ids[~np.isin(term_ids, ancestors.col[is_proper])]
+
+    def pairwise_mica_jaccard(
+            self,
+            query_ids: Iterable[int],
+            target_ids: Iterable[int],
+            dtype: Optional[type] = np.float64) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        IC of the most informative common ancestor and the jaccard index
+        of the closures for every query x target pair of terms
+
+        Shared ancestors of the query terms are visited in order of
+        ascending IC, each one setting the MICA of the query terms under it
+        against the target terms under it, so the last write is the max
+
+        :param target_ids: unique term ids
+        :param dtype: of the returned arrays, np.float32 halves the
+                      memory of large tables, eg across species
+        :return: two len(query_ids) x len(target_ids) arrays
+        """
+        query_ids = np.asarray(query_ids, dtype=np.int32)
+        target_ids = np.asarray(target_ids, dtype=np.int32)
+        mica = np.zeros((len(query_ids), len(target_ids)), dtype=dtype)
+        intersection = np.zeros((len(query_ids), len(target_ids)), dtype=np.int32)
+
+        target_position = np.full(len(self), -1, dtype=np.int64)
+        target_position[target_ids] = np.arange(len(target_ids))
+
+        query_closure = self.ancestors[query_ids].tocsc()
+        shared = np.flatnonzero(np.diff(query_closure.indptr))
+        for ancestor in shared[np.argsort(self.ic[shared], kind='stable')]:
+            rows = query_closure.indices[
+                query_closure.indptr[ancestor]:query_closure.indptr[ancestor + 1]]
+            cols = target_position[self.descendants.indices[
+                self.descendants.indptr[ancestor]:self.descendants.indptr[ancestor + 1]]]
+            cols = cols[cols >= 0]
+            if len(cols) == 0:
+                continue
+            block = np.ix_(rows, cols)
+            mica[block] = self.ic[ancestor]
+            intersection[block] += 1
+
+        # jaccard in place, no more than three tables alive at once
+        jaccard = intersection.astype(dtype)
+        del intersection
+        union = self.closure_size[query_ids].astype(dtype)[:, np.newaxis] \
+            + self.closure_size[target_ids].astype(dtype)[np.newaxis, :]
+        union -= jaccard
+        jaccard /= union
+        return mica, jaccard
+
+
+def read_closures(closure_file: TextIO, root: str) -> Dict[str, Set[str]]:
+    """
+    Read a two column (subject, ancestor) closure file, eg data/hp-closures.tsv,
+    keeping subjects and ancestors under the root as in owl_utils.get_closure
+    """
+    closures: Dict[str, Set[str]] = {}
+    for line in closure_file:
+        if line.startswith('#'): continue
+        subject, ancestor = line.rstrip("\n").split("\t")[0:2]
+        try:
+            closures[subject].add(ancestor)
+        except KeyError:
+            closures[subject] = {ancestor}
+
+    under_root = {subject for subject, closure in closures.items() if root in closure}
+    return {
+        subject: closure.intersection(under_root) | {subject}
+        for subject, closure in closures.items() if subject in under_root
+    }
+
+
+def annotation_ic(
+        closures: Dict[str, Set[str]],
+        annotations: Dict[str, Iterable[str]]) -> Dict[str, float]:
+    """
+    Information content of each term, the negative log of the proportion
+    of annotated profiles (eg diseases) with the term in their closure
+    """
+    counts = {term: 0 for term in closures}
+    for profile in annotations.values():
+        profile_closure = set()
+        for pheno in profile:
+            profile_closure.update(closures.get(pheno, {pheno}))
+        for term in profile_closure:
+            if term in counts:
+                counts[term] += 1
+    return {
+        term: math_utils.information_content(count / len(annotations))
+        for term, count in counts.items()
+    }
@@ -0,0 +1,159 @@
+from typing import Dict, Iterable, List, Mapping, Optional
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.semantic_sim import PairwiseSim
+from phenom.math.matrix import MatrixSummary
+from scipy import sparse
+import numpy as np
+
+
+class ProfileCorpus():
+    """
+    A collection of profiles, eg disease annotations, encoded
+    against a ClosureIndex
+
+    Profiles are stored as a ragged array, the sorted and deduplicated
+    term ids of profile i are terms[offsets[i]:offsets[i+1]].
+    Negated phenotypes (prefixed with '-') are stored separately in
+    negated_terms and negated_offsets, and are only used by cosine scores
+    """
+
+    def __init__(
+            self,
+            closure_index: ClosureIndex,
+            profiles: Dict[str, Iterable[str]],
+            is_non_redundant: Optional[bool] = False):
+        """
+        :param is_non_redundant: reduce profiles to their most specific
+                                 terms, see ClosureIndex.non_redundant
+        """
+        self.closure_index = closure_index
+        self.ids: List[str] = list(profiles.keys())
+        self.id_index = {profile_id: index for index, profile_id in enumerate(self.ids)}
+
+        encoded = []
+        negated = []
+        for profile_id, profile in profiles.items():
+            profile = list(profile)
+            term_ids = closure_index.encode(
+                pheno for pheno in profile if not pheno.startswith("-"))
+            negated.append(closure_index.encode(
+                pheno[1:] for pheno in profile if pheno.startswith("-")))
+            if len(term_ids) == 0:
+                raise ValueError("Profile {} has no phenotypes".format(profile_id))
+            if is_non_redundant:
+                term_ids = closure_index.non_redundant(term_ids)
+            encoded.append(term_ids)
+
+        self.sizes = np.array([len(term_ids) for term_ids in encoded], dtype=np.int64)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.offsets[1:])
+        self.terms = np.concatenate(encoded) if encoded else np.zeros(0, dtype=np.int32)
+        self.negated_offsets = np.zeros(len(negated) + 1, dtype=np.int64)
+        np.cumsum([len(term_ids) for term_ids in negated], out=self.negated_offsets[1:])
+        self.negated_terms = np.concatenate(negated) if negated else np.zeros(0, dtype=np.int32)
+        self._optimal_summaries: Dict[PairwiseSim, MatrixSummary] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def profile(self, index: int) -> np.ndarray:
+        return self.terms[self.offsets[index]:self.offsets[index + 1]]
+
+    def negated_profile(self, index: int) -> np.ndarray:
+        return self.negated_terms[self.negated_offsets[index]:self.negated_offsets[index + 1]]
+
+    def optimal_summary(self, sim_measure: PairwiseSim) -> MatrixSummary:
+        """
+        Summary of the optimal (self vs self) matrix of every profile, see
+        SemanticSim._get_optimal_matrix, computed once per sim measure so
+        normalized scores are a division by a per profile constant
+
+        :return: MatrixSummary of arrays, one value per profile
+        """
+        if sim_measure not in self._optimal_summaries:
+            ic = self.closure_index.ic[self.terms]
+            if sim_measure == PairwiseSim.GEOMETRIC:
+                optimal = ic ** (1/2)
+            elif sim_measure == PairwiseSim.IC:
+                optimal = ic
+            else:
+                raise NotImplementedError
+            # the optimal matrix is a single column, so the best
+            # match of each row is the row, and the column max the max
+            starts = self.offsets[:-1]
+            optimal_max = np.maximum.reduceat(optimal, starts)
+            optimal_sum = np.add.reduceat(optimal, starts)
+            optimal_avg = optimal_sum / self.sizes
+            self._optimal_summaries[sim_measure] = MatrixSummary(
+                max=optimal_max,
+                bma=optimal_avg,
+                sym_bma=(optimal_sum + optimal_max) / (self.sizes + 1),
+                avg=optimal_avg,
+                best_min_avg=optimal_avg)
+        return self._optimal_summaries[sim_measure]
+
+    def closure_matrix(self) -> sparse.csr_matrix:
+        """
+        profiles x terms boolean matrix, row i is the
+        closure of profile i, see ClosureIndex.closure
+        """
+        profile_terms = sparse.csr_matrix(
+            (np.ones(len(self.terms), dtype=np.int32), self.terms, self.offsets),
+            shape=(len(self), len(self.closure_index)))
+        closures = (profile_terms @ self.closure_index.ancestors.astype(np.int32)).tocsr()
+        closures.sort_indices()
+        return closures.astype(bool)
+
+    def negated_closure_matrix(self) -> sparse.csr_matrix:
+        """
+        profiles x terms boolean matrix, row i is the terms implied
+        absent by the negated phenotypes of profile i,
+        see ClosureIndex.negated_closure
+        """
+        negated_terms = sparse.csr_matrix(
+            (np.ones(len(self.negated_terms), dtype=np.int32),
+             self.negated_terms, self.negated_offsets),
+            shape=(len(self), len(self.closure_index)))
+        closures = (negated_terms @ self.closure_index.descendants.astype(np.int32)).tocsr()
+        closures.sort_indices()
+        return closures.astype(bool)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The encoded profiles, eg to publish to worker
+        processes with pool.SharedArrays
+        """
+        return {
+            'terms': self.terms,
+            'offsets': self.offsets,
+            'negated_terms': self.negated_terms,
+            'negated_offsets': self.negated_offsets
+        }
+
+    @staticmethod
+    def from_arrays(
+            closure_index: ClosureIndex,
+            arrays: Mapping[str, np.ndarray],
+            ids: Optional[List[str]] = None) -> 'ProfileCorpus':
+        """
+        Rebuild a corpus from to_arrays() without copying the arrays
+
+        :param ids: profile ids, defaults to the profile index as a string
+        """
+        corpus = ProfileCorpus.__new__(ProfileCorpus)
+        corpus.closure_index = closure_index
+        corpus.terms = arrays['terms']
+        corpus.offsets = arrays['offsets']
+        corpus.sizes = np.diff(corpus.offsets)
+        if 'negated_terms' in arrays:
+            corpus.negated_terms = arrays['negated_terms']
+            corpus.negated_offsets = arrays['negated_offsets']
+        else:
+            corpus.negated_terms = np.zeros(0, dtype=np.int32)
+            corpus.negated_offsets = np.zeros(len(corpus.sizes) + 1, dtype=np.int64)
+        corpus._optimal_summaries = {}
+        if ids is None:
+            ids = [str(index) for index in range(len(corpus.sizes))]
+        corpus.ids = ids
+        corpus.id_index = {profile_id: index for index, profile_id in enumerate(ids)}
+        return corpus
@@ -0,0 +1,278 @@
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.semantic_dist import PairwiseDist
+from scipy import sparse
+import numpy as np
+
+
+class CorpusDist(CorpusSim):
+    """
+    Vectorized distance of a query profile against every profile
+    in a corpus in a single call
+
+    Distances are the same as SemanticDist for an index built with
+    the same closures and ic_map
+    """
+
+    def __init__(
+            self,
+            corpus: ProfileCorpus,
+            distance_tables: Optional[Dict[PairwiseDist, np.ndarray]] = None):
+        """
+        :param distance_tables: precomputed distance_table of each measure,
+                                eg shared with worker processes
+        """
+        super().__init__(corpus)
+        self._distance_tables: Dict[PairwiseDist, np.ndarray] = \
+            dict(distance_tables) if distance_tables else {}
+
+    def distance_table(
+            self,
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN
+    ) -> np.ndarray:
+        """
+        Pairwise distances between every term used in the corpus, a
+        vocabulary x vocabulary array computed once per distance measure,
+        so all pairs matrix distances are lookups rather than MICA searches
+        """
+        if not isinstance(distance_measure, PairwiseDist):
+            distance_measure = PairwiseDist(distance_measure.lower())
+        if distance_measure not in self._distance_tables:
+            self._distance_tables[distance_measure] = self._get_dist_matrix(
+                self.vocabulary, self.vocabulary, distance_measure)
+        return self._distance_tables[distance_measure]
+
+    def euclidean_distances(
+            self,
+            indices: Optional[Sequence[int]] = None,
+            block_size: Optional[int] = 1024) -> np.ndarray:
+        """
+        Groupwise euclidean distance between every pair of corpus profiles,
+        see SemanticDist.euclidean_distance
+
+        Closures are sparse vectors of IC values, the squared distance of
+        a and b is |a|^2 + |b|^2 - 2 a.b, with the dot products of a block
+        of profiles against the profiles after them in one sparse product
+
+        :param indices: only compare these corpus profiles
+        :param block_size: number of rows of dot products held in memory
+        :return: condensed distance matrix, see scipy.spatial.distance.squareform
+        """
+        closures, weighted, norms = self._get_ic_closures(indices)
+        size = closures.shape[0]
+        distances = np.zeros(size * (size - 1) // 2)
+        offset = 0
+        for start in range(0, size, block_size):
+            stop = min(start + block_size, size)
+            dot_products = (weighted[start:stop] @ closures[start:].T).toarray()
+            for row in range(start, stop):
+                others = dot_products[row - start, row + 1 - start:]
+                squared = norms[row] + norms[row + 1:] - 2 * others
+                # rounding can leave identical closures slightly negative
+                distances[offset:offset + len(others)] = np.sqrt(np.maximum(squared, 0))
+                offset += len(others)
+        return distances
+
+    def neighbor_graph(
+            self,
+            distance_measure: Union[PairwiseDist, str, None] = None,
+            k: Optional[int] = None,
+            radius: Optional[float] = None,
+            rows: Optional[Iterable[int]] = None,
+            block_size: Optional[int] = 256) -> sparse.csr_matrix:
+        """
+        Sparse nearest neighbour graph of the corpus, the k closest profiles
+        to each profile and/or every profile within a radius, instead of the
+        dense all pairs matrix
+
+        Distances are computed for a block of profiles against the whole
+        corpus at a time, and only the neighbours are kept (argpartition),
+        so memory is block_size x profiles plus the graph.  The graph can be
+        passed to sklearn.cluster.DBSCAN(metric='precomputed'), which treats
+        missing entries as out of range, so k should cover the eps
+        neighbourhoods when both are used
+
+        :param distance_measure: matrix wise distance, see euclidean_matrix_row,
+                                 None for the groupwise euclidean distance
+        :param k: number of neighbours per profile, ties broken arbitrarily
+        :param radius: only keep neighbours at this distance or less
+        :param rows: only compute the neighbours of these profiles,
+                     other rows of the graph are empty
+        :raises ValueError: if neither k nor radius is set
+        :return: profiles x profiles csr matrix of distances, a profile is
+                 not its own neighbour, distances of 0 are stored explicitly
+        """
+        if k is None and radius is None:
+            raise ValueError("Expected k and/or a radius")
+        size = len(self.corpus)
+        rows = np.arange(size) if rows is None else np.asarray(list(rows), dtype=np.int64)
+        if distance_measure is None:
+            closures, weighted, norms = self._get_ic_closures()
+
+        neighbors = [np.zeros(0, dtype=np.int64)] * size
+        distances = [np.zeros(0)] * size
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            if distance_measure is None:
+                dot_products = (weighted[block] @ closures.T).toarray()
+                squared = norms[block][:, np.newaxis] + norms[np.newaxis, :] - 2 * dot_products
+                dist_block = np.sqrt(np.maximum(squared, 0))
+            else:
+                dist_block = np.stack([self._table_distances(index, 0, distance_measure)
+                                       for index in block])
+            dist_block[np.arange(len(block)), block] = np.inf
+
+            if k is not None and k < size - 1:
+                candidates = np.argpartition(dist_block, k, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(size), dist_block.shape)
+            for index, row_candidates, row in zip(block, candidates, dist_block):
+                row_distances = row[row_candidates]
+                is_neighbor = np.isfinite(row_distances)
+                if radius is not None:
+                    is_neighbor &= row_distances <= radius
+                order = np.argsort(row_candidates[is_neighbor])
+                neighbors[index] = row_candidates[is_neighbor][order]
+                distances[index] = row_distances[is_neighbor][order]
+
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum([len(row_neighbors) for row_neighbors in neighbors], out=indptr[1:])
+        return sparse.csr_matrix(
+            (np.concatenate(distances), np.concatenate(neighbors), indptr),
+            shape=(size, size))
+
+    def euclidean_matrix_all_pairs(
+            self,
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN,
+            rows: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Matrix wise euclidean distance between every pair of corpus profiles,
+        see SemanticDist.euclidean_matrix, using the distance_table
+
+        :param rows: only compute these rows of the upper triangle,
+                     eg to split the matrix across processes
+        :return: condensed distance matrix, see scipy.spatial.distance.squareform,
+                 with zeros outside of rows
+        """
+        size = len(self.corpus)
+        distances = np.zeros(size * (size - 1) // 2)
+        for index in (range(size - 1) if rows is None else rows):
+            offset = index * size - index * (index + 1) // 2
+            distances[offset:offset + size - index - 1] = self.euclidean_matrix_row(
+                index, distance_measure)
+        return distances
+
+    def euclidean_matrix_row(
+            self,
+            index: int,
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN
+    ) -> np.ndarray:
+        """
+        Matrix wise euclidean distance of corpus profile index against
+        the profiles after it, a row of the condensed distance matrix
+        """
+        return self._table_distances(index, index + 1, distance_measure)
+
+    def _table_distances(
+            self,
+            index: int,
+            first: int,
+            distance_measure: Union[PairwiseDist, str, None]) -> np.ndarray:
+        """
+        Matrix wise distance of corpus profile index against
+        the profiles from first on, using the distance_table
+        """
+        table = self.distance_table(distance_measure)
+        offsets = self.corpus.offsets
+        start = offsets[first]
+        query_positions = self.term_positions[offsets[index]:offsets[index + 1]]
+        dist_matrix = table[query_positions][:, self.term_positions[start:]]
+        if dist_matrix.shape[1] == 0:
+            return np.zeros(0)
+
+        starts = offsets[first:-1] - start
+        row_min = np.minimum.reduceat(dist_matrix, starts, axis=1)
+        col_min = dist_matrix.min(axis=0)
+        ab_best_min_avg = row_min.sum(axis=0) / len(query_positions)
+        ba_best_min_avg = np.add.reduceat(col_min, starts) / self.corpus.sizes[first:]
+        return (ab_best_min_avg + ba_best_min_avg) / 2
+
+    def _get_ic_closures(
+            self,
+            indices: Optional[Sequence[int]] = None
+    ) -> Tuple[sparse.csr_matrix, sparse.csr_matrix, np.ndarray]:
+        """
+        Corpus closures, the closures weighted by squared IC and the
+        squared norms of the IC weighted closures
+        """
+        closures = self.corpus.closure_matrix().astype(np.float64)
+        if indices is not None:
+            closures = closures[np.asarray(indices, dtype=np.int64)]
+        squared_ic = self.closure_index.ic ** 2
+        weighted = closures.multiply(squared_ic[np.newaxis, :]).tocsr()
+        norms = weighted @ np.ones(len(squared_ic))
+        return closures, weighted, norms
+
+    def euclidean_matrix_distances(
+            self,
+            profile: Iterable[str],
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN,
+            indices: Optional[Sequence[int]] = None,
+            is_non_redundant: Optional[bool] = False) -> np.ndarray:
+        """
+        Matrix wise euclidean distance of the profile against each profile
+        in the corpus, see SemanticDist.euclidean_matrix
+
+        :param indices: only compare against these corpus profiles
+        :param is_non_redundant: see CorpusSim.phenodigm_scores
+        :return: array of distances, in corpus (or indices) order
+        """
+        query_ids = self.closure_index.encode(
+            pheno for pheno in profile if not pheno.startswith("-"))
+        if is_non_redundant:
+            query_ids = self.closure_index.non_redundant(query_ids)
+        return self.euclidean_matrix_id_distances(query_ids, distance_measure, indices)
+
+    def euclidean_matrix_id_distances(
+            self,
+            query_ids: np.ndarray,
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN,
+            indices: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        euclidean_matrix_distances for a profile already encoded
+        against the closure index, eg a ProfileCorpus profile
+        """
+        if not isinstance(distance_measure, PairwiseDist):
+            distance_measure = PairwiseDist(distance_measure.lower())
+
+        offsets, vocabulary, term_positions = self._select(indices)
+        sizes = np.diff(offsets)
+
+        dist_matrix = self._get_dist_matrix(
+            query_ids, vocabulary, distance_measure)[:, term_positions]
+
+        # best (min) match of each query term per corpus profile,
+        # and of each corpus term against the query
+        row_min = np.minimum.reduceat(dist_matrix, offsets[:-1], axis=1)
+        col_min = dist_matrix.min(axis=0)
+        ab_best_min_avg = row_min.sum(axis=0) / len(query_ids)
+        ba_best_min_avg = np.add.reduceat(col_min, offsets[:-1]) / sizes
+
+        return (ab_best_min_avg + ba_best_min_avg) / 2
+
+    def _get_dist_matrix(
+            self,
+            query_ids: np.ndarray,
+            target_ids: np.ndarray,
+            distance_measure: PairwiseDist) -> np.ndarray:
+        mica, _ = self.closure_index.pairwise_mica_jaccard(query_ids, target_ids)
+        ic_a = self.closure_index.ic[query_ids][:, np.newaxis]
+        ic_b = self.closure_index.ic[target_ids][np.newaxis, :]
+        if distance_measure == PairwiseDist.EUCLIDEAN:
+            dist_matrix = np.sqrt((ic_a - mica) ** 2 + (ic_b - mica) ** 2)
+        elif distance_measure == PairwiseDist.JIN_CONRATH:
+            dist_matrix = ic_a + ic_b - 2 * mica
+        else:
+            raise NotImplementedError
+        return dist_matrix
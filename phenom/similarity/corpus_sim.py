@@ -0,0 +1,183 @@
+from typing import Iterable, Optional, Sequence, Tuple, Union
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.semantic_sim import PairwiseSim
+from scipy import sparse
+import numpy as np
+
+
+class CorpusSim():
+    """
+    Vectorized similarity of a query profile against every profile
+    in a corpus in a single call
+
+    Scores are the same as SemanticSim for an index built with
+    the same closures and ic_map
+    """
+
+    def __init__(self, corpus: ProfileCorpus):
+        self.corpus = corpus
+        self.closure_index = corpus.closure_index
+        # unique terms in the corpus and the position of each corpus term in it
+        self.vocabulary, self.term_positions = np.unique(
+            corpus.terms, return_inverse=True)
+        self._signed_closures = None
+
+    def phenodigm_scores(
+            self,
+            profile: Iterable[str],
+            is_symmetric: Optional[bool] = False,
+            sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC,
+            indices: Optional[Sequence[int]] = None,
+            is_non_redundant: Optional[bool] = False) -> np.ndarray:
+        """
+        Phenodigm score of the profile against each profile in the corpus,
+        see SemanticSim.phenodigm_compare
+
+        :param indices: only score these corpus profiles
+        :param is_non_redundant: reduce the profile to its most specific terms,
+                                 corpus profiles are reduced when the corpus is built
+        :return: array of scores, in corpus (or indices) order
+        """
+        query_ids = self.closure_index.encode(
+            pheno for pheno in profile if not pheno.startswith("-"))
+        if is_non_redundant:
+            query_ids = self.closure_index.non_redundant(query_ids)
+        return self.phenodigm_id_scores(query_ids, is_symmetric, sim_measure, indices)
+
+    def phenodigm_id_scores(
+            self,
+            query_ids: np.ndarray,
+            is_symmetric: Optional[bool] = False,
+            sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC,
+            indices: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        phenodigm_scores for a profile already encoded
+        against the closure index, eg a ProfileCorpus profile
+        """
+        if not isinstance(sim_measure, PairwiseSim):
+            sim_measure = PairwiseSim(sim_measure.lower())
+
+        offsets, vocabulary, term_positions = self._select(indices)
+        sizes = np.diff(offsets)
+
+        score_matrix = self._get_score_matrix(
+            query_ids, vocabulary, sim_measure)[:, term_positions]
+
+        # best match of each query term per corpus profile, and of each
+        # corpus term against the query
+        row_max = np.maximum.reduceat(score_matrix, offsets[:-1], axis=1)
+        col_max = score_matrix.max(axis=0)
+        max_score = row_max.max(axis=0)
+        sym_bma = (row_max.sum(axis=0) + np.add.reduceat(col_max, offsets[:-1])) \
+            / (len(query_ids) + sizes)
+
+        optimal = self.optimal_scores(query_ids, sim_measure)
+        optimal_max = optimal.max()
+        optimal_bma = (optimal.sum() + optimal_max) / (len(optimal) + 1)
+        scores = 100 * (max_score / optimal_max + sym_bma / optimal_bma) / 2
+
+        if is_symmetric:
+            # the flipped matrix has the same max and symmetric bma
+            corpus_optimal = self.corpus.optimal_summary(sim_measure)
+            corpus_max, corpus_bma = corpus_optimal.max, corpus_optimal.sym_bma
+            if indices is not None:
+                corpus_max, corpus_bma = corpus_max[indices], corpus_bma[indices]
+            b2a_scores = 100 * (max_score / corpus_max + sym_bma / corpus_bma) / 2
+            scores = (scores + b2a_scores) / 2
+
+        return scores
+
+    def cosine_scores(
+            self,
+            profile: Iterable[str],
+            ic_weighted: Optional[bool] = False,
+            negative_weight: Optional[float] = 1,
+            indices: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Cosine similarity of the profile against each profile in the corpus,
+        see SemanticSim.cosine_sim
+
+        Profiles are vectors over two blocks of term ids, the closure of
+        the phenotypes then the descendants of the negated phenotypes, so
+        the dot products with every corpus profile are one sparse product
+
+        :param indices: only score these corpus profiles
+        :return: array of scores, in corpus (or indices) order
+        """
+        profile = list(profile)
+        positive = self.closure_index.closure(self.closure_index.encode(
+            pheno for pheno in profile if not pheno.startswith("-")))
+        negated = self.closure_index.negated_closure(self.closure_index.encode(
+            pheno[1:] for pheno in profile if pheno.startswith("-")))
+
+        weights = self.closure_index.ic if ic_weighted else np.ones(len(self.closure_index))
+        squared = np.concatenate([weights ** 2, (weights * negative_weight) ** 2])
+        query_terms = np.concatenate([positive, negated + len(self.closure_index)])
+        query_vector = np.zeros(len(squared))
+        query_vector[query_terms] = squared[query_terms]
+
+        signed_closures = self._get_signed_closures()
+        if indices is not None:
+            signed_closures = signed_closures[np.asarray(indices, dtype=np.int64)]
+        dot_products = signed_closures @ query_vector
+        norms = np.sqrt(signed_closures @ squared)
+        return dot_products / (norms * np.sqrt(query_vector.sum()))
+
+    def optimal_scores(
+            self,
+            term_ids: np.ndarray,
+            sim_measure: PairwiseSim) -> np.ndarray:
+        """
+        Scores of each term against itself, see SemanticSim._get_optimal_matrix
+        """
+        if sim_measure == PairwiseSim.GEOMETRIC:
+            optimal = self.closure_index.ic[term_ids] ** (1/2)
+        elif sim_measure == PairwiseSim.IC:
+            optimal = self.closure_index.ic[term_ids]
+        else:
+            raise NotImplementedError
+        return optimal
+
+    def _get_signed_closures(self):
+        """
+        profiles x 2 * terms matrix of the corpus closures
+        and the descendants of negated phenotypes
+        """
+        if self._signed_closures is None:
+            self._signed_closures = sparse.hstack(
+                [self.corpus.closure_matrix(), self.corpus.negated_closure_matrix()],
+                format='csr', dtype=np.float64)
+        return self._signed_closures
+
+    def _select(
+            self,
+            indices: Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Offsets, vocabulary and vocabulary positions for a subset of the corpus
+        """
+        if indices is None:
+            return self.corpus.offsets, self.vocabulary, self.term_positions
+        indices = np.asarray(indices, dtype=np.int64)
+        sizes = self.corpus.sizes[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        positions = np.repeat(self.corpus.offsets[indices] - offsets[:-1], sizes) \
+            + np.arange(offsets[-1])
+        vocabulary, term_positions = np.unique(
+            self.corpus.terms[positions], return_inverse=True)
+        return offsets, vocabulary, term_positions
+
+    def _get_score_matrix(
+            self,
+            query_ids: np.ndarray,
+            target_ids: np.ndarray,
+            sim_measure: PairwiseSim) -> np.ndarray:
+        mica, jaccard = self.closure_index.pairwise_mica_jaccard(query_ids, target_ids)
+        if sim_measure == PairwiseSim.GEOMETRIC:
+            score_matrix = (jaccard * mica) ** (1/2)
+        elif sim_measure == PairwiseSim.IC:
+            score_matrix = mica
+        else:
+            raise NotImplementedError
+        return score_matrix
@@ -0,0 +1,257 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.semantic_sim import PairwiseSim
+from phenom.math.matrix import MatrixSummary
+import numpy as np
+
+
+class CrossSpeciesTable():
+    """
+    Pairwise similarities between the terms of two species' phenotype
+    ontologies, eg HP x MP, through a shared upper ontology such as uPheno
+
+    The MICA and closure jaccard of every query x target term pair are
+    computed once from a ClosureIndex over the combined ontology (see
+    closure_index.read_closures for loading a local closure file) and can
+    be saved, so comparisons are table lookups rather than graph walks
+
+    A query term never matches itself in the other species, so the optimal
+    matrix of a profile is the best score of each of its terms against any
+    term of the other species in the table.  Normalized scores therefore
+    depend on the target vocabulary, which should cover the terms used to
+    annotate the other species, eg every MP term used by the mouse models
+
+    Tables are held as float32, an HP x MP table is over a billion pairs
+    """
+
+    def __init__(
+            self,
+            query_terms: List[str],
+            target_terms: List[str],
+            mica: np.ndarray,
+            jaccard: np.ndarray):
+        """
+        :param mica: len(query_terms) x len(target_terms) IC of the MICA
+        :param jaccard: len(query_terms) x len(target_terms) closure jaccard
+        """
+        self.query_terms = query_terms
+        self.target_terms = target_terms
+        self.query_position = {term: index for index, term in enumerate(query_terms)}
+        self.target_position = {term: index for index, term in enumerate(target_terms)}
+        self.mica = mica.astype(np.float32, copy=False)
+        self.jaccard = jaccard.astype(np.float32, copy=False)
+        self._tables: Dict[PairwiseSim, np.ndarray] = {}
+        self._best_scores: Dict[PairwiseSim, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @staticmethod
+    def from_closure_index(
+            closure_index: ClosureIndex,
+            query_terms: Iterable[str],
+            target_terms: Iterable[str]) -> 'CrossSpeciesTable':
+        """
+        :param closure_index: closures and IC over the shared ontology
+        :raises KeyError: if a term is not in the closure index
+        """
+        query_ids = closure_index.encode(query_terms)
+        target_ids = closure_index.encode(target_terms)
+        mica, jaccard = closure_index.pairwise_mica_jaccard(
+            query_ids, target_ids, dtype=np.float32)
+        return CrossSpeciesTable(
+            [closure_index.terms[term_id] for term_id in query_ids],
+            [closure_index.terms[term_id] for term_id in target_ids],
+            mica, jaccard)
+
+    def save(self, path: str) -> None:
+        """
+        Save to a numpy .npz file
+        """
+        np.savez_compressed(
+            path,
+            query_terms=np.array(self.query_terms, dtype=str),
+            target_terms=np.array(self.target_terms, dtype=str),
+            mica=self.mica,
+            jaccard=self.jaccard)
+
+    @staticmethod
+    def load(path: str) -> 'CrossSpeciesTable':
+        with np.load(path) as arrays:
+            return CrossSpeciesTable(
+                arrays['query_terms'].tolist(),
+                arrays['target_terms'].tolist(),
+                arrays['mica'],
+                arrays['jaccard'])
+
+    def table(self, sim_measure: PairwiseSim) -> np.ndarray:
+        """
+        query x target pairwise similarities, see SemanticSim._get_score_matrix
+        """
+        if sim_measure not in self._tables:
+            if sim_measure == PairwiseSim.GEOMETRIC:
+                table = self.jaccard * self.mica
+                np.sqrt(table, out=table)
+            elif sim_measure == PairwiseSim.IC:
+                table = self.mica
+            else:
+                raise NotImplementedError
+            self._tables[sim_measure] = table
+        return self._tables[sim_measure]
+
+    def best_scores(self, sim_measure: PairwiseSim) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best score of each query term against any target term,
+        and of each target term against any query term
+        """
+        if sim_measure not in self._best_scores:
+            table = self.table(sim_measure)
+            self._best_scores[sim_measure] = table.max(axis=1), table.max(axis=0)
+        return self._best_scores[sim_measure]
+
+    def query_positions(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        :raises KeyError: if a term is not a query term
+        """
+        return np.array([self.query_position[pheno] for pheno in profile], dtype=np.int64)
+
+    def target_positions(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        :raises KeyError: if a term is not a target term
+        """
+        return np.array([self.target_position[pheno] for pheno in profile], dtype=np.int64)
+
+    def is_query_profile(self, profile: Iterable[str]) -> bool:
+        """
+        True if the profile is in the query species, False if it is in
+        the target species
+
+        :raises KeyError: if the profile is in neither
+        """
+        profile = list(profile)
+        if all(pheno in self.query_position for pheno in profile):
+            return True
+        if all(pheno in self.target_position for pheno in profile):
+            return False
+        raise KeyError("Profile is not in the query or target terms: {}".format(profile))
+
+    def score_matrix(
+            self,
+            profile_a: Iterable[str],
+            profile_b: Iterable[str],
+            sim_measure: PairwiseSim) -> np.ndarray:
+        """
+        Pairwise score matrix of two profiles in different species,
+        in either order
+        """
+        profile_a, profile_b = list(profile_a), list(profile_b)
+        table = self.table(sim_measure)
+        if self.is_query_profile(profile_a):
+            return table[np.ix_(self.query_positions(profile_a),
+                                self.target_positions(profile_b))]
+        return table[np.ix_(self.query_positions(profile_b),
+                            self.target_positions(profile_a))].T
+
+    def optimal_scores(
+            self,
+            profile: Iterable[str],
+            sim_measure: PairwiseSim) -> np.ndarray:
+        """
+        Best score of each term of a profile against any term of the other species
+        """
+        profile = list(profile)
+        query_best, target_best = self.best_scores(sim_measure)
+        if self.is_query_profile(profile):
+            return query_best[self.query_positions(profile)]
+        return target_best[self.target_positions(profile)]
+
+
+class CrossSpeciesSim():
+    """
+    Vectorized phenodigm of a query species profile against a corpus of
+    target species profiles, eg a patient against thousands of mouse models
+
+    Scores are the same as SemanticSim.phenodigm_compare with
+    is_same_species=False and the same table
+    """
+
+    def __init__(
+            self,
+            table: CrossSpeciesTable,
+            profiles: Dict[str, Iterable[str]]):
+        """
+        :param profiles: target species profiles, eg model: phenotypes,
+                         negated phenotypes (prefixed with '-') are skipped
+        :raises KeyError: if a phenotype is not a target term
+        """
+        self.table = table
+        self.ids: List[str] = list(profiles.keys())
+        encoded = []
+        for profile_id, profile in profiles.items():
+            positions = np.unique(table.target_positions(
+                pheno for pheno in profile if not pheno.startswith("-")))
+            if len(positions) == 0:
+                raise ValueError("Profile {} has no phenotypes".format(profile_id))
+            encoded.append(positions)
+        self.sizes = np.array([len(positions) for positions in encoded], dtype=np.int64)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.offsets[1:])
+        self.terms = np.concatenate(encoded) if encoded else np.zeros(0, dtype=np.int64)
+        self._optimal_summaries: Dict[PairwiseSim, MatrixSummary] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def phenodigm_scores(
+            self,
+            profile: Iterable[str],
+            is_symmetric: Optional[bool] = False,
+            sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC) -> np.ndarray:
+        """
+        Phenodigm score of a query species profile against each target profile
+
+        :return: array of scores, in profile order
+        """
+        if not isinstance(sim_measure, PairwiseSim):
+            sim_measure = PairwiseSim(sim_measure.lower())
+
+        query_positions = np.unique(self.table.query_positions(
+            pheno for pheno in profile if not pheno.startswith("-")))
+        score_matrix = self.table.table(sim_measure)[query_positions][:, self.terms]
+
+        starts = self.offsets[:-1]
+        row_max = np.maximum.reduceat(score_matrix, starts, axis=1)
+        col_max = score_matrix.max(axis=0)
+        max_score = row_max.max(axis=0)
+        sym_bma = (row_max.sum(axis=0) + np.add.reduceat(col_max, starts)) \
+            / (len(query_positions) + self.sizes)
+
+        optimal = self.table.best_scores(sim_measure)[0][query_positions]
+        optimal_max = optimal.max()
+        optimal_bma = (optimal.sum() + optimal_max) / (len(optimal) + 1)
+        scores = 100 * (max_score / optimal_max + sym_bma / optimal_bma) / 2
+
+        if is_symmetric:
+            # the flipped matrix has the same max and symmetric bma
+            target_optimal = self.optimal_summary(sim_measure)
+            b2a_scores = 100 * (max_score / target_optimal.max
+                                + sym_bma / target_optimal.sym_bma) / 2
+            scores = (scores + b2a_scores) / 2
+
+        return scores
+
+    def optimal_summary(self, sim_measure: PairwiseSim) -> MatrixSummary:
+        """
+        Summary of the optimal matrix of every target profile,
+        see ProfileCorpus.optimal_summary
+        """
+        if sim_measure not in self._optimal_summaries:
+            optimal = self.table.best_scores(sim_measure)[1][self.terms]
+            starts = self.offsets[:-1]
+            optimal_max = np.maximum.reduceat(optimal, starts)
+            optimal_sum = np.add.reduceat(optimal, starts)
+            optimal_avg = optimal_sum / self.sizes
+            self._optimal_summaries[sim_measure] = MatrixSummary(
+                max=optimal_max,
+                bma=optimal_avg,
+                sym_bma=(optimal_sum + optimal_max) / (self.sizes + 1),
+                avg=optimal_avg,
+                best_min_avg=optimal_avg)
+        return self._optimal_summaries[sim_measure]
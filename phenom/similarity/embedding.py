@@ -0,0 +1,203 @@
+from typing import Iterable, List, Optional, Tuple, Union
+from enum import Enum
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.search import SearchMetric
+from phenom.similarity.semantic_sim import PairwiseSim
+from scipy.sparse.linalg import svds
+from scipy.cluster.vq import kmeans2
+import numpy as np
+
+
+class EmbeddingMethod(Enum):
+    SVD    = 'svd'
+    RANDOM = 'random'
+
+
+class ProfileEmbedding():
+    """
+    Fixed length vectors of profiles, for approximate search
+
+    A profile is first the IC weighted vector of its closure over the
+    terms of the closure index, the same vectors as IC weighted cosine
+    (see SemanticSim.cosine_sim).  These are projected to a few dimensions,
+    either onto the top singular vectors of the corpus profiles x terms
+    matrix (truncated SVD, LSA) or onto random gaussian directions, which
+    preserve dot products in expectation without fitting, then scaled to
+    unit length so the dot product of two embeddings approximates cosine
+    """
+
+    def __init__(
+            self,
+            corpus: ProfileCorpus,
+            dimensions: int = 64,
+            method: Union[EmbeddingMethod, str, None] = EmbeddingMethod.SVD,
+            seed: Optional[int] = 0):
+        """
+        :param dimensions: embedding length, for SVD at most the
+                           number of profiles or terms minus one
+        :param method: svd or random projection
+        """
+        if not isinstance(method, EmbeddingMethod):
+            method = EmbeddingMethod(method.lower())
+        self.corpus = corpus
+        self.closure_index = corpus.closure_index
+        self.method = method
+
+        # profiles x terms closures, also used to rescore by EmbeddingIndex
+        self.closures = corpus.closure_matrix().astype(np.float64)
+        weighted = self.closures.multiply(self.closure_index.ic[np.newaxis, :]).tocsr()
+        if method == EmbeddingMethod.SVD:
+            dimensions = min(dimensions, min(weighted.shape) - 1)
+            _, _, components = svds(weighted, k=dimensions, random_state=seed)
+            self.projection = components.T
+        elif method == EmbeddingMethod.RANDOM:
+            rng = np.random.default_rng(seed)
+            self.projection = rng.standard_normal(
+                (len(self.closure_index), dimensions)) / np.sqrt(dimensions)
+        else:
+            raise NotImplementedError
+        self.dimensions = self.projection.shape[1]
+        self.embeddings = self._normalize(weighted @ self.projection)
+
+    def embed(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        Embedding of a profile, negated phenotypes (prefixed with '-') are skipped,
+        all zeros if there are no other phenotypes
+
+        :raises KeyError: if a phenotype is not in the closure index
+        """
+        closure = self.closure(profile)
+        vector = self.closure_index.ic[closure] @ self.projection[closure]
+        return self._normalize(vector[np.newaxis, :])[0]
+
+    def closure(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        Sorted term ids in the closure of the phenotypes of a profile
+        that are not negated
+
+        :raises KeyError: if a phenotype is not in the closure index
+        """
+        phenotypes = [pheno for pheno in profile if not pheno.startswith("-")]
+        unknown = [pheno for pheno in phenotypes if pheno not in self.closure_index.term_index]
+        if unknown:
+            raise KeyError("Phenotypes not in the closure index: {}".format(", ".join(unknown)))
+        return self.closure_index.closure(self.closure_index.encode(phenotypes))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+class EmbeddingIndex():
+    """
+    Approximate top k search of a profile against a corpus, for
+    interactive lookups where scoring every profile is too slow
+
+    Embeddings are grouped into lists around k-means centroids (an
+    inverted file index).  A query only visits the lists of its nearest
+    centroids, takes a shortlist of the profiles with the closest
+    embeddings, and rescores the shortlist exactly, so scores are exact
+    but a profile missing from the shortlist is missed.  Recall increases
+    with num_probes and shortlist, with both covering the corpus results
+    are the same as SearchIndex.top_k
+    """
+
+    def __init__(
+            self,
+            embedding: ProfileEmbedding,
+            corpus_sim: Optional[CorpusSim] = None,
+            num_lists: Optional[int] = None,
+            seed: Optional[int] = 0):
+        """
+        :param corpus_sim: exact scores of the corpus, built if not provided
+        :param num_lists: number of k-means centroids, defaults to the
+                          square root of the corpus size
+        """
+        self.embedding = embedding
+        self.corpus = embedding.corpus
+        self.closure_index = embedding.closure_index
+        self.corpus_sim = corpus_sim if corpus_sim is not None else CorpusSim(self.corpus)
+
+        embeddings = embedding.embeddings
+        if num_lists is None:
+            num_lists = max(1, int(np.sqrt(len(embeddings))))
+        num_lists = min(num_lists, len(embeddings))
+        self.centroids, labels = kmeans2(embeddings, num_lists, minit='++', seed=seed)
+        # members of list i are members[offsets[i]:offsets[i+1]]
+        self.members = np.argsort(labels, kind='stable')
+        self.offsets = np.searchsorted(labels[self.members], np.arange(num_lists + 1))
+
+        self.closure_ic = embedding.closures @ self.closure_index.ic
+
+    def candidates(
+            self,
+            profile: Iterable[str],
+            num_probes: Optional[int] = 4,
+            shortlist: Optional[int] = 100) -> np.ndarray:
+        """
+        Corpus indices with the closest embeddings to the profile
+        in the lists of its num_probes nearest centroids
+
+        :return: up to shortlist indices, closest first
+        """
+        query = self.embedding.embed(profile)
+        centroid_dist = np.linalg.norm(self.centroids - query, axis=1)
+        probes = np.argsort(centroid_dist, kind='stable')[:num_probes]
+        candidates = np.concatenate(
+            [self.members[self.offsets[probe]:self.offsets[probe + 1]] for probe in probes])
+
+        scores = self.embedding.embeddings[candidates] @ query
+        if len(candidates) > shortlist:
+            closest = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            candidates, scores = candidates[closest], scores[closest]
+        return candidates[np.lexsort((candidates, -scores))]
+
+    def top_k(
+            self,
+            profile: Iterable[str],
+            k: Optional[int] = 10,
+            metric: Union[SearchMetric, str, None] = SearchMetric.PHENODIGM,
+            num_probes: Optional[int] = 4,
+            shortlist: Optional[int] = 100,
+            is_symmetric: Optional[bool] = False,
+            sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC
+    ) -> List[Tuple[str, float]]:
+        """
+        The k best scoring profiles of the shortlist, see SearchIndex.top_k,
+        no profiles if the profile only has negated phenotypes
+
+        :param num_probes: number of lists to visit
+        :param shortlist: number of candidates to score exactly
+        :return: list of (profile id, score), best first
+        :raises KeyError: if a phenotype is not in the closure index
+        """
+        if not isinstance(metric, SearchMetric):
+            metric = SearchMetric(metric.lower())
+        profile = list(profile)
+        if len(self.embedding.closure(profile)) == 0 or k < 1:
+            return []
+        candidates = self.candidates(profile, num_probes, max(shortlist, k))
+
+        if metric == SearchMetric.PHENODIGM:
+            scores = self.corpus_sim.phenodigm_scores(
+                profile, is_symmetric, sim_measure, indices=candidates)
+        elif metric == SearchMetric.SIM_GIC:
+            scores = self._sim_gic(profile, candidates)
+        else:
+            raise NotImplementedError
+
+        best = np.lexsort((candidates, -scores))[:k]
+        return [(self.corpus.ids[candidates[position]], float(scores[position]))
+                for position in best]
+
+    def _sim_gic(self, profile: List[str], indices: np.ndarray) -> np.ndarray:
+        """
+        simGIC of the profile against corpus profiles, see SemanticSim.sim_gic
+        """
+        closure = self.embedding.closure(profile)
+        query_ic = np.zeros(len(self.closure_index))
+        query_ic[closure] = self.closure_index.ic[closure]
+        shared_ic = self.embedding.closures[indices] @ query_ic
+        return shared_ic / (query_ic.sum() + self.closure_ic[indices] - shared_ic)
@@ -0,0 +1,95 @@
+from typing import Callable, Iterable, Optional, Union
+from phenom.utils.bitset import ClosureBitset
+import numpy as np
+
+
+class GroupClosure():
+    """
+    Running intersection and union of the closures of a group of
+    profiles, eg a cluster of diseases or a patient cohort
+
+    The IC sums and sizes of the intersection and union are updated as
+    profiles are added or groups merged, so groupwise simGIC and jaccard
+    are constant time.  Only the terms new to the union are summed, and
+    the intersection only shrinks
+    """
+
+    def __init__(
+            self,
+            ic_vector: np.ndarray,
+            closure: Optional[Callable[[Iterable[str]], ClosureBitset]] = None):
+        """
+        :param ic_vector: IC by term position, see TermIndex.ic_vector
+        :param closure: function from a profile to its closure bitset,
+                        eg SemanticSim.profile_bitset, required to add
+                        profiles that are not already bitsets
+        """
+        self.ic_vector = ic_vector
+        self.closure = closure
+        self.num_profiles = 0
+        # None until the first profile is added
+        self.intersection: Optional[ClosureBitset] = None
+        self.union = ClosureBitset()
+        self.intersection_ic = 0.0
+        self.union_ic = 0.0
+        self.intersection_size = 0
+        self.union_size = 0
+
+    def __len__(self) -> int:
+        return self.num_profiles
+
+    def add(self, profile: Union[ClosureBitset, Iterable[str]]) -> 'GroupClosure':
+        """
+        Add a profile, or the closure bitset of a profile
+
+        :raises ValueError: if the profile is not a bitset and
+                            there is no closure function
+        :return: self
+        """
+        if not isinstance(profile, ClosureBitset):
+            if self.closure is None:
+                raise ValueError("A closure function is required to add profiles")
+            profile = self.closure(profile)
+        return self._combine(profile, profile, 1)
+
+    def merge(self, other: 'GroupClosure') -> 'GroupClosure':
+        """
+        Add every profile of another group
+
+        :return: self
+        """
+        if other.intersection is None:
+            return self
+        return self._combine(other.intersection, other.union, other.num_profiles)
+
+    def sim_gic(self) -> float:
+        """
+        Groupwise simGIC, see SemanticSim.groupwise_sim_gic
+        """
+        return self.intersection_ic / self.union_ic
+
+    def jaccard(self) -> float:
+        """
+        Groupwise jaccard, see SemanticSim.groupwise_jaccard
+        """
+        return self.intersection_size / self.union_size
+
+    def _combine(
+            self,
+            intersection: ClosureBitset,
+            union: ClosureBitset,
+            num_profiles: int) -> 'GroupClosure':
+        new_terms = union - self.union
+        if new_terms:
+            self.union = self.union | new_terms
+            self.union_ic += new_terms.ic_sum(self.ic_vector)
+            self.union_size += len(new_terms)
+
+        shared = intersection if self.intersection is None \
+            else self.intersection & intersection
+        if shared != self.intersection:
+            self.intersection = shared
+            self.intersection_ic = shared.ic_sum(self.ic_vector)
+            self.intersection_size = len(shared)
+        self.num_profiles += num_profiles
+        return self
@@ -0,0 +1,108 @@
+from typing import Iterable, List, Optional
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+import numpy as np
+
+
+class InvertedIndex():
+    """
+    Term to profile postings over closure expanded profiles, eg which
+    diseases have a phenotype or one of its descendants
+
+    Postings are stored in CSR form, the sorted profile indices with term i
+    in their closure are postings[indptr[i]:indptr[i+1]].  Terms are closure
+    index term ids, profiles are indices into ids
+    """
+
+    def __init__(
+            self,
+            indptr: np.ndarray,
+            postings: np.ndarray,
+            ids: List[str],
+            terms: List[str]):
+        """
+        :param ids: profile ids
+        :param terms: term labels, as in the ClosureIndex used to build the index
+        """
+        self.indptr = indptr
+        self.postings = postings
+        self.ids = ids
+        self.id_index = {profile_id: index for index, profile_id in enumerate(ids)}
+        self.terms = terms
+        self.counts = np.diff(indptr)
+
+    @staticmethod
+    def from_corpus(corpus: ProfileCorpus) -> 'InvertedIndex':
+        postings = corpus.closure_matrix().T.tocsr()
+        postings.sort_indices()
+        return InvertedIndex(
+            postings.indptr.astype(np.int64),
+            postings.indices.astype(np.int32),
+            list(corpus.ids),
+            list(corpus.closure_index.terms))
+
+    def save(self, path: str) -> None:
+        """
+        Save to a numpy .npz file
+        """
+        np.savez_compressed(
+            path,
+            indptr=self.indptr,
+            postings=self.postings,
+            ids=np.array(self.ids, dtype=str),
+            terms=np.array(self.terms, dtype=str))
+
+    @staticmethod
+    def load(path: str, closure_index: Optional[ClosureIndex] = None) -> 'InvertedIndex':
+        """
+        Load an index saved with save()
+
+        :param closure_index: if provided, check the index was built
+                              with the same term ids
+        :raises ValueError: if the terms do not match the closure index
+        """
+        with np.load(path) as arrays:
+            inverted_index = InvertedIndex(
+                arrays['indptr'],
+                arrays['postings'],
+                arrays['ids'].tolist(),
+                arrays['terms'].tolist())
+        if closure_index is not None and inverted_index.terms != closure_index.terms:
+            raise ValueError("{} was built with a different closure index".format(path))
+        return inverted_index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def term_postings(self, term_id: int) -> np.ndarray:
+        """
+        Sorted indices of the profiles with the term in their closure
+        """
+        return self.postings[self.indptr[term_id]:self.indptr[term_id + 1]]
+
+    def intersection(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Sorted indices of the profiles with every term in their closure
+        """
+        term_ids = sorted(term_ids, key=lambda term_id: self.counts[term_id])
+        if not term_ids:
+            return np.arange(len(self.ids), dtype=self.postings.dtype)
+        profiles = self.term_postings(term_ids[0])
+        for term_id in term_ids[1:]:
+            if len(profiles) == 0:
+                break
+            profiles = np.intersect1d(
+                profiles, self.term_postings(term_id), assume_unique=True)
+        return profiles
+
+    def union(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Sorted indices of the profiles with any term in their closure
+        """
+        postings = [self.term_postings(term_id) for term_id in term_ids]
+        if not postings:
+            return np.zeros(0, dtype=self.postings.dtype)
+        return np.unique(np.concatenate(postings))
+
+    def decode(self, profiles: Iterable[int]) -> List[str]:
+        return [self.ids[index] for index in profiles]
@@ -1,6 +1,7 @@
 from typing import Set, Union, Iterable, Dict, Optional
 from phenom.utils import owl_utils
 from phenom.math import math_utils
+from phenom.utils.bitset import ClosureBitset
 from rdflib import RDFS, Graph, URIRef
 import math
 
@@ -9,7 +10,12 @@ import math
 Num = Union[int, float]
 
 
-def jaccard(set1: Set, set2: Set) -> float:
+def jaccard(
+        set1: Union[Set, ClosureBitset],
+        set2: Union[Set, ClosureBitset]) -> float:
+    """
+    Jaccard index of two sets, or two ClosureBitsets
+    """
     return len(set1.intersection(set2))/len(set1.union(set2))
 
 
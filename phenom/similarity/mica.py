@@ -0,0 +1,131 @@
+from typing import Iterable, Optional, Tuple
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.utils.cache import LRUCache
+from phenom.utils.bitset import pack_rows
+import numpy as np
+
+
+class MicaEngine():
+    """
+    Most informative common ancestor of term pairs, computed on demand
+
+    For ontologies where a terms x terms MICA matrix does not fit in memory,
+    eg uPheno or cross species ontologies.  Each term's ancestors are stored
+    sorted by descending IC, the MICA of a and b is the first ancestor of a
+    in the closure bitset of b, so the scan stops at the first hit.  The size
+    of the closure intersection, only needed for the jaccard index, is the
+    number of ancestors of a in it, so costs the number of ancestors of a.
+    Closure bitsets, and the MICA and intersection size of term pairs,
+    are kept in LRU caches
+
+    Scores are the same as ClosureIndex.pairwise_mica_jaccard
+    """
+
+    def __init__(
+            self,
+            closure_index: ClosureIndex,
+            cache_size: Optional[int] = 100000,
+            closure_cache_size: Optional[int] = 4096):
+        """
+        :param cache_size: number of term pairs to cache, for MICAs and
+                           intersection sizes each
+        :param closure_cache_size: number of closure bitsets to cache,
+                                   each is number of terms / 8 bytes
+        """
+        self.closure_index = closure_index
+        ancestors = closure_index.ancestors
+        self.indptr = ancestors.indptr
+        # ancestors of each term by descending IC, ties by term id
+        order = np.lexsort((ancestors.indices, -closure_index.ic[ancestors.indices],
+                            np.repeat(np.arange(len(closure_index)),
+                                      np.diff(ancestors.indptr))))
+        self.ancestors_by_ic = ancestors.indices[order].astype(np.int64)
+        self.pairs = LRUCache(max_size=cache_size)
+        self.intersections = LRUCache(max_size=cache_size)
+        self.closures = LRUCache(max_size=closure_cache_size)
+
+    def ancestors(self, term_id: int) -> np.ndarray:
+        """
+        Ancestors of a term (reflexive) by descending IC
+        """
+        return self.ancestors_by_ic[self.indptr[term_id]:self.indptr[term_id + 1]]
+
+    def closure_bitset(self, term_id: int) -> np.ndarray:
+        """
+        Closure of a term as a bitset of bytes, bit i % 8 of byte i // 8 is term i,
+        see bitset.pack_rows
+        """
+        return self.closures.get_or_compute(term_id, lambda: self._pack(term_id))
+
+    def mica(self, term_a: int, term_b: int) -> int:
+        """
+        Term id of the most informative common ancestor, -1 if there is none
+        """
+        if term_b < term_a:
+            term_a, term_b = term_b, term_a
+        return self.pairs.get_or_compute(
+            (term_a, term_b), lambda: self._first_shared(term_a, term_b))
+
+    def mica_ic(self, term_a: int, term_b: int) -> float:
+        mica = self.mica(term_a, term_b)
+        return float(self.closure_index.ic[mica]) if mica >= 0 else 0.0
+
+    def jaccard(self, term_a: int, term_b: int) -> float:
+        """
+        Jaccard index of the closures of two terms
+        """
+        if term_b < term_a:
+            term_a, term_b = term_b, term_a
+        intersection = self.intersections.get_or_compute(
+            (term_a, term_b), lambda: self._count_shared(term_a, term_b))
+        closure_size = self.closure_index.closure_size
+        return intersection / (closure_size[term_a] + closure_size[term_b] - intersection)
+
+    def pairwise_mica_jaccard(
+            self,
+            query_ids: Iterable[int],
+            target_ids: Iterable[int],
+            with_jaccard: Optional[bool] = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        see ClosureIndex.pairwise_mica_jaccard
+
+        :param with_jaccard: if False only compute the MICA IC,
+                             and return None for the jaccard index
+        :return: two len(query_ids) x len(target_ids) arrays
+        """
+        query_ids = [int(term_id) for term_id in query_ids]
+        target_ids = [int(term_id) for term_id in target_ids]
+        mica = np.array([[self.mica_ic(query, target) for target in target_ids]
+                         for query in query_ids], dtype=np.float64)
+        mica = mica.reshape(len(query_ids), len(target_ids))
+        if not with_jaccard:
+            return mica, None
+        jaccard = np.array([[self.jaccard(query, target) for target in target_ids]
+                            for query in query_ids], dtype=np.float64)
+        return mica, jaccard.reshape(len(query_ids), len(target_ids))
+
+    def _first_shared(self, term_a: int, term_b: int) -> int:
+        term_a, term_b = self._order_by_closure_size(term_a, term_b)
+        closure_b = self.closure_bitset(term_b)
+        for ancestor in self.ancestors(term_a):
+            if closure_b[ancestor >> 3] >> (ancestor & 7) & 1:
+                return int(ancestor)
+        return -1
+
+    def _count_shared(self, term_a: int, term_b: int) -> int:
+        term_a, term_b = self._order_by_closure_size(term_a, term_b)
+        closure_b = self.closure_bitset(term_b)
+        ancestors = self.ancestors(term_a)
+        return int(np.count_nonzero(closure_b[ancestors >> 3] >> (ancestors & 7) & 1))
+
+    def _order_by_closure_size(self, term_a: int, term_b: int) -> Tuple[int, int]:
+        # scan the shorter closure against the bitset of the other
+        if self.indptr[term_a + 1] - self.indptr[term_a] \
+                > self.indptr[term_b + 1] - self.indptr[term_b]:
+            return term_b, term_a
+        return term_a, term_b
+
+    def _pack(self, term_id: int) -> np.ndarray:
+        bits = np.zeros((1, len(self.closure_index)), dtype=bool)
+        bits[0, self.ancestors(term_id)] = True
+        return pack_rows(bits)[0].view(np.uint8)
@@ -0,0 +1,204 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from phenom.similarity.corpus import ProfileCorpus
+from scipy import sparse
+import numpy as np
+
+
+def lsh_bands(num_hashes: int, threshold: float) -> int:
+    """
+    Number of bands for a jaccard threshold, the fewest bands whose
+    S-curve midpoint (1/b)^(1/r) is at or below the threshold, so most
+    pairs above the threshold share a bucket
+
+    More bands find more of the pairs above the threshold (higher recall)
+    at the cost of more candidates to re-rank, see candidate_probability
+    """
+    for bands in range(1, num_hashes + 1):
+        if num_hashes % bands:
+            continue
+        rows = num_hashes // bands
+        if (1 / bands) ** (1 / rows) <= threshold:
+            return bands
+    return num_hashes
+
+
+def candidate_probability(jaccard: float, bands: int, rows: int) -> float:
+    """
+    Probability that two closures with this jaccard index share a bucket
+    in at least one band, the expected recall at that similarity
+    """
+    return 1 - (1 - jaccard ** rows) ** bands
+
+
+class MinHashIndex():
+    """
+    Approximate nearest neighbours by closure jaccard, see
+    SemanticSim.jaccard_sim, for corpora where all pairs are too many
+
+    Each closure is summarized by the minimum of num_hashes random
+    permutations of the term ids, two closures have the same minimum with
+    probability equal to their jaccard index.  Signatures are split into
+    bands, profiles with an identical band share a bucket, and only
+    profiles sharing a bucket with the query are candidates.  Candidates
+    are re-ranked by their exact jaccard index, so results never include
+    a profile below the threshold, but may miss some above it
+    """
+
+    def __init__(
+            self,
+            corpus: ProfileCorpus,
+            threshold: Optional[float] = 0.5,
+            num_hashes: Optional[int] = 128,
+            bands: Optional[int] = None,
+            seed: Optional[int] = 0,
+            block_size: Optional[int] = 4096):
+        """
+        :param threshold: default jaccard threshold for queries
+        :param bands: number of bands, must divide num_hashes,
+                      chosen from the threshold if not set, see lsh_bands
+        :param block_size: number of profiles hashed at a time
+        :raises ValueError: if bands does not divide num_hashes
+        """
+        if bands is None:
+            bands = lsh_bands(num_hashes, threshold)
+        if num_hashes % bands:
+            raise ValueError("{} bands do not divide {} hashes".format(bands, num_hashes))
+        self.corpus = corpus
+        self.closure_index = corpus.closure_index
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_hashes // bands
+
+        rng = np.random.default_rng(seed)
+        num_terms = len(self.closure_index)
+        self.permutations = np.stack(
+            [rng.permutation(num_terms) for _ in range(num_hashes)]).astype(np.int32)
+
+        self.closures = corpus.closure_matrix()
+        self.closure_sizes = np.diff(self.closures.indptr)
+        self.signatures = np.concatenate([
+            self._signatures(self.closures[start:start + block_size])
+            for start in range(0, len(corpus), block_size)
+        ]) if len(corpus) else np.zeros((0, num_hashes), dtype=np.int32)
+
+        # band key to the profiles in its bucket
+        self.buckets: List[Dict[bytes, np.ndarray]] = []
+        for band in range(bands):
+            keys = np.ascontiguousarray(self.signatures[:, band * self.rows:(band + 1) * self.rows])
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            order = np.argsort(inverse, kind='stable')
+            starts = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+            self.buckets.append({
+                key.tobytes(): order[starts[index]:starts[index + 1]]
+                for index, key in enumerate(unique)
+            })
+
+    def signature(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        MinHash signature of the closure of a profile,
+        negated phenotypes (prefixed with '-') are skipped
+        """
+        closure = self._closure(profile)
+        return self.permutations[:, closure].min(axis=1)
+
+    def candidates(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        Sorted corpus indices sharing a bucket with the profile in any band
+        """
+        signature = self.signature(profile)
+        found = [self.buckets[band].get(
+                     signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                 for band in range(self.bands)]
+        found = [indices for indices in found if indices is not None]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def estimate(self, profile: Iterable[str], indices: Iterable[int]) -> np.ndarray:
+        """
+        Estimated jaccard index of the profile against corpus profiles,
+        the proportion of their signatures that agree
+        """
+        indices = np.asarray(list(indices), dtype=np.int64)
+        return (self.signatures[indices] == self.signature(profile)).mean(axis=1)
+
+    def query(
+            self,
+            profile: Iterable[str],
+            threshold: Optional[float] = None,
+            k: Optional[int] = None,
+            rerank: Optional[Callable[[Iterable[str], Iterable[str]], float]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Corpus profiles with a jaccard index at or above the threshold
+
+        :param threshold: defaults to the index threshold, recall is best
+                          at or above the threshold the bands were chosen for
+        :param k: only return the k best
+        :param rerank: exact score of the profile against a corpus profile,
+                       eg SemanticSim.jaccard_sim, the closure jaccard is
+                       computed from the corpus closures if not set
+        :return: list of (profile id, score), best first, ties in corpus order
+        """
+        profile = list(profile)
+        threshold = self.threshold if threshold is None else threshold
+        candidates = self.candidates(profile)
+        if rerank is None:
+            scores = self._jaccard(self._closure(profile), candidates)
+        else:
+            scores = np.array([
+                rerank(profile, self.closure_index.decode(self.corpus.profile(index)))
+                for index in candidates], dtype=np.float64)
+
+        is_similar = scores >= threshold
+        candidates, scores = candidates[is_similar], scores[is_similar]
+        best = np.lexsort((candidates, -scores))[:k]
+        return [(self.corpus.ids[candidates[position]], float(scores[position]))
+                for position in best]
+
+    def similar_pairs(
+            self,
+            threshold: Optional[float] = None) -> Iterator[Tuple[int, int, float]]:
+        """
+        Pairs of corpus profiles with a jaccard index at or above the
+        threshold, from the pairs sharing a bucket in any band
+
+        :return: iterator of (index a, index b, jaccard) with a < b,
+                 in order of a then b
+        """
+        threshold = self.threshold if threshold is None else threshold
+        size = len(self.corpus)
+        pairs = []
+        for buckets in self.buckets:
+            for members in buckets.values():
+                if len(members) > 1:
+                    first, second = np.triu_indices(len(members), k=1)
+                    pairs.append(members[first] * size + members[second])
+        if not pairs:
+            return
+        pairs = np.unique(np.concatenate(pairs))
+        first, second = pairs // size, pairs % size
+        intersection = np.asarray(
+            self.closures[first].multiply(self.closures[second]).sum(axis=1)).ravel()
+        scores = intersection / (self.closure_sizes[first] + self.closure_sizes[second]
+                                 - intersection)
+        for index_a, index_b, score in zip(first, second, scores):
+            if score >= threshold:
+                yield int(index_a), int(index_b), float(score)
+
+    def _closure(self, profile: Iterable[str]) -> np.ndarray:
+        return self.closure_index.closure(self.closure_index.encode(
+            pheno for pheno in profile if not pheno.startswith("-")))
+
+    def _jaccard(self, closure: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        query = np.zeros(len(self.closure_index), dtype=np.int64)
+        query[closure] = 1
+        intersection = self.closures[indices].astype(np.int64) @ query
+        return intersection / (len(closure) + self.closure_sizes[indices] - intersection)
+
+    def _signatures(self, closures: sparse.csr_matrix) -> np.ndarray:
+        """
+        Minimum of each permutation over the terms of each closure,
+        profiles x num_hashes
+        """
+        permuted = self.permutations[:, closures.indices]
+        return np.minimum.reduceat(permuted, closures.indptr[:-1], axis=1).T
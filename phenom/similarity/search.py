@@ -0,0 +1,176 @@
+from typing import Iterable, List, Optional, Tuple, Union
+from enum import Enum
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.semantic_sim import PairwiseSim
+from phenom.similarity.inverted_index import InvertedIndex
+import numpy as np
+
+
+class SearchMetric(Enum):
+    PHENODIGM = 'phenodigm'
+    SIM_GIC   = 'sim_gic'
+
+
+class SearchIndex():
+    """
+    Top k search of a profile against a corpus, eg finding
+    the best matching diseases for a patient
+
+    Term postings list the corpus profiles with each term in their
+    closure.  Walking the query closure through the postings gives,
+    for every query term and profile, the IC of the most informative
+    ancestor they share.  No pairwise score can exceed that, which
+    bounds the phenodigm score, so profiles are scored exactly in order
+    of their bound until no remaining profile can make the top k.
+    Profiles that only share uninformative ancestors with the query
+    are never scored.
+
+    simGIC is computed exactly for every profile from the postings,
+    by summing the IC of each query closure term into the profiles
+    that share it.  It is not pruned, although the shared IC is bounded
+    by the smaller of the query and profile closure IC: the pass over
+    the postings already costs no more than bounding every profile,
+    since the postings of the root list the whole corpus
+    """
+
+    def __init__(
+            self,
+            corpus_sim: CorpusSim,
+            inverted_index: Optional[InvertedIndex] = None,
+            block_size: Optional[int] = 64):
+        """
+        :param inverted_index: postings of the corpus, built if not provided
+        :param block_size: number of candidates to score exactly per call
+        """
+        self.corpus_sim = corpus_sim
+        self.corpus = corpus_sim.corpus
+        self.closure_index = corpus_sim.closure_index
+        self.block_size = block_size
+        if inverted_index is None:
+            inverted_index = InvertedIndex.from_corpus(self.corpus)
+        self.inverted_index = inverted_index
+
+        # summed ic of each profile closure
+        self.closure_ic = np.bincount(
+            inverted_index.postings,
+            weights=np.repeat(self.closure_index.ic, inverted_index.counts),
+            minlength=len(self.corpus))
+
+    def top_k(
+            self,
+            profile: Iterable[str],
+            k: Optional[int] = 10,
+            metric: Union[SearchMetric, str, None] = SearchMetric.PHENODIGM,
+            is_symmetric: Optional[bool] = False,
+            sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC
+    ) -> List[Tuple[str, float]]:
+        """
+        The k best scoring corpus profiles, ties are broken by corpus order,
+        no profiles if k is less than 1 or the profile only has negated
+        phenotypes
+
+        :param is_symmetric: phenodigm only, see SemanticSim.phenodigm_compare
+        :param sim_measure: phenodigm only, see SemanticSim.phenodigm_compare
+        :return: list of (profile id, score), best first
+        """
+        if not isinstance(metric, SearchMetric):
+            metric = SearchMetric(metric.lower())
+        if not isinstance(sim_measure, PairwiseSim):
+            sim_measure = PairwiseSim(sim_measure.lower())
+
+        query_ids = self.closure_index.encode(
+            pheno for pheno in profile if not pheno.startswith("-"))
+        k = min(k, len(self.corpus))
+        if k < 1 or len(query_ids) == 0:
+            return []
+
+        if metric == SearchMetric.SIM_GIC:
+            indices, scores = self._sim_gic_top_k(query_ids, k)
+        elif metric == SearchMetric.PHENODIGM:
+            indices, scores = self._phenodigm_top_k(query_ids, k, is_symmetric, sim_measure)
+        else:
+            raise NotImplementedError
+
+        return [(self.corpus.ids[index], float(score)) for index, score in zip(indices, scores)]
+
+    def shared_ancestor_ic(self, query_ids: np.ndarray) -> np.ndarray:
+        """
+        IC of the most informative ancestor of each query term shared
+        with each corpus profile, 0 if they share no ancestor
+
+        Shared ancestors are visited in order of ascending IC, each one
+        setting the query terms under it against the profiles with it in
+        their closure, so the last write is the max
+
+        :return: len(query_ids) x corpus size array
+        """
+        query_closure = self.closure_index.ancestors[query_ids].tocsc()
+        shared = np.flatnonzero(np.diff(query_closure.indptr))
+        max_ic = np.zeros((len(query_ids), len(self.corpus)))
+        for term in shared[np.argsort(self.closure_index.ic[shared], kind='stable')]:
+            rows = query_closure.indices[
+                query_closure.indptr[term]:query_closure.indptr[term + 1]]
+            profiles = self.inverted_index.term_postings(term)
+            max_ic[np.ix_(rows, profiles)] = self.closure_index.ic[term]
+        return max_ic
+
+    def _phenodigm_top_k(
+            self,
+            query_ids: np.ndarray,
+            k: int,
+            is_symmetric: bool,
+            sim_measure: PairwiseSim) -> Tuple[np.ndarray, np.ndarray]:
+        optimal = self.corpus_sim.optimal_scores(query_ids, sim_measure)
+        optimal_max = optimal.max()
+        optimal_bma = (optimal.sum() + optimal_max) / (len(optimal) + 1)
+
+        # No pairwise score can exceed the score of the most informative
+        # shared ancestor, so each row max is bounded by that of its query
+        # term, and the max and each column max by the best of these
+        max_ic = self.shared_ancestor_ic(query_ids)
+        best_pair = max_ic ** (1/2) if sim_measure == PairwiseSim.GEOMETRIC else max_ic
+        max_bound = best_pair.max(axis=0)
+        bma_bound = (best_pair.sum(axis=0) + self.corpus.sizes * max_bound) \
+            / (len(query_ids) + self.corpus.sizes)
+        bounds = 100 * (max_bound / optimal_max + bma_bound / optimal_bma) / 2
+        if is_symmetric:
+            corpus_optimal = self.corpus.optimal_summary(sim_measure)
+            corpus_max, corpus_bma = corpus_optimal.max, corpus_optimal.sym_bma
+            bounds = (bounds + 100 * (max_bound / corpus_max + bma_bound / corpus_bma) / 2) / 2
+        # allow for rounding in the exact scores
+        bounds = bounds * (1 + 1e-9) + 1e-12
+
+        # score candidates in blocks of increasing size, until the
+        # kth best score beats the bound of every remaining candidate
+        order = np.lexsort((np.arange(len(bounds)), -bounds))
+        scored = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+        start = 0
+        block_size = max(self.block_size, k)
+        while start < len(order):
+            if len(scored) >= k and np.sort(scores)[-k] > bounds[order[start]]:
+                break
+            block = order[start:start + block_size]
+            scored = np.append(scored, block)
+            scores = np.append(scores, self.corpus_sim.phenodigm_id_scores(
+                query_ids, is_symmetric, sim_measure, indices=block))
+            start += block_size
+            block_size *= 2
+
+        best = np.lexsort((scored, -scores))[:k]
+        return scored[best], scores[best]
+
+    def _sim_gic_top_k(self, query_ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query_closure = self.closure_index.closure(query_ids)
+        # summed ic of the query closure terms in each profile closure
+        shared_ic = np.bincount(
+            np.concatenate([self.inverted_index.term_postings(term)
+                            for term in query_closure]),
+            weights=np.repeat(self.closure_index.ic[query_closure],
+                              self.inverted_index.counts[query_closure]),
+            minlength=len(self.corpus))
+        union_ic = self.closure_index.ic[query_closure].sum() + self.closure_ic - shared_ic
+        scores = shared_ic / union_ic
+
+        best = np.lexsort((np.arange(len(scores)), -scores))[:k]
+        return best, scores[best]
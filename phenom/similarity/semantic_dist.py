@@ -4,6 +4,10 @@ from rdflib import Graph, URIRef, RDFS
 from phenom.similarity import metric
 from phenom.math import matrix, math_utils
 from phenom.utils import owl_utils
+from phenom.utils.cache import LRUCache, ScoreCache
+from phenom.similarity.mica import MicaEngine
+from phenom.decorators import cached_score
+from phenom.utils.bitset import TermIndex
 import math
 from functools import reduce
 import numpy as np
@@ -24,11 +28,27 @@ class SemanticDist():
             self,
             graph: Graph,
             root: str,
-            ic_map: Dict[str, float]):
+            ic_map: Dict[str, float],
+            score_cache: Optional[ScoreCache] = None,
+            mica_engine: Optional[MicaEngine] = None,
+            closure_cache_size: Optional[int] = 10000):
+        """
+        :param score_cache: see SemanticSim
+        :param mica_engine: see SemanticSim
+        :param closure_cache_size: see SemanticSim
+        """
         self.graph = graph
         self.root = root
         self.ic_map = ic_map
-
+        self.score_cache = score_cache
+        self.mica_engine = mica_engine
+        # closures are compared as bitsets over the terms in ic_map,
+        # the bitset of each phenotype's closure is cached
+        self.term_index = TermIndex(sorted(ic_map.keys()))
+        self._closure_bitsets = LRUCache(max_size=closure_cache_size)
+        self.ic_vector = self.term_index.ic_vector(ic_map)
+
+    @cached_score(symmetric=True)
     def euclidean_distance(
             self,
             profile_a: Iterable[str],
@@ -47,25 +67,25 @@ class SemanticDist():
         profile_a = {pheno for pheno in profile_a if not pheno.startswith("-")}
         profile_b = {pheno for pheno in profile_b if not pheno.startswith("-")}
 
-        a_closure = owl_utils.get_profile_closure(
-            profile_a, self.graph, self.root, predicate)
-        b_closure = owl_utils.get_profile_closure(
-            profile_b, self.graph, self.root, predicate)
-
-        all_phenotypes = a_closure.union(b_closure)
+        a_closure = owl_utils.get_profile_bitset(
+            profile_a, self.graph, self.root, self.term_index, predicate,
+            cache=self._closure_bitsets)
+        b_closure = owl_utils.get_profile_bitset(
+            profile_b, self.graph, self.root, self.term_index, predicate,
+            cache=self._closure_bitsets)
 
-        a_vector = np.array([self.ic_map[item] if
-                             item in a_closure else 0 for item in all_phenotypes])
-        b_vector = np.array([self.ic_map[item] if
-                            item in b_closure else 0 for item in all_phenotypes])
-
-        return np.linalg.norm(a_vector - b_vector)
+        # shared phenotypes cancel out, so only
+        # phenotypes in one closure contribute
+        return math.sqrt(a_closure.symmetric_difference(b_closure).ic_sum(
+            self.ic_vector ** 2))
 
+    @cached_score(symmetric=True)
     def euclidean_matrix(
             self,
             profile_a: Iterable[str],
             profile_b: Iterable[str],
-            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN
+            distance_measure: Union[PairwiseDist, str, None] = PairwiseDist.EUCLIDEAN,
+            is_non_redundant: Optional[bool] = False
     ) -> float:
         """
         Matrix wise euclidean distance
@@ -76,11 +96,18 @@ class SemanticDist():
         Pairwise distance based metrics:
         Jin Contrath = IC(a) + IC (b) - 2 IC(MICA(a,b))
         Euclidean = sqrt ( pow(IC(a) - MICA, 2) + pow(IC(b) - MICA), 2) )
+
+        is_non_redundant reduces profiles to their most specific phenotypes
+        first, see owl_utils.get_non_redundant_profile
         """
         if not isinstance(distance_measure, PairwiseDist):
             distance_measure = PairwiseDist(distance_measure.lower())
+        if is_non_redundant:
+            profile_a = owl_utils.get_non_redundant_profile(profile_a, self.graph, self.root)
+            profile_b = owl_utils.get_non_redundant_profile(profile_b, self.graph, self.root)
         ab_matrix = self._get_score_matrix(profile_a, profile_b, distance_measure)
-        ba_matrix = self._get_score_matrix(profile_b, profile_a, distance_measure)
+        # pairwise distances are symmetric, so BA is the transpose of AB
+        ba_matrix = ab_matrix.T
         return math_utils.mean(
             [matrix.best_min_avg(ab_matrix), matrix.best_min_avg(ba_matrix)]
         )
@@ -90,7 +117,7 @@ class SemanticDist():
             profile_a: Iterable[str],
             profile_b: Iterable[str],
             distance_measure: Union[PairwiseDist, None] = PairwiseDist.EUCLIDEAN
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
 
         score_matrix = [[]]
 
@@ -101,6 +128,17 @@ class SemanticDist():
         else:
             raise NotImplementedError
 
+        if self.mica_engine is not None:
+            closure_index = self.mica_engine.closure_index
+            ids_a = [closure_index.term_index[pheno] for pheno in profile_a]
+            ids_b = [closure_index.term_index[pheno] for pheno in profile_b]
+            mica, _ = self.mica_engine.pairwise_mica_jaccard(ids_a, ids_b, with_jaccard=False)
+            ic_a = closure_index.ic[ids_a][:, np.newaxis]
+            ic_b = closure_index.ic[ids_b][np.newaxis, :]
+            if distance_measure == PairwiseDist.EUCLIDEAN:
+                return np.sqrt((ic_a - mica) ** 2 + (ic_b - mica) ** 2)
+            return ic_a + ic_b - 2 * mica
+
         for index, pheno_a in enumerate(profile_a):
             if index == len(score_matrix):
                 score_matrix.append([])
@@ -108,4 +146,4 @@ class SemanticDist():
                 score_matrix[index].append(
                     sim_fn(pheno_a, pheno_b, self.graph, self.ic_map, self.root)
                 )
-        return score_matrix
\ No newline at end of file
+        return np.array(score_matrix, dtype=np.float64)
\ No newline at end of file
@@ -1,11 +1,15 @@
-from typing import Iterable, Dict, List, Union, Optional
+from typing import Iterable, Dict, List, Set, Union, Optional
 from enum import Enum
 from rdflib import Graph, URIRef, RDFS
 from phenom.similarity import metric
 from phenom.utils import owl_utils
+from phenom.utils.cache import LRUCache, ScoreCache
+from phenom.decorators import cached_score
+from phenom.utils.bitset import ClosureBitset, TermIndex
+from phenom.similarity.group_closure import GroupClosure
+from phenom.similarity.mica import MicaEngine
 from phenom.math import matrix, math_utils
 import math
-from functools import reduce
 import numpy as np
 
 
@@ -31,11 +35,37 @@ class SemanticSim():
             self,
             graph: Graph,
             root: str,
-            ic_map: Dict[str, float]):
+            ic_map: Dict[str, float],
+            score_cache: Optional[ScoreCache] = None,
+            mica_engine: Optional[MicaEngine] = None,
+            cross_species_table: Optional['CrossSpeciesTable'] = None,
+            summary_cache_size: Optional[int] = 10000,
+            closure_cache_size: Optional[int] = 10000):
+        """
+        :param score_cache: cache of profile vs profile scores,
+                            eg for duplicated profiles, off by default
+        :param mica_engine: compute pairwise scores with a MicaEngine
+                            rather than graph closures, eg for large ontologies
+        :param cross_species_table: cross_species.CrossSpeciesTable for
+                                    phenodigm_compare(is_same_species=False)
+        :param summary_cache_size: number of optimal score matrix
+                                   summaries to cache, one per profile
+        :param closure_cache_size: number of phenotype closure bitsets to cache
+        """
         self.graph = graph
         self.root = root
         self.ic_map = ic_map
-
+        self.score_cache = score_cache
+        self.mica_engine = mica_engine
+        self.cross_species_table = cross_species_table
+        self._optimal_summaries = LRUCache(max_size=summary_cache_size)
+        # closures are compared as bitsets over the terms in ic_map,
+        # the bitset of each phenotype's closure is cached
+        self.term_index = TermIndex(sorted(ic_map.keys()))
+        self._closure_bitsets = LRUCache(max_size=closure_cache_size)
+        self.ic_vector = self.term_index.ic_vector(ic_map)
+
+    @cached_score(symmetric=True)
     def sim_gic(
             self,
             profile_a: Iterable[str],
@@ -52,19 +82,11 @@ class SemanticSim():
         profile_a = {pheno for pheno in profile_a if not pheno.startswith("-")}
         profile_b = {pheno for pheno in profile_b if not pheno.startswith("-")}
 
-        a_closure = owl_utils.get_profile_closure(
-            profile_a, self.graph, self.root, predicate)
-        b_closure = owl_utils.get_profile_closure(
-            profile_b, self.graph, self.root, predicate)
+        a_closure = self.profile_bitset(profile_a, predicate)
+        b_closure = self.profile_bitset(profile_b, predicate)
 
-        numerator = reduce(
-            lambda x, y: x + y,
-            [self.ic_map[pheno] for pheno in a_closure.intersection(b_closure)]
-        )
-        denominator = reduce(
-            lambda x, y: x + y,
-            [self.ic_map[pheno] for pheno in a_closure.union(b_closure)]
-        )
+        numerator = a_closure.intersection(b_closure).ic_sum(self.ic_vector)
+        denominator = a_closure.union(b_closure).ic_sum(self.ic_vector)
 
         return numerator/denominator
 
@@ -76,38 +98,7 @@ class SemanticSim():
         Groupwise groupwise resnik similarity
         assumes no negative phenotypes
         """
-        # Filter out negative phenotypes
-        profile_union = set()
-        profile_intersection = set()
-
-        is_first = True
-        for profile in profiles:
-            profile_union = profile_union.union(
-                owl_utils.get_profile_closure(
-                    profile, self.graph, self.root, predicate)
-            )
-            if is_first:
-                profile_intersection = owl_utils.get_profile_closure(
-                    profile, self.graph, self.root, predicate
-                )
-                is_first = False
-            else:
-                profile_intersection = profile_intersection.intersection(
-                    owl_utils.get_profile_closure(
-                        profile, self.graph, self.root, predicate
-                    )
-                )
-
-        numerator = reduce(
-            lambda x, y: x + y,
-            [self.ic_map[pheno] for pheno in profile_intersection]
-        )
-        denominator = reduce(
-            lambda x, y: x + y,
-            [self.ic_map[pheno] for pheno in profile_union]
-        )
-
-        return numerator/denominator
+        return self.group_closure(profiles, predicate).sim_gic()
 
     def groupwise_jaccard(
             self,
@@ -117,30 +108,36 @@ class SemanticSim():
         Groupwise groupwise resnik similarity
         assumes no negative phenotypes
         """
-        # Filter out negative phenotypes
-        profile_union = set()
-        profile_intersection = set()
+        return self.group_closure(profiles, predicate).jaccard()
 
-        is_first = True
+    def group_closure(
+            self,
+            profiles: Optional[Iterable[Iterable[str]]] = (),
+            predicate: Optional[URIRef] = RDFS['subClassOf']) -> GroupClosure:
+        """
+        Intersection and union of the closures of a group of profiles,
+        more profiles can be added to the returned group
+        """
+        group = GroupClosure(
+            self.ic_vector, lambda profile: self.profile_bitset(profile, predicate))
         for profile in profiles:
-            profile_union = profile_union.union(
-                owl_utils.get_profile_closure(
-                    profile, self.graph, self.root, predicate)
-            )
-            if is_first:
-                profile_intersection = owl_utils.get_profile_closure(
-                    profile, self.graph, self.root, predicate
-                )
-                is_first = False
-            else:
-                profile_intersection = profile_intersection.intersection(
-                    owl_utils.get_profile_closure(
-                        profile, self.graph, self.root, predicate
-                    )
-                )
+            group.add(profile)
+        return group
 
-        return len(profile_intersection)/len(profile_union)
+    def profile_bitset(
+            self,
+            profile: Iterable[str],
+            predicate: Optional[URIRef] = RDFS['subClassOf'],
+            negative: Optional[bool] = False) -> ClosureBitset:
+        """
+        Closure of a profile as a bitset over term_index,
+        see owl_utils.get_profile_bitset
+        """
+        return owl_utils.get_profile_bitset(
+            profile, self.graph, self.root, self.term_index, predicate,
+            negative, self._closure_bitsets)
 
+    @cached_score(symmetric=False)
     def cosine_sim(
             self,
             profile_a: Iterable[str],
@@ -163,81 +160,41 @@ class SemanticSim():
         weight negative phenotypes as high as positive phenotypes.  A weight between
         .01-.1 may be desirable
         """
-        def score(term):
-            if ic_weighted:
-                attribute = self.ic_map[term]
-            else:
-                attribute = 1
-            return attribute
-
         positive_a_profile = {item for item in profile_a if not item.startswith('-')}
         negative_a_profile = {item[1:] for item in profile_a if item.startswith('-')}
 
         positive_b_profile = {item for item in profile_b if not item.startswith('-')}
         negative_b_profile = {item[1:] for item in profile_b if item.startswith('-')}
 
-        pos_a_closure = owl_utils.get_profile_closure(
-            positive_a_profile, self.graph, self.root, predicate)
-        pos_b_closure = owl_utils.get_profile_closure(
-            positive_b_profile, self.graph, self.root, predicate)
-
-        neg_a_closure = {"-{}".format(item)
-                         for item in owl_utils.get_profile_closure(
-            negative_a_profile, self.graph, self.root, predicate, negative=True)
-        }
-
-        neg_b_closure = {"-{}".format(item)
-                         for item in owl_utils.get_profile_closure(
-            negative_b_profile, self.graph, self.root, predicate, negative=True)
-        }
-
-        pos_intersect_dot_product = reduce (
-            lambda x, y: x + y,
-            [math.pow(score(item), 2)
-             for item in pos_a_closure.intersection(pos_b_closure)],
-            0
-        )
-
-        neg_intersect_dot_product = reduce(
-            lambda x, y: x + y,
-            [math.pow(score(item) * negative_weight, 2)
-             for item in neg_a_closure.intersection(neg_b_closure)],
-            0
-        )
+        pos_a_closure = self.profile_bitset(positive_a_profile, predicate)
+        pos_b_closure = self.profile_bitset(positive_b_profile, predicate)
 
-        a_square_dot_product = math.sqrt(
-            reduce(
-                lambda x, y: x + y,
-                [math.pow(score(item), 2) for item in pos_a_closure],
-                0
-            ) +
-            reduce(
-                lambda x, y: x + y,
-                [math.pow(score(item) * negative_weight, 2)
-                 for item in neg_a_closure],
-                0
-            )
-        )
+        # negated phenotypes imply their descendants are absent, these are
+        # separate dimensions from the positive phenotypes
+        neg_a_closure = self.profile_bitset(negative_a_profile, predicate, negative=True)
+        neg_b_closure = self.profile_bitset(negative_b_profile, predicate, negative=True)
 
+        def squared_sum(closure: ClosureBitset) -> float:
+            if ic_weighted:
+                return closure.ic_sum(self.ic_vector ** 2)
+            return len(closure)
+
+        negative_weight = negative_weight ** 2
+
+        pos_intersect_dot_product = squared_sum(pos_a_closure & pos_b_closure)
+        neg_intersect_dot_product = negative_weight * squared_sum(neg_a_closure & neg_b_closure)
+
+        a_square_dot_product = math.sqrt(
+            squared_sum(pos_a_closure) + negative_weight * squared_sum(neg_a_closure))
         b_square_dot_product = math.sqrt(
-            reduce(
-                lambda x, y: x + y,
-                [math.pow(score(item), 2) for item in pos_b_closure],
-                0
-            ) +
-            reduce(
-                lambda x, y: x + y,
-                [math.pow(score(item) * negative_weight, 2)
-                 for item in neg_b_closure],
-                0
-            )
-        )
+            squared_sum(pos_b_closure) + negative_weight * squared_sum(neg_b_closure))
 
         numerator = pos_intersect_dot_product + neg_intersect_dot_product
         denominator = a_square_dot_product * b_square_dot_product
 
         return numerator / denominator
 
+    @cached_score(symmetric=True)
     def jaccard_sim(
             self,
             profile_a: Iterable[str],
@@ -251,20 +208,20 @@ class SemanticSim():
         profile_a = {pheno for pheno in profile_a if not pheno.startswith("-")}
         profile_b = {pheno for pheno in profile_b if not pheno.startswith("-")}
 
-        pheno_a_set = owl_utils.get_profile_closure(
-            profile_a, self.graph, self.root, predicate)
-        pheno_b_set = owl_utils.get_profile_closure(
-            profile_b, self.graph, self.root, predicate)
+        pheno_a_set = self.profile_bitset(profile_a, predicate)
+        pheno_b_set = self.profile_bitset(profile_b, predicate)
 
         return metric.jaccard(pheno_a_set, pheno_b_set)
 
+    @cached_score(symmetric='is_symmetric')
     def resnik_sim(
             self,
             profile_a: Iterable[str],
             profile_b: Iterable[str],
             matrix_metric: Union[MatrixMetric, str, None] = MatrixMetric.BMA,
             is_symmetric: Optional[bool]=False,
-            is_normalized: Optional[bool]=False) -> float:
+            is_normalized: Optional[bool]=False,
+            is_non_redundant: Optional[bool]=False) -> float:
         """
         Resnik similarity
 
@@ -278,12 +235,17 @@ class SemanticSim():
         :param is_symmetric: avg(Pa vs Pb, Pb vs Pa) Default: False
         :param is_normalized: Normalize by dividing by the resnik
                               of the optimal matrix Default: False
+        :param is_non_redundant: Reduce profiles to their most specific
+                                 phenotypes before scoring Default: False
         :return: resnik score, a float between 0-MaxIC in cache,
                  if normalized a float between 0-1
         """
         # Filter out negative phenotypes
         profile_a = {pheno for pheno in profile_a if not pheno.startswith("-")}
         profile_b = {pheno for pheno in profile_b if not pheno.startswith("-")}
+        if is_non_redundant:
+            profile_a = self._get_non_redundant(profile_a)
+            profile_b = self._get_non_redundant(profile_b)
 
         if not isinstance(matrix_metric, MatrixMetric):
             matrix_metric = MatrixMetric(matrix_metric.lower())
@@ -294,65 +256,66 @@ class SemanticSim():
             profile_a, profile_b, sim_measure)
 
         if is_normalized:
-            optimal_matrix = self._get_optimal_matrix(
-                profile_a, sim_measure=sim_measure)
+            optimal = self._get_optimal_summary(profile_a, sim_measure)
         else:
-            optimal_matrix = None
+            optimal = None
 
         resnik_score = 0
         if is_symmetric:
             b2a_matrix = matrix.flip_matrix(query_matrix)
-            optimal_b_matrix = self._get_optimal_matrix(
-                profile_b, sim_measure=sim_measure)
+            if is_normalized:
+                optimal_b = self._get_optimal_summary(profile_b, sim_measure)
+            else:
+                optimal_b = None
             resnik_score = math_utils.mean(
                 [self._compute_resnik_score(
-                    query_matrix, optimal_matrix, matrix_metric),
+                    query_matrix, optimal, matrix_metric),
                  self._compute_resnik_score(
-                     b2a_matrix, optimal_b_matrix, matrix_metric)])
+                     b2a_matrix, optimal_b, matrix_metric)])
         else:
             resnik_score = self._compute_resnik_score(
-                query_matrix, optimal_matrix, matrix_metric)
+                query_matrix, optimal, matrix_metric)
 
         return resnik_score
 
     def _compute_resnik_score(
             self,
-            query_matrix: List[List[float]],
-            optimal_matrix: Optional[List[List[float]]] = None,
+            query_matrix: matrix.Matrix,
+            optimal: Optional[matrix.MatrixSummary] = None,
             matrix_metric: Optional[MatrixMetric] = MatrixMetric.BMA )-> float:
-
-        is_normalized = True if optimal_matrix else False
+        """
+        :param optimal: summary of the optimal matrix if normalized,
+                        see _get_optimal_summary
+        """
+        is_normalized = optimal is not None
 
         resnik_score = 0
 
         if matrix_metric == MatrixMetric.BMA:
             if is_normalized:
-                resnik_score = matrix.bma_percentage_score(
-                    query_matrix, optimal_matrix)
+                resnik_score = matrix.sym_bma_score(query_matrix) / optimal.sym_bma
             else:
                 resnik_score = matrix.bma_score(query_matrix)
         elif matrix_metric == MatrixMetric.MAX:
+            resnik_score = matrix.max_score(query_matrix)
             if is_normalized:
-                resnik_score = matrix.max_percentage_score(
-                    query_matrix, optimal_matrix)
-            else:
-                resnik_score = matrix.max_score(query_matrix)
+                resnik_score = resnik_score / optimal.max
         elif matrix_metric == MatrixMetric.AVG:
+            resnik_score = matrix.avg_score(query_matrix)
             if is_normalized:
-                resnik_score = matrix.avg_percentage_score(
-                    query_matrix, optimal_matrix)
-            else:
-                resnik_score = matrix.avg_score(query_matrix)
+                resnik_score = resnik_score / optimal.avg
 
         return resnik_score
 
+    @cached_score(symmetric='is_symmetric')
     def phenodigm_compare(
             self,
             profile_a: Iterable[str],
             profile_b: Iterable[str],
             is_symmetric: Optional[bool]=False,
             is_same_species: Optional[bool]=True,
-            sim_measure: Union[PairwiseSim, str, None]= PairwiseSim.GEOMETRIC
+            sim_measure: Union[PairwiseSim, str, None]= PairwiseSim.GEOMETRIC,
+            is_non_redundant: Optional[bool]=False
     ) -> float:
         """
         Phenodigm algorithm:
@@ -364,47 +327,86 @@ class SemanticSim():
 
         The first is the metric used in the published algorithm, the second
         is used in the owltools OWLTools-Sim package
+
+        is_non_redundant reduces profiles to their most specific phenotypes
+        before scoring, see owl_utils.get_non_redundant_profile
+
+        Cross species comparisons (is_same_species=False) look up pairwise
+        scores in the cross_species_table, see CrossSpeciesTable
         """
         # Filter out negative phenotypes
         profile_a = {pheno for pheno in profile_a if not pheno.startswith("-")}
         profile_b = {pheno for pheno in profile_b if not pheno.startswith("-")}
+        if is_non_redundant:
+            profile_a = self._get_non_redundant(profile_a)
+            profile_b = self._get_non_redundant(profile_b)
 
         if not isinstance(sim_measure, PairwiseSim):
             sim_measure = PairwiseSim(sim_measure.lower())
 
-        query_matrix = self._get_score_matrix(profile_a, profile_b, sim_measure)
         if is_same_species:
-            optimal_matrix = self._get_optimal_matrix(
-                profile_a, is_same_species, sim_measure)
+            query_matrix = self._get_score_matrix(profile_a, profile_b, sim_measure)
         else:
-            raise NotImplementedError
+            query_matrix = self._get_cross_species_table().score_matrix(
+                profile_a, profile_b, sim_measure)
+        query = matrix.summarize(query_matrix)
+        optimal = self._get_optimal_summary(profile_a, sim_measure, is_same_species)
 
         if is_symmetric:
-            b2a_matrix = matrix.flip_matrix(query_matrix)
-            optimal_b_matrix = self._get_optimal_matrix(
-                profile_b, is_same_species, sim_measure)
+            # the flipped matrix has the same max and symmetric bma
+            optimal_b = self._get_optimal_summary(profile_b, sim_measure, is_same_species)
             score = math_utils.mean(
-                [self.compute_phenodigm_score(query_matrix, optimal_matrix),
-                 self.compute_phenodigm_score(b2a_matrix, optimal_b_matrix)])
+                [self._phenodigm_score(query, optimal),
+                 self._phenodigm_score(query, optimal_b)])
         else:
-            score = self.compute_phenodigm_score(query_matrix, optimal_matrix)
+            score = self._phenodigm_score(query, optimal)
 
         return score
 
     @staticmethod
     def compute_phenodigm_score(
-            query_matrix: List[List[float]],
-            optimal_matrix: List[List[float]]) -> float:
+            query_matrix: matrix.Matrix,
+            optimal_matrix: matrix.Matrix) -> float:
+        return SemanticSim._phenodigm_score(
+            matrix.summarize(query_matrix), matrix.summarize(optimal_matrix))
+
+    @staticmethod
+    def _phenodigm_score(
+            query: matrix.MatrixSummary,
+            optimal: matrix.MatrixSummary) -> float:
         return 100 * math_utils.mean(
-            [matrix.max_percentage_score(query_matrix, optimal_matrix),
-             matrix.bma_percentage_score(query_matrix, optimal_matrix)])
+            [query.max / optimal.max, query.sym_bma / optimal.sym_bma])
+
+    def _get_optimal_summary(
+            self,
+            profile: Iterable[str],
+            sim_measure: PairwiseSim,
+            is_same_species: Optional[bool] = True) -> matrix.MatrixSummary:
+        """
+        Summary of the optimal matrix of a profile, cached so comparing
+        one profile against many only builds it once
+        """
+        profile = frozenset(profile)
+        return self._optimal_summaries.get_or_compute(
+            (profile, sim_measure, is_same_species),
+            lambda: matrix.summarize(
+                self._get_optimal_matrix(profile, is_same_species, sim_measure)))
+
+    def _get_cross_species_table(self) -> 'CrossSpeciesTable':
+        if self.cross_species_table is None:
+            raise NotImplementedError(
+                "Cross species comparisons require a cross_species_table")
+        return self.cross_species_table
+
+    def _get_non_redundant(self, profile: Iterable[str]) -> Set[str]:
+        return owl_utils.get_non_redundant_profile(profile, self.graph, self.root)
 
     def _get_score_matrix(
             self,
             profile_a: Iterable[str],
             profile_b: Iterable[str],
             sim_measure: Union[PairwiseSim, None] = PairwiseSim.IC
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
 
         score_matrix = [[]]
 
@@ -415,6 +417,16 @@ class SemanticSim():
         else:
             raise NotImplementedError
 
+        if self.mica_engine is not None:
+            term_index = self.mica_engine.closure_index.term_index
+            mica, jaccard = self.mica_engine.pairwise_mica_jaccard(
+                [term_index[pheno] for pheno in profile_a],
+                [term_index[pheno] for pheno in profile_b],
+                with_jaccard=sim_measure == PairwiseSim.GEOMETRIC)
+            if sim_measure == PairwiseSim.GEOMETRIC:
+                return (jaccard * mica) ** (1/2)
+            return mica
+
         for index, pheno_a in enumerate(profile_a):
             if index == len(score_matrix):
                 score_matrix.append([])
@@ -422,16 +434,17 @@ class SemanticSim():
                 score_matrix[index].append(
                     sim_fn(pheno_a, pheno_b, self.graph, self.ic_map, self.root)
                 )
-        return score_matrix
+        return np.array(score_matrix, dtype=np.float64)
 
     def _get_optimal_matrix(
             self,
             profile: Iterable[str],
             is_same_species: Optional[bool]=True,
             sim_measure: Union[PairwiseSim, None]= PairwiseSim.IC
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
         """
-        Only implemented for same species comparisons
+        The score of each phenotype against itself, or for cross species
+        comparisons its best score against the other species
         """
         score_matrix = []
         if is_same_species:
@@ -444,5 +457,6 @@ class SemanticSim():
                 else:
                     raise NotImplementedError
         else:
-            raise NotImplementedError
-        return score_matrix
+            score_matrix = self._get_cross_species_table().optimal_scores(
+                profile, sim_measure)
+        return np.array(score_matrix, dtype=np.float64).reshape(-1, 1)
@@ -0,0 +1,165 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+import math
+import numpy as np
+
+"""
+Closures as bitsets over a numbering of ontology terms
+
+A closure of HPO (~16k terms) fits in a 2KB python int, so set algebra
+on closures is a handful of machine word operations rather than hashing
+every term of every set.  Many sets can also be packed into the rows
+of a uint64 array, to compare them all at once with numpy
+"""
+
+# number of set bits in each byte value
+_BYTE_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+popcount = getattr(int, 'bit_count', _popcount)
+
+
+class TermIndex():
+    """
+    Assigns each term a bit position, terms that are not yet
+    indexed are appended when first seen
+    """
+
+    def __init__(self, terms: Optional[Iterable[str]] = ()):
+        self.terms: List[str] = []
+        self.positions: Dict[str, int] = {}
+        for term in terms:
+            self.position(term)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def position(self, term: str) -> int:
+        try:
+            return self.positions[term]
+        except KeyError:
+            self.positions[term] = len(self.terms)
+            self.terms.append(term)
+            return self.positions[term]
+
+    def bitset(self, terms: Iterable[str]) -> 'ClosureBitset':
+        bits = 0
+        for term in terms:
+            bits |= 1 << self.position(term)
+        return ClosureBitset(bits)
+
+    def decode(self, bitset: 'ClosureBitset') -> List[str]:
+        return [self.terms[position] for position in bitset]
+
+    def ic_vector(self, ic_map: Dict[str, float]) -> np.ndarray:
+        """
+        Information content of each indexed term, by position
+        """
+        return np.array([ic_map[term] for term in self.terms], dtype=np.float64)
+
+
+class ClosureBitset():
+    """
+    A set of term positions in a TermIndex, stored as the bits of an int
+
+    Supports the set operations used by similarity metrics, so it
+    can be passed to functions written for sets, eg metric.jaccard
+    """
+    __slots__ = ('bits',)
+
+    def __init__(self, bits: Optional[int] = 0):
+        self.bits = bits
+
+    def intersection(self, *others: 'ClosureBitset') -> 'ClosureBitset':
+        bits = self.bits
+        for other in others:
+            bits &= other.bits
+        return ClosureBitset(bits)
+
+    def union(self, *others: 'ClosureBitset') -> 'ClosureBitset':
+        bits = self.bits
+        for other in others:
+            bits |= other.bits
+        return ClosureBitset(bits)
+
+    def symmetric_difference(self, other: 'ClosureBitset') -> 'ClosureBitset':
+        return ClosureBitset(self.bits ^ other.bits)
+
+    def difference(self, other: 'ClosureBitset') -> 'ClosureBitset':
+        return ClosureBitset(self.bits & ~other.bits)
+
+    __and__ = intersection
+    __or__ = union
+    __xor__ = symmetric_difference
+    __sub__ = difference
+
+    def __len__(self) -> int:
+        return popcount(self.bits)
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ClosureBitset) and self.bits == other.bits
+
+    def __hash__(self) -> int:
+        return hash(self.bits)
+
+    def __contains__(self, position: int) -> bool:
+        return (self.bits >> position) & 1 == 1
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.positions().tolist())
+
+    def positions(self) -> np.ndarray:
+        """
+        Sorted positions of the set bits
+        """
+        num_bytes = (self.bits.bit_length() + 7) // 8
+        as_bytes = np.frombuffer(self.bits.to_bytes(num_bytes, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(as_bytes, bitorder='little'))
+
+    def ic_sum(self, ic_vector: np.ndarray) -> float:
+        """
+        Summed information content of the terms in the set
+
+        :param ic_vector: IC by term position, see TermIndex.ic_vector
+        """
+        return math.fsum(ic_vector[self.positions()].tolist())
+
+
+def pack_rows(rows: np.ndarray) -> np.ndarray:
+    """
+    Pack a 2-D boolean array into bitsets, one row of uint64 words per row
+    """
+    rows = np.asarray(rows, dtype=bool)
+    num_words = (rows.shape[1] + 63) // 64
+    packed = np.zeros((rows.shape[0], num_words * 8), dtype=np.uint8)
+    packed[:, :(rows.shape[1] + 7) // 8] = np.packbits(rows, axis=1, bitorder='little')
+    return packed.view(np.uint64)
+
+
+def pack_sets(sets: Iterable[Iterable[str]], term_index: TermIndex) -> np.ndarray:
+    """
+    Pack sets of terms into bitsets over the positions of a term index,
+    terms that are not in the index are ignored
+    """
+    sets = list(sets)
+    rows = np.zeros((len(sets), len(term_index)), dtype=bool)
+    for row, terms in enumerate(sets):
+        rows[row, [term_index.positions[term] for term in terms
+                   if term in term_index.positions]] = True
+    return pack_rows(rows)
+
+
+def popcount_words(words: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits in each uint64 word
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    as_bytes = np.ascontiguousarray(words).view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].reshape(words.shape + (8,)).sum(axis=-1)
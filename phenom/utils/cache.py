@@ -0,0 +1,209 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from collections import OrderedDict
+from phenom.utils.bitset import TermIndex
+import sqlite3
+import threading
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+A disk backed cache for json responses from remote services,
+used by phenom.monarch to avoid re-fetching scigraph and solr
+results across runs, and in memory LRU caches, eg of similarity scores
+"""
+
+
+class ResponseCache():
+    """
+    SQLite cache of json responses keyed by url and request parameters
+
+    Entries older than ttl seconds are refetched, if ttl is None
+    entries never expire.  In offline mode the network is never used,
+    expired entries are served as is and a cache miss raises a LookupError
+
+    The cache may be shared by threads, eg concurrent solr paging
+    """
+
+    def __init__(
+            self,
+            path: str,
+            ttl: Optional[float] = None,
+            offline: Optional[bool] = False):
+        self.path = path
+        self.ttl = ttl
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS response ("
+            "key TEXT PRIMARY KEY, "
+            "body TEXT NOT NULL, "
+            "created REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict] = None) -> str:
+        """
+        Canonical key for a request, parameter order does not matter
+        """
+        return json.dumps([url, params or {}], sort_keys=True)
+
+    def get(self, url: str, params: Optional[Dict] = None) -> Optional[Any]:
+        """
+        Return the cached response, or None if it is missing or expired
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, created FROM response WHERE key = ?",
+                (self.make_key(url, params),)
+            ).fetchone()
+        if row is None:
+            return None
+        body, created = row
+        if not self.offline and self.ttl is not None \
+                and time.time() - created > self.ttl:
+            return None
+        return json.loads(body)
+
+    def set(self, url: str, params: Optional[Dict], response: Any) -> None:
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO response (key, body, created) "
+                "VALUES (?, ?, ?)",
+                (self.make_key(url, params), json.dumps(response), time.time())
+            )
+            self.connection.commit()
+
+    def fetch(
+            self,
+            url: str,
+            params: Optional[Dict],
+            fetch_fn: Callable[[], Any]) -> Any:
+        """
+        Return the cached response for a request, calling fetch_fn
+        and storing its result on a miss
+
+        :raises LookupError: on a cache miss in offline mode
+        """
+        response = self.get(url, params)
+        if response is not None:
+            self.hits += 1
+            return response
+        self.misses += 1
+        if self.offline:
+            raise LookupError("No cached response for {} {} "
+                              "in offline mode".format(url, params))
+        response = fetch_fn()
+        self.set(url, params, response)
+        return response
+
+    def clear(self) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM response")
+            self.connection.commit()
+
+    def close(self) -> None:
+        logger.info("Response cache {}: {} hits, {} misses".format(
+            self.path, self.hits, self.misses))
+        self.connection.close()
+
+
+class LRUCache():
+    """
+    Bounded, least recently used in memory cache, with hit and
+    miss counts, eg of closure bitsets or term pair MICAs
+
+    The cache may be shared by threads, values are computed outside
+    the lock so two threads may compute the same value on a miss
+    """
+
+    def __init__(self, max_size: Optional[int] = 100000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.values: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get_or_compute(self, key: Hashable, value_fn: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, calling value_fn and
+        storing its result on a miss
+        """
+        with self.lock:
+            if key in self.values:
+                self.hits += 1
+                self.values.move_to_end(key)
+                return self.values[key]
+            self.misses += 1
+        value = value_fn()
+        with self.lock:
+            self.values[key] = value
+            if len(self.values) > self.max_size:
+                self.values.popitem(last=False)
+        return value
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'size': len(self.values),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate()
+        }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.values.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class ScoreCache(LRUCache):
+    """
+    Bounded, least recently used cache of profile vs profile scores
+
+    Keys are the metric, both profiles as sorted term id tuples and
+    the metric parameters, so duplicate profiles (eg simulated patients,
+    diseases with identical annotations) are scored once.  Symmetric
+    comparisons store (a, b) and (b, a) under the same key.
+
+    See decorators.cached_score, and the score_cache argument of
+    SemanticSim and SemanticDist
+    """
+
+    @staticmethod
+    def profile_key(profile: Iterable[str], term_index: TermIndex) -> Tuple[int, ...]:
+        """
+        Canonical key for a profile, the sorted and deduplicated term
+        positions, negated phenotypes are stored as -(position + 1)
+        """
+        positions = set()
+        for pheno in profile:
+            if pheno.startswith("-"):
+                positions.add(-(term_index.position(pheno[1:]) + 1))
+            else:
+                positions.add(term_index.position(pheno))
+        return tuple(sorted(positions))
+
+    @staticmethod
+    def make_key(
+            metric: str,
+            profile_a: Tuple[int, ...],
+            profile_b: Tuple[int, ...],
+            params: Hashable,
+            is_symmetric: Optional[bool] = False) -> Tuple:
+        if is_symmetric and profile_b < profile_a:
+            profile_a, profile_b = profile_b, profile_a
+        return metric, profile_a, profile_b, params
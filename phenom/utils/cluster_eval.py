@@ -0,0 +1,86 @@
+from typing import Iterable, Iterator, NamedTuple, Sequence
+from scipy.cluster.hierarchy import is_monotonic
+from phenom.utils.bitset import ClosureBitset
+from phenom.similarity.group_closure import GroupClosure
+import numpy as np
+
+"""
+Evaluate the flat clusters of a hierarchical clustering at many
+distance thresholds, eg to choose where to cut a dendrogram
+
+The linkage is walked once in merge order, each cluster is the
+GroupClosure of one of the two clusters it merges with the other
+merged into it, so profile closures are only computed once per profile
+"""
+
+
+class ClusterLevel(NamedTuple):
+    """
+    The flat clusters formed at a distance threshold, as
+    scipy.cluster.hierarchy.fcluster(Z, distance, 'distance'),
+    with the size, groupwise simGIC and groupwise jaccard of each
+    """
+    distance: float
+    sizes: np.ndarray
+    sim_gic: np.ndarray
+    jaccard: np.ndarray
+
+
+def walk_clusters(
+        linkage_matrix: np.ndarray,
+        closures: Sequence[ClosureBitset],
+        ic_vector: np.ndarray,
+        distances: Iterable[float]) -> Iterator[ClusterLevel]:
+    """
+    :param linkage_matrix: scipy linkage, must be monotonic, eg ward
+    :param closures: closure of each clustered profile, in linkage order
+    :param ic_vector: IC by term position, see TermIndex.ic_vector
+    :param distances: thresholds, levels are yielded in ascending order
+    :raises ValueError: if the linkage is not monotonic or does not
+                        match the number of closures
+    """
+    linkage_matrix = np.asarray(linkage_matrix, dtype=np.float64)
+    num_leaves = len(closures)
+    if len(linkage_matrix) != num_leaves - 1:
+        raise ValueError("Linkage has {} merges, expected {} for {} profiles".format(
+            len(linkage_matrix), num_leaves - 1, num_leaves))
+    if num_leaves > 1 and not is_monotonic(linkage_matrix):
+        raise ValueError("Linkage is not monotonic, flat clusters at a distance "
+                         "are not formed by a prefix of the merges")
+
+    # cluster ids as in the linkage, leaves then one per merge
+    num_nodes = 2 * num_leaves - 1
+    groups = [GroupClosure(ic_vector).add(closure) for closure in closures] \
+        + [None] * (num_leaves - 1)
+    sizes = np.zeros(num_nodes, dtype=np.int64)
+    sim_gic = np.zeros(num_nodes)
+    jaccard = np.zeros(num_nodes)
+    is_active = np.zeros(num_nodes, dtype=bool)
+
+    sizes[:num_leaves] = 1
+    sim_gic[:num_leaves] = 1
+    jaccard[:num_leaves] = 1
+    is_active[:num_leaves] = True
+
+    merge = 0
+    for distance in sorted(distances):
+        while merge < len(linkage_matrix) and linkage_matrix[merge, 2] <= distance:
+            left, right = int(linkage_matrix[merge, 0]), int(linkage_matrix[merge, 1])
+            node = num_leaves + merge
+            # merged clusters are never needed again, so reuse the larger
+            if len(groups[left]) < len(groups[right]):
+                left, right = right, left
+            groups[node] = groups[left].merge(groups[right])
+            groups[left] = groups[right] = None
+            sizes[node] = len(groups[node])
+            sim_gic[node] = groups[node].sim_gic()
+            jaccard[node] = groups[node].jaccard()
+            is_active[[left, right]] = False
+            is_active[node] = True
+            merge += 1
+
+        yield ClusterLevel(
+            distance=float(distance),
+            sizes=sizes[is_active],
+            sim_gic=sim_gic[is_active],
+            jaccard=jaccard[is_active])
@@ -0,0 +1,170 @@
+from typing import List, Optional, Sequence, Tuple
+from phenom.model.synthetic import SyntheticProfile
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.utils.pool import SharedArrays, with_prefix
+import numpy
+import logging
+
+"""
+Multi-label evaluation, treating each disease in a corpus as a label
+and counting true/false positives/negatives per disease and threshold
+
+https://scikit-learn.org/stable/modules/generated/sklearn.metrics.multilabel_confusion_matrix.html
+"""
+
+
+def encode_synthetic_profiles(
+        synthetic_profiles: List[SyntheticProfile],
+        corpus: ProfileCorpus) -> Tuple[ProfileCorpus, numpy.ndarray]:
+    """
+    Encode synthetic profiles against the closure index of a corpus
+
+    Phenotypes not in the closure index are dropped with a warning, as
+    are profiles left with no phenotypes, so the ids of the returned
+    profiles are their positions in synthetic_profiles
+
+    :return: the profiles as a ProfileCorpus, and the corpus index
+             of the disease of each profile, -1 if not in the corpus
+    """
+    term_index = corpus.closure_index.term_index
+    profiles = {}
+    labels = []
+    unknown = set()
+    for index, syn_profile in enumerate(synthetic_profiles):
+        phenotypes = []
+        for pheno in syn_profile.phenotypes:
+            term = pheno[1:] if pheno.startswith("-") else pheno
+            if term in term_index:
+                phenotypes.append(pheno)
+            else:
+                unknown.add(term)
+        if all(pheno.startswith("-") for pheno in phenotypes):
+            logging.warning("Skipping profile {} of {}, no phenotypes in the closures".format(
+                syn_profile.id, syn_profile.disease))
+            continue
+        profiles[str(index)] = phenotypes
+        labels.append(corpus.id_index.get(syn_profile.disease, -1))
+    if unknown:
+        logging.warning("Dropped {} phenotypes not in the closures, eg {}".format(
+            len(unknown), sorted(unknown)[0]))
+    patients = ProfileCorpus(corpus.closure_index, profiles)
+    return patients, numpy.array(labels, dtype=numpy.int64)
+
+
+def create_multilabel_confusion(
+        synthetic_profiles: List[SyntheticProfile],
+        corpus_sim: CorpusSim,
+        thresholds: Sequence[float]) -> numpy.ndarray:
+    """
+    Score each synthetic profile against every disease in the corpus
+    with phenodigm, a disease is called positive at a threshold if
+    the score is >= the threshold
+
+    :return: diseases x thresholds x 4 array of
+             true_pos, false_pos, false_neg, true_neg
+    """
+    patients, labels = encode_synthetic_profiles(synthetic_profiles, corpus_sim.corpus)
+    return multilabel_confusion(patients, labels, corpus_sim, thresholds)
+
+
+def multilabel_confusion(
+        patients: ProfileCorpus,
+        labels: numpy.ndarray,
+        corpus_sim: CorpusSim,
+        thresholds: Sequence[float],
+        patient_indices: Optional[Sequence[int]] = None) -> numpy.ndarray:
+    """
+    create_multilabel_confusion for encoded profiles, see
+    encode_synthetic_profiles
+
+    Rather than updating every threshold for every disease, each score
+    is binned by the number of thresholds it clears and the bins are
+    summed once at the end.  Results for groups of profiles can be
+    merged by adding the arrays
+
+    :param patient_indices: only evaluate these profiles
+    :return: diseases x thresholds x 4 array of
+             true_pos, false_pos, false_neg, true_neg
+    """
+    if patient_indices is None:
+        patient_indices = range(len(patients))
+    thresholds = numpy.asarray(thresholds, dtype=numpy.float64)
+    order = numpy.argsort(thresholds, kind='stable')
+    ascending = thresholds[order]
+
+    num_diseases = len(corpus_sim.corpus)
+    num_bins = len(thresholds) + 1
+    bin_offsets = numpy.arange(num_diseases) * num_bins
+
+    # number of profiles per disease and bin, for all and positive profiles
+    all_hist = numpy.zeros(num_diseases * num_bins, dtype=numpy.int64)
+    positive_hist = numpy.zeros(num_diseases * num_bins, dtype=numpy.int64)
+    positive_count = numpy.zeros(num_diseases, dtype=numpy.int64)
+
+    for count, patient_index in enumerate(patient_indices):
+        if count % 100 == 0:
+            logging.info("Processed {} profiles out of {}".format(
+                count, len(patient_indices)))
+
+        scores = corpus_sim.phenodigm_id_scores(patients.profile(patient_index))
+        bins = bin_offsets + numpy.searchsorted(ascending, scores, side='right')
+        all_hist[bins] += 1
+
+        disease_index = labels[patient_index]
+        if disease_index >= 0:
+            positive_hist[bins[disease_index]] += 1
+            positive_count[disease_index] += 1
+
+    def clears_threshold(hist: numpy.ndarray) -> numpy.ndarray:
+        # profiles in bins above k clear the kth ascending threshold
+        hist = hist.reshape(num_diseases, num_bins)
+        cleared = numpy.cumsum(hist[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        by_threshold = numpy.empty_like(cleared)
+        by_threshold[:, order] = cleared
+        return by_threshold
+
+    true_pos = clears_threshold(positive_hist)
+    false_pos = clears_threshold(all_hist) - true_pos
+    false_neg = positive_count[:, numpy.newaxis] - true_pos
+    true_neg = (len(patient_indices) - positive_count)[:, numpy.newaxis] - false_pos
+
+    return numpy.stack([true_pos, false_pos, false_neg, true_neg], axis=2)
+
+
+def publish_multilabel_inputs(
+        patients: ProfileCorpus,
+        labels: numpy.ndarray,
+        corpus: ProfileCorpus,
+        thresholds: Sequence[float]) -> SharedArrays:
+    """
+    Publish the inputs of multilabel_confusion_worker and a zeroed
+    diseases x thresholds x 4 'confusion' output array
+    """
+    return SharedArrays({
+        **with_prefix('index', corpus.closure_index.to_arrays()),
+        **with_prefix('corpus', corpus.to_arrays()),
+        **with_prefix('patients', patients.to_arrays()),
+        'labels': labels,
+        'thresholds': numpy.asarray(thresholds, dtype=numpy.float64),
+        'confusion': numpy.zeros((len(corpus), len(thresholds), 4), dtype=numpy.int64),
+    })
+
+
+def multilabel_confusion_worker(
+        arrays: SharedArrays,
+        patient_indices: Sequence[int],
+        lock) -> None:
+    """
+    pool.run_workers target, runs multilabel_confusion over arrays published
+    with publish_multilabel_inputs and adds the result to arrays['confusion']
+    """
+    closure_index = ClosureIndex.from_arrays(arrays.group('index'))
+    corpus_sim = CorpusSim(ProfileCorpus.from_arrays(closure_index, arrays.group('corpus')))
+    patients = ProfileCorpus.from_arrays(closure_index, arrays.group('patients'))
+
+    confusion = multilabel_confusion(
+        patients, arrays['labels'], corpus_sim, arrays['thresholds'], patient_indices)
+    with lock:
+        arrays['confusion'][...] += confusion
@@ -1,5 +1,7 @@
 from typing import Set, List, Optional, Dict, Iterable
 from phenom.decorators import memoized
+from phenom.utils.bitset import ClosureBitset, TermIndex
+from phenom.utils.cache import LRUCache
 from rdflib import URIRef, BNode, Literal, Graph, RDFS
 from prefixcommons import contract_uri, expand_uri
 from prefixcommons.curie_util import NoExpansion
@@ -135,6 +137,67 @@ def get_profile_closure(
     )
 
 
+def get_non_redundant_profile(
+        profile: Iterable[str],
+        graph: Graph,
+        root: str,
+        predicate: Optional[URIRef] = RDFS['subClassOf']) -> Set[str]:
+    """
+    Reduce a profile to its most specific terms, dropping duplicates and
+    any phenotype that is an ancestor of another phenotype in the profile.
+    Negated phenotypes are kept as they are
+
+    The closure of the profile is unchanged, so closure based metrics
+    (simGIC, jaccard) are the same, but matrix based metrics (resnik,
+    phenodigm) can differ as they score every term
+    """
+    profile = set(profile)
+    phenotypes = {pheno for pheno in profile if not pheno.startswith("-")}
+    redundant = set()
+    for pheno in phenotypes:
+        ancestors = get_closure(graph, pheno, predicate, root, reflexive=True)
+        redundant |= (ancestors & phenotypes) - {pheno}
+    return profile - redundant
+
+
+def get_profile_bitset(
+        profile: Iterable[str],
+        graph: Graph,
+        root: str,
+        term_index: TermIndex,
+        predicate: Optional[URIRef] = RDFS['subClassOf'],
+        negative: Optional[bool] = False,
+        cache: Optional[LRUCache] = None) -> ClosureBitset:
+    """
+    get_profile_closure as a bitset over the positions of a TermIndex
+
+    :param cache: cache of the bitset of each phenotype's closure, only
+                  valid for one graph, root and term index, eg owned by
+                  the SemanticSim that holds the term index
+    """
+    bitset = ClosureBitset()
+    for pheno in profile:
+        if cache is None:
+            bitset |= _get_closure_bitset(graph, pheno, term_index, predicate, root, negative)
+        else:
+            bitset |= cache.get_or_compute(
+                (pheno, predicate, negative),
+                lambda: _get_closure_bitset(
+                    graph, pheno, term_index, predicate, root, negative))
+    return bitset
+
+
+def _get_closure_bitset(
+        graph: Graph,
+        node: str,
+        term_index: TermIndex,
+        edge: Optional[URIRef] = RDFS['subClassOf'],
+        root: Optional[str] = None,
+        negative: Optional[bool] = False) -> ClosureBitset:
+    return term_index.bitset(
+        get_closure(graph, node, edge, root, reflexive=True, negative=negative))
+
+
 def label(curie: str, graph: Graph) -> str:
     """
     Given a list of phenotypes, get the reflexive closure for each phenotype
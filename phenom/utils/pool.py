@@ -0,0 +1,211 @@
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+from multiprocessing import Process, Queue
+from queue import Empty
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+Worker processes over numpy arrays published once to shared memory,
+rather than pickled or copied into every process
+
+Workers receive small handles to the arrays, and either write results
+into shared output arrays (run_workers) or stream small batches of
+results back to the parent as they go (stream_workers)
+"""
+
+# shared memory name, array shape, dtype
+ArrayHandle = Tuple[str, Tuple[int, ...], str]
+
+
+class SharedArrays():
+    """
+    A named collection of numpy arrays in shared memory
+
+    The publishing process owns the memory and unlinks it on close(),
+    worker processes attach to it with SharedArrays.attach(handles)
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.is_owner = True
+        self.handles: Dict[str, ArrayHandle] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        self._memory = []
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._memory.append(memory)
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+            shared[...] = array
+            self.arrays[name] = shared
+            self.handles[name] = (memory.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(handles: Dict[str, ArrayHandle]) -> 'SharedArrays':
+        shared_arrays = SharedArrays({})
+        shared_arrays.is_owner = False
+        shared_arrays.handles = handles
+        for name, (memory_name, shape, dtype) in handles.items():
+            memory = SharedMemory(name=memory_name)
+            shared_arrays._memory.append(memory)
+            shared_arrays.arrays[name] = np.ndarray(
+                shape, dtype=np.dtype(dtype), buffer=memory.buf)
+        return shared_arrays
+
+    def group(self, prefix: str) -> Dict[str, np.ndarray]:
+        """
+        Arrays published with with_prefix(prefix, arrays), without the prefix
+        """
+        return {
+            name[len(prefix) + 1:]: array for name, array in self.arrays.items()
+            if name.startswith(prefix + '.')
+        }
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    def close(self) -> None:
+        """
+        Release the arrays, unlinking the memory if this process owns it
+        """
+        self.arrays = {}
+        for memory in self._memory:
+            memory.close()
+            if self.is_owner:
+                memory.unlink()
+        self._memory = []
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def with_prefix(prefix: str, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Namespace a group of arrays, eg the to_arrays() of two corpora,
+    so they can be published together and read back with SharedArrays.group
+    """
+    return {'{}.{}'.format(prefix, name): array for name, array in arrays.items()}
+
+
+def run_workers(
+        target: Callable,
+        chunks: Sequence[Any],
+        shared_arrays: SharedArrays,
+        args: Optional[Tuple] = ()) -> None:
+    """
+    Run target(arrays, chunk, *args) in one process per chunk, where
+    arrays is shared_arrays attached in the worker, and wait for them
+
+    Chunks and args should be small, eg index ranges, any large
+    read-only data belongs in shared_arrays.  Workers return results by
+    writing to output arrays in shared_arrays, using a multiprocessing
+    Lock in args if they accumulate into the same array
+
+    :raises RuntimeError: if any worker exits with an error
+    """
+    procs = []
+    for chunk in chunks:
+        proc = Process(target=_run_worker,
+                       args=(target, shared_arrays.handles, chunk, args))
+        proc.start()
+        procs.append(proc)
+
+    for proc in procs:
+        proc.join()
+
+    failed = [proc.exitcode for proc in procs if proc.exitcode != 0]
+    if failed:
+        raise RuntimeError("{} of {} workers failed, exit codes {}".format(
+            len(failed), len(procs), failed))
+
+
+def _run_worker(
+        target: Callable,
+        handles: Dict[str, ArrayHandle],
+        chunk: Any,
+        args: Tuple) -> None:
+    shared_arrays = SharedArrays.attach(handles)
+    try:
+        target(shared_arrays, chunk, *args)
+    finally:
+        shared_arrays.close()
+
+
+def stream_workers(
+        target: Callable,
+        chunks: Sequence[Any],
+        shared_arrays: Optional[SharedArrays] = None,
+        args: Optional[Tuple] = (),
+        timeout: Optional[float] = 1.0) -> Iterator[Any]:
+    """
+    Run target(arrays, chunk, emit, *args) in one process per chunk,
+    where arrays is shared_arrays attached in the worker (or None),
+    and yield each batch a worker passes to emit() as it arrives
+
+    Workers should emit fixed size batches, eg arrays of a few thousand
+    results, so the parent can reduce them as they arrive rather than
+    receiving one large result per worker at the end
+
+    :param timeout: seconds to wait for a batch before checking
+                    whether any worker has died
+    :raises RuntimeError: if any worker exits with an error, the
+                          remaining workers are terminated
+    """
+    queue = Queue()
+    handles = shared_arrays.handles if shared_arrays is not None else None
+    procs = []
+    for index, chunk in enumerate(chunks):
+        proc = Process(target=_run_stream_worker,
+                       args=(target, handles, chunk, args, queue, index))
+        proc.start()
+        procs.append(proc)
+
+    running = set(range(len(procs)))
+    try:
+        while running:
+            try:
+                index, is_done, batch = queue.get(timeout=timeout)
+            except Empty:
+                failed = [proc.exitcode for proc in procs
+                          if proc.exitcode is not None and proc.exitcode != 0]
+                if failed:
+                    raise RuntimeError("{} of {} workers failed, exit codes {}".format(
+                        len(failed), len(procs), failed))
+                continue
+            if is_done:
+                running.remove(index)
+            else:
+                yield batch
+    finally:
+        for proc in procs:
+            if running:
+                proc.terminate()
+            proc.join()
+
+
+def _run_stream_worker(
+        target: Callable,
+        handles: Optional[Dict[str, ArrayHandle]],
+        chunk: Any,
+        args: Tuple,
+        queue: Queue,
+        index: int) -> None:
+
+    def emit(batch: Any) -> None:
+        queue.put((index, False, batch))
+
+    shared_arrays = SharedArrays.attach(handles) if handles is not None else None
+    try:
+        target(shared_arrays, chunk, emit, *args)
+    finally:
+        if shared_arrays is not None:
+            shared_arrays.close()
+    queue.put((index, True, None))
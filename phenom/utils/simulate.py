@@ -1,10 +1,9 @@
-from typing import Dict, Set, FrozenSet, Optional, List
+from typing import Callable, Dict, Set, FrozenSet, Optional, List, Union, Sequence
 from phenom.utils.owl_utils import get_closure
-from phenom.math.math_utils import binomial_coeff
 from phenom.monarch import owlsim_classify
 from phenom.model.synthetic import SyntheticProfile
 from rdflib import Graph, RDFS
-from multiprocessing import Queue
+from phenom.utils.pool import SharedArrays
 import numpy
 import random
 import logging
@@ -77,57 +76,76 @@ def simulate_from_derived(
     return frozenset(phenotypes)
 
 
-def average_ties(previous_rank: int, tie_count: int) -> int:
-    deranked_summed = \
-        binomial_coeff(previous_rank + (tie_count)) - \
-        binomial_coeff(previous_rank)
-    return round(deranked_summed / tie_count)
-
-
 def rerank_by_average(ranks: List[int]) -> List[int]:
     """
     Given a list of ranked results, averages ties and
     reranks following
     :return: List of ranks
     """
-    # list to store adjusted ranks
-    avg_ranks = []
-    # Resolve ties, take the average rank
-    last_rank = 1
-    last_avg_rank = 0
-    tie_count = 1
-    is_first = True
-    for rank in ranks[1:]:
-        if rank > last_rank:
-            if tie_count == 1:
-                last_avg_rank += 1
-                if is_first:
-                    avg_ranks.append(1)
-                    is_first = False
-                else:
-                    avg_ranks.append(last_avg_rank)
-            else:
-                avg_rank = average_ties(last_avg_rank, tie_count)
-                tied_ranks = [avg_rank for n in range(tie_count)]
-                avg_ranks.extend(tied_ranks)
-                # reset tie count
-                last_avg_rank = avg_rank
-                tie_count = 1
-        else:
-            tie_count += 1
-            is_first = False
-
-        last_rank = rank
+    return batch_rerank_by_average([ranks])[0].tolist()
 
-    if tie_count > 0:
-        avg_rank = average_ties(last_avg_rank, tie_count)
-        tied_ranks = [avg_rank for n in range(tie_count)]
-        avg_ranks.extend(tied_ranks)
-    else:
-        last_avg_rank += 1
-        avg_ranks.append(last_avg_rank)
 
-    return avg_ranks
+def batch_rerank_by_average(rank_lists: Sequence[Sequence[int]]) -> List[numpy.ndarray]:
+    """
+    Given a batch of ranked result lists (sorted by rank, starting at 1),
+    averages ties and reranks following, see rerank_by_average
+
+    A group of t tied results following a result reranked as p is
+    reranked as the mean of the ranks p + 1 to p + t it would take
+    without ties, rounded half to even, round(p + (t + 1) / 2):
+    - for odd t this is p + (t + 1) // 2
+    - for even t the .5 rounds to even, so the group is reranked as the
+      even one of p + t // 2 and p + t // 2 + 1
+
+    Results reranked after an even group are therefore even, so within a
+    list the parity correction for an even group only depends on the
+    increments summed since the previous even group, which makes the
+    whole batch a handful of cumulative sums
+    :return: List of arrays of ranks, one per input list
+    """
+    lengths = numpy.array([len(ranks) for ranks in rank_lists], dtype=numpy.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return [numpy.zeros(0, dtype=numpy.int64) for _ in rank_lists]
+
+    ranks = numpy.concatenate(
+        [numpy.asarray(ranks, dtype=numpy.int64) for ranks in rank_lists])
+    list_starts = numpy.cumsum(lengths) - lengths
+    list_starts = list_starts[lengths > 0]
+
+    # A tie group starts at the first result of a list and wherever the
+    # rank increases, the first rank of each list is compared as 1
+    shifted = ranks.copy()
+    shifted[list_starts] = 1
+    is_group_start = numpy.zeros(total, dtype=bool)
+    is_group_start[1:] = shifted[1:] > shifted[:-1]
+    is_group_start[list_starts] = True
+
+    group_starts = numpy.flatnonzero(is_group_start)
+    tie_counts = numpy.diff(numpy.append(group_starts, total))
+    is_even = tie_counts % 2 == 0
+    increments = numpy.where(is_even, tie_counts // 2, (tie_counts + 1) // 2)
+
+    # Segments of groups restart at each list and after each even group
+    is_list_start = numpy.zeros(len(group_starts), dtype=bool)
+    is_list_start[numpy.searchsorted(group_starts, list_starts)] = True
+    is_segment_start = is_list_start.copy()
+    is_segment_start[1:] |= is_even[:-1]
+
+    summed = numpy.cumsum(increments)
+    segment_ids = numpy.cumsum(is_segment_start) - 1
+    segment_base = (summed - increments)[is_segment_start]
+    segment_sum = summed - segment_base[segment_ids]
+    increments = increments + (is_even & (segment_sum % 2 == 1))
+
+    # rerank each group by the summed increments within its list
+    summed = numpy.cumsum(increments)
+    list_ids = numpy.cumsum(is_list_start) - 1
+    list_base = (summed - increments)[is_list_start]
+    group_ranks = summed - list_base[list_ids]
+
+    reranked = numpy.repeat(group_ranks, tie_counts)
+    return numpy.split(reranked, numpy.cumsum(lengths)[:-1])
 
 
 def create_confusion_matrix_per_threshold(
@@ -135,20 +153,49 @@ def create_confusion_matrix_per_threshold(
         owlsim_url: str,
         num_labels: int,
         thresholds: List,
-        threshold_type: str):
+        threshold_type: str) -> Dict[Union[int, float], List[int]]:
+    """
+    Classify each synthetic profile with owlsim and count the
+    true positives, false positives, false negatives and true negatives
+    at every threshold
+
+    Rank thresholds are expected to be sorted ascending, probability
+    thresholds descending, as generated by compute-confusion-matrix.py
+    :return: Dict of threshold: [true_pos, false_pos, false_neg, true_neg]
+    """
+    confusion_matrix = confusion_matrix_per_threshold(
+        synthetic_profiles, owlsim_url, num_labels, thresholds, threshold_type)
+    return {
+        threshold: table
+        for threshold, table in zip(thresholds, confusion_matrix.tolist())
+    }
+
+
+def confusion_matrix_per_threshold(
+        synthetic_profiles: List[SyntheticProfile],
+        owlsim_url: str,
+        num_labels: int,
+        thresholds: Sequence,
+        threshold_type: str) -> numpy.ndarray:
+    """
+    create_confusion_matrix_per_threshold as an array, results for
+    groups of profiles can be merged by adding the arrays
+    :return: thresholds x 4 array of
+             true_pos, false_pos, false_neg, true_neg
+    """
+    if threshold_type not in ['rank', 'probability']:
+        raise ValueError("{} not valid threshold".format(threshold_type))
 
-    confusion_by_rank: Dict[int, List[int]] = {}
+    threshold_array = numpy.asarray(thresholds)
+    confusion_matrix = numpy.zeros((len(threshold_array), 4), dtype=numpy.int64)
 
     counter = 0
     total = len(synthetic_profiles)
 
-    for threshold in thresholds:
-        confusion_by_rank[threshold] = [0, 0, 0, 0]
-
     for synth_profile in synthetic_profiles:
 
         if counter % 1000 == 0:
-            logging.info("processed {} patients out of {}".format(counter, total))
+            logging.debug("processed {} patients out of {}".format(counter, total))
         counter += 1
 
         sim_resp = owlsim_classify(synth_profile.phenotypes, num_labels, owlsim_url)
@@ -159,98 +206,79 @@ def create_confusion_matrix_per_threshold(
         # could dynamically generated num_classes here
         # num_classes = len(sim_resp['matches'])
 
-        # store the disease rank or score
-        disease_score = 0
-        for disease_index, match in enumerate(sim_resp['matches']):
+        disease_index = None
+        for index, match in enumerate(sim_resp['matches']):
             if match['matchId'] == synth_profile.disease:
-                if threshold_type == 'rank':
-                    disease_score = disease_index
-                elif threshold_type == 'probability':
-                    disease_score = float(match['rawScore'])
-
-        # Create a list to track the number of positive hits per threshold
-        # This list should have the same number of indices as thresholds,
-        # conceptually they are two columns in a table
+                disease_index = index
 
-        # For rank, we count the number of diseases for each rank, and compute
-        # the number of diseases per rank threshold by using sum,
-        # eg number of diseases <= rank 4 is sum(positives[0:5])
-
-        # For probability, we count the number of labels <= to each probability
-        # therefore to get the total count at an index, get the val of positives[index]
-        positives = []
+        # For each threshold, count the number of diseases the classifier
+        # calls positive and whether the patient's disease is one of them
 
         if threshold_type == 'rank':
-            positives = [0 for r in range(0, len(thresholds) + 1)]
-            owlsim_ranks = [match['rank'] for match in sim_resp['matches']]
-            avg_ranks = rerank_by_average(owlsim_ranks)
-            disease_score = avg_ranks[disease_score]
-
-            for rnk in avg_ranks:
-                positives[rnk] += 1
-            positives.pop(0)  # ranks start at 1, so make 1st rank the 0th index
-
-        elif threshold_type == 'probability':
-            scores = numpy.array([float(match['rawScore']) for match in sim_resp['matches']])
-            positives = [0 for r in range(0, len(thresholds))]
-            for index, prob in enumerate(thresholds):
-                score_count = 0
-                if index == 0:
-                    positives[index] = 0
-                else:
-                    positives[index] = positives[index-1]
-                for score in scores:
-                    if score >= prob:
-                        score_count += 1
-                    else:
-                        break
-                positives[index] += score_count
-                scores = scores[score_count:]
-
+            # Average ranks are non decreasing, so the number of diseases
+            # at or above a rank threshold is a binary search
+            avg_ranks = batch_rerank_by_average(
+                [[match['rank'] for match in sim_resp['matches']]])[0]
+            disease_score = avg_ranks[disease_index or 0]
+            positives = numpy.searchsorted(avg_ranks, threshold_array, side='right')
+            is_true_pos = disease_score <= threshold_array
         else:
-            raise ValueError("{} not valid threshold".format(threshold_type))
-
-        for index, threshold in enumerate(thresholds):
-            true_pos, false_pos, false_neg, true_neg = confusion_by_rank[threshold]
-
-            is_true_pos = False
-            if threshold_type == 'rank':
-                is_true_pos = disease_score <= threshold
-                positive_diseases = sum(positives[0:threshold])
-            elif threshold_type == 'probability':
-                is_true_pos = disease_score >= threshold
-                positive_diseases = positives[index]
-            else:
-                raise ValueError
-
-            if is_true_pos:
-                true_pos += 1
-                true_neg += num_labels - positive_diseases
-                false_pos += positive_diseases - 1
-            else:
-                false_neg += 1
-                false_pos += positive_diseases
-                true_neg += num_labels - positive_diseases - 1
-
-            confusion_by_rank[threshold] = [true_pos, false_pos, false_neg, true_neg]
-
-    return confusion_by_rank
+            # A disease is called positive if it and every disease ranked
+            # above it score at least the threshold, ie the running minimum
+            # of the scores is >= threshold.  The running minimum is
+            # non increasing, so negate it to binary search
+            scores = numpy.array([float(match['rawScore'])
+                                  for match in sim_resp['matches']])
+            disease_score = 0 if disease_index is None else scores[disease_index]
+            running_min = numpy.minimum.accumulate(scores)
+            positives = numpy.searchsorted(
+                -running_min, -threshold_array, side='right')
+            is_true_pos = disease_score >= threshold_array
+
+        true_pos = is_true_pos.astype(numpy.int64)
+        confusion_matrix[:, 0] += true_pos
+        confusion_matrix[:, 1] += positives - true_pos
+        confusion_matrix[:, 2] += 1 - true_pos
+        confusion_matrix[:, 3] += num_labels - positives - (1 - true_pos)
+
+    return confusion_matrix
+
+
+def publish_confusion_inputs(thresholds: Sequence) -> SharedArrays:
+    """
+    Publish the thresholds of confusion_matrix_worker and a zeroed
+    thresholds x 4 'confusion' output array
+    """
+    return SharedArrays({
+        'thresholds': numpy.asarray(thresholds),
+        'confusion': numpy.zeros((len(thresholds), 4), dtype=numpy.int64),
+    })
 
 
-def process_confusion_matrix_per_threshold(
+def confusion_matrix_worker(
+        arrays: SharedArrays,
         synthetic_profiles: List[SyntheticProfile],
+        emit: Callable,
+        lock,
         owlsim_url: str,
         num_labels: int,
-        thresholds: List,
         threshold_type: str,
-        queue: Queue) -> None:
+        batch_size: Optional[int] = 100) -> None:
     """
-    Run create_confusion_matrix_per_threshold and put results in queue object
+    pool.stream_workers target, runs confusion_matrix_per_threshold over
+    batches of profiles against arrays published with
+    publish_confusion_inputs, adding each partial matrix to
+    arrays['confusion'] and emitting the number of profiles in the batch
     """
-    queue.put(create_confusion_matrix_per_threshold(
-        synthetic_profiles,
-        owlsim_url,
-        num_labels,
-        thresholds,
-        threshold_type
-    ))
+    for start in range(0, len(synthetic_profiles), batch_size):
+        batch = synthetic_profiles[start:start + batch_size]
+        confusion = confusion_matrix_per_threshold(
+            batch,
+            owlsim_url,
+            num_labels,
+            arrays['thresholds'],
+            threshold_type
+        )
+        with lock:
+            arrays['confusion'][...] += confusion
+        emit(len(batch))
@@ -0,0 +1,108 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from phenom.utils.bitset import popcount_words
+from phenom.utils.pool import SharedArrays, stream_workers
+import numpy as np
+
+"""
+How much of each profile is subsumed by every other profile in a corpus,
+eg the proportion of the lay phenotypes of a disease that are also in the
+closure of each other disease
+
+Profiles are packed bitsets over a vocabulary (see bitset.pack_sets), so
+the overlap of one profile with all others is a popcount per word, and
+only counts of the others passing each threshold are kept
+"""
+
+# other profiles subsuming more than 25%, 50%, 75% and all of a profile
+SUBSUMED_COLUMNS = ('25', '50', '75', '100')
+
+
+def subsumed_counts(
+        profiles: np.ndarray,
+        start: Optional[int] = 0,
+        stop: Optional[int] = None) -> np.ndarray:
+    """
+    For profiles[start:stop], the number of other profiles that contain
+    more than 25%, 50%, 75% and all of its terms, an empty profile
+    is not subsumed by any other
+
+    Memory is rows x profiles, the words of the bitsets are compared
+    one at a time
+
+    :param profiles: profiles x words packed bitsets
+    :return: rows x 4 array of counts, see SUBSUMED_COLUMNS
+    """
+    stop = len(profiles) if stop is None else stop
+    block = profiles[start:stop]
+    sizes = popcount_words(block).sum(axis=1, dtype=np.int64)[:, np.newaxis]
+
+    shared = np.zeros((len(block), len(profiles)), dtype=np.int64)
+    for word in range(profiles.shape[1]):
+        shared += popcount_words(block[:, word, np.newaxis] & profiles[np.newaxis, :, word])
+    # a profile does not count against itself
+    shared[np.arange(len(block)), np.arange(start, stop)] = 0
+
+    # integer forms of shared / size > .25, .5, .75 and == 1
+    return np.stack([
+        (4 * shared > sizes).sum(axis=1),
+        (2 * shared > sizes).sum(axis=1),
+        (4 * shared > 3 * sizes).sum(axis=1),
+        ((shared == sizes) & (sizes > 0)).sum(axis=1)
+    ], axis=1)
+
+
+def subsumed_counts_worker(
+        arrays: SharedArrays,
+        blocks: List[Tuple[int, int]],
+        emit) -> None:
+    """
+    stream_workers target, emits (start, {name: counts}) per block of rows
+    """
+    for start, stop in blocks:
+        emit((start, {name: subsumed_counts(profiles, start, stop)
+                      for name, profiles in arrays.arrays.items()}))
+
+
+def stream_subsumed_counts(
+        profiles: Dict[str, np.ndarray],
+        processes: Optional[int] = 1,
+        block_size: Optional[int] = 64) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+    """
+    subsumed_counts for every row of one or more packed profile arrays with
+    the same rows, eg lay and gc phenotypes of each disease
+
+    Blocks of rows are spread over processes, rows are yielded in order
+    as soon as every block before them is done, so only blocks that
+    finish early are held in memory
+
+    :param profiles: name to profiles x words packed bitsets
+    :return: iterator of (row, {name: counts})
+    """
+    num_rows = {len(packed) for packed in profiles.values()}
+    if len(num_rows) > 1:
+        raise ValueError("Expected the same number of profiles in every array")
+    num_rows = num_rows.pop() if num_rows else 0
+    blocks = [(start, min(start + block_size, num_rows))
+              for start in range(0, num_rows, block_size)]
+
+    if processes == 1:
+        for start, stop in blocks:
+            counts = {name: subsumed_counts(packed, start, stop)
+                      for name, packed in profiles.items()}
+            for row in range(start, stop):
+                yield row, {name: block[row - start] for name, block in counts.items()}
+        return
+
+    pending = {}
+    next_row = 0
+    with SharedArrays(profiles) as shared_arrays:
+        chunks = [blocks[offset::processes] for offset in range(processes)]
+        for start, counts in stream_workers(
+                subsumed_counts_worker, [chunk for chunk in chunks if chunk], shared_arrays):
+            pending[start] = counts
+            while next_row in pending:
+                counts = pending.pop(next_row)
+                block_rows = len(next(iter(counts.values())))
+                for row in range(next_row, next_row + block_rows):
+                    yield row, {name: block[row - next_row] for name, block in counts.items()}
+                next_row += block_rows
@@ -27,8 +27,17 @@ def main():
                         help='Location of id-label mapping file')
     parser.add_argument('--ic_cache', '-ic', type=str, required=True)
     parser.add_argument('--output', '-o', required=False, help='output file')
+    parser.add_argument('--cache', '-c', type=str, required=False,
+                        help='sqlite file for caching monarch responses')
+    parser.add_argument('--offline', action='store_true',
+                        help='only use cached monarch responses')
+    parser.add_argument('--ttl', type=float, required=False,
+                        help='seconds before a cached monarch response is refetched, '
+                             'by default cached responses never expire')
     args = parser.parse_args()
 
+    monarch.configure_cache(args.cache, args.ttl, args.offline)
+
     logger.info("loading matrix")
     matrix = np.loadtxt(args.input, delimiter=",")
     labels = [line.rstrip('\n').split('\t')[0] for line in open(args.label, 'r')]
@@ -6,8 +6,8 @@ import logging
 from typing import Dict, Set, List
 import gzip
 import multiprocessing
-from multiprocessing import Process, Queue
-from phenom.utils.simulate import process_confusion_matrix_per_threshold
+from phenom.utils.simulate import confusion_matrix_worker, publish_confusion_inputs
+from phenom.utils.pool import stream_workers
 from phenom.model.synthetic import SyntheticProfile
 import numpy
 
@@ -36,9 +36,6 @@ simulated_profiles: Dict[str, Set[str]] = {}
 synth_to_disease: Dict[str, str] = {}
 synthetic_profiles: List[SyntheticProfile] = []
 
-# Confusion matrix per rank
-confusion_by_rank: Dict[int, List[int]] = {}
-
 with gzip.open(args.simulated, 'rb') as synth_profiles:
     for line in synth_profiles:
         line = line.decode()
@@ -71,37 +68,25 @@ elif threshold_typ == 'probability':
 else:
     raise ValueError("{} not valid threshold".format(threshold_typ))
 
-for cutoff in cutoffs:
-    confusion_by_rank[cutoff] = [0, 0, 0, 0]
-
 output = open(args.output, 'w')
 
-procs = []
-queue = Queue()
-result_list = []
-
-# Split into chunks depending on args.processes
-for chunk in [synthetic_profiles[i::args.processes] for i in range(args.processes)]:
-    proc = Process(target=process_confusion_matrix_per_threshold,
-                   args=(chunk, owlsim_match, classes_to_eval,
-                         cutoffs, threshold_typ, queue))
-    proc.start()
-    procs.append(proc)
-
-for i in range(args.processes):
-    result_list.append(queue.get())
+processed = 0
 
-for proc in procs:
-    proc.join()
+# Split into chunks depending on args.processes, workers add their
+# counts to a shared table and stream back the number of profiles done
+with publish_confusion_inputs(cutoffs) as shared_arrays:
+    for profile_count in stream_workers(
+            confusion_matrix_worker,
+            [synthetic_profiles[i::args.processes] for i in range(args.processes)],
+            shared_arrays,
+            (multiprocessing.Lock(), owlsim_match, classes_to_eval, threshold_typ)):
+        processed += profile_count
+        logger.info("processed {} patients out of {}".format(
+            processed, len(synthetic_profiles)))
 
-for matrix in result_list:
-    for rank, table in matrix.items():
-        confusion_by_rank[rank][0] += table[0]
-        confusion_by_rank[rank][1] += table[1]
-        confusion_by_rank[rank][2] += table[2]
-        confusion_by_rank[rank][3] += table[3]
+    confusion_by_rank = shared_arrays['confusion'].copy()
 
-for rank, confusion_matrix in confusion_by_rank.items():
+for rank, confusion_matrix in zip(cutoffs, confusion_by_rank.tolist()):
     output.write("{}\t{}\t{}\t{}\t{}\n".format(
         rank,
         confusion_matrix[0],
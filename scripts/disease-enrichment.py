@@ -33,8 +33,17 @@ parser.add_argument('--lay_pheno', '-l', type=str, required=False,
                     help='path to lay phenotypes 1 column txt')
 parser.add_argument('--output', '-o', type=str, required=False,
                     help='Location of output file', default="./enrichment.tsv")
+parser.add_argument('--cache', '-c', type=str, required=False,
+                    help='sqlite file for caching monarch responses')
+parser.add_argument('--offline', action='store_true',
+                    help='only use cached monarch responses')
+parser.add_argument('--ttl', type=float, required=False,
+                    help='seconds before a cached monarch response is refetched, '
+                         'by default cached responses never expire')
 args = parser.parse_args()
 
+monarch.configure_cache(args.cache, args.ttl, args.offline)
+
 # i/o
 output = open(args.output, "w")
 
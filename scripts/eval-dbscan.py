@@ -1,4 +1,5 @@
 import numpy as np
+from scipy import sparse
 import argparse
 from statistics import mean, median
 import logging
@@ -14,21 +15,29 @@ def main():
     """
     parser = argparse.ArgumentParser(description='description')
     parser.add_argument('--input', '-i', type=str, required=True,
-                        help='Location of input file'
-                             ' that contains the sim matrix as json')
+                        help='Location of input file that contains the distance '
+                             'matrix as csv, or a sparse neighbour graph as .npz '
+                             '(see make_matrix.py --neighbors/--radius)')
     parser.add_argument('--label', '-l', type=str, required=True,
                         help='Location of id-label mapping file')
     parser.add_argument('--ic_cache', '-ic', type=str, required=True)
     parser.add_argument('--output', '-o', required=False, help='output file')
+    parser.add_argument('--eps', '-e', type=float, required=False, default=.32,
+                        help='DBSCAN eps, for a neighbour graph this should be no '
+                             'more than the radius it was built with')
     args = parser.parse_args()
 
     logger.info("loading matrix")
-    matrix = np.loadtxt(args.input, delimiter=",")
+    if args.input.endswith('.npz'):
+        # missing entries are treated as further than eps
+        matrix = sparse.load_npz(args.input)
+    else:
+        matrix = np.loadtxt(args.input, delimiter=",")
     labels = [line.rstrip('\n').split('\t')[0] for line in open(args.label, 'r')]
 
     cluster_map = {}
 
-    db = DBSCAN(eps=.32, metric="precomputed").fit(matrix)
+    db = DBSCAN(eps=args.eps, metric="precomputed").fit(matrix)
     singleton = -1
     for disease_id, cluster_id in zip(labels, db.labels_):
 
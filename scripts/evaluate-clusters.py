@@ -1,12 +1,12 @@
 import numpy as np
 import argparse
-from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.cluster.hierarchy import linkage
 from statistics import mean, median
 from typing import Dict
 import logging
 from scipy.spatial.distance import squareform
-from phenom.utils import owl_utils
 from phenom.similarity.semantic_sim import SemanticSim
+from phenom.utils.cluster_eval import walk_clusters
 from rdflib import Graph
 import csv
 
@@ -93,60 +93,22 @@ def main():
     logger.info("clustering")
     Z = linkage(squareform(matrix), 'ward')
 
-    for dist in np.linspace(50, 180, 400):
-        clusters = fcluster(Z, dist, 'distance')
+    closures = [
+        sem_sim.profile_bitset(disease2phen[disease])
+        for disease in labels
+    ]
+
+    for level in walk_clusters(Z, closures, sem_sim.ic_vector, np.linspace(50, 180, 400)):
+        dist = level.distance
 
     #for meth in clust_meth.keys():
     #    Z = linkage(squareform(matrix), meth)
     #    clusters = fcluster(Z, 500, 'maxclust')
 
-        cluster_map = {}
-        simgic_list = []
-        gic_times_cluster = []
-        cluster_sizes = []
-        sem_jac_list = []
-
-        for disease_id, cluster_id in zip(labels, clusters):
-            try:
-                cluster_map[cluster_id].append(disease_id)
-            except KeyError:
-                cluster_map[cluster_id] = [disease_id]
-
-        for cluster_id, diseases in cluster_map.items():
-            cluster_sizes.append(len(diseases))
-            """
-            if len(set(diseases).intersection(mondo_skip)) > 0:
-                if len(diseases) == len(set(diseases).intersection(mondo_skip)):
-                    logger.warning("Cannot evaluate cluster")
-                    diseases = set(diseases)
-                else:
-                    diseases = set(diseases) - mondo_skip
-
-            common_ancestors = set()
-            is_first = True
-            for disease in diseases:
-                if is_first:
-                    common_ancestors = owl_utils.get_closure(mondo_graph, disease, root=root)
-                    is_first = False
-                else:
-                    common_ancestors = common_ancestors.intersection(
-                        owl_utils.get_closure(mondo_graph, disease, root=root)
-                    )
-            #mica = max([ic_map[d] for d in common_ancestors])
-            #mica_list.append(mica)
-            """
-            profile_list = []
-            for disease in diseases:
-                profile_list.append(disease2phen[disease])
-            sim_gic = sem_sim.groupwise_sim_gic(profile_list)
-            simgic_list.append(sim_gic)
-            gic_times_cluster.append(sim_gic * len(diseases))
-            sim_jaccard = sem_sim.groupwise_jaccard(profile_list)
-            sem_jac_list.append(sim_jaccard)
-
-
-        singleton_count = sum([len(v) for k, v in cluster_map.items() if len(v) == 1])
-        sizes = [len(v) for k, v in cluster_map.items()]
+        simgic_list = level.sim_gic.tolist()
+        sem_jac_list = level.jaccard.tolist()
+        sizes = level.sizes.tolist()
+        singleton_count = sizes.count(1)
 
         #output.write("{:.4f}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
         output.write("{:.4f}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
@@ -155,7 +117,7 @@ def main():
             'ward',
             mean(simgic_list),
             median(simgic_list),
-            len(cluster_map.keys()),
+            len(sizes),
             mean(sizes),
             median(sizes),
             singleton_count,
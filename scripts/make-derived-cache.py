@@ -19,9 +19,18 @@ parser.add_argument('--annotations', '-a', type=str, required=False,
                     help='Cached gold standard disease phenotype annotations')
 parser.add_argument('--output', '-o', type=str, required=False,
                     help='Location of output file', default="./derived-cache.tsv")
+parser.add_argument('--cache', '-c', type=str, required=False,
+                    help='sqlite file for caching monarch responses')
+parser.add_argument('--offline', action='store_true',
+                    help='only use cached monarch responses')
+parser.add_argument('--ttl', type=float, required=False,
+                    help='seconds before a cached monarch response is refetched, '
+                         'by default cached responses never expire')
 
 args = parser.parse_args()
 
+monarch.configure_cache(args.cache, args.ttl, args.offline)
+
 root = "HP:0000118"
 hpo = Graph()
 hpo.parse("../data/hp.owl", format='xml')
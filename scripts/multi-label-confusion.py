@@ -1,79 +1,35 @@
 """Given a file containing synthetic patient data, generates
 confusion matrix per disease, treating diseases as labels
 
+Patients are scored against the gold standard diseases with phenodigm
+(CorpusSim, geometric pairwise similarity) over data/hp-closures.tsv,
+with the information content of each term computed from the gold
+standard annotations (closure_index.annotation_ic), so terms that
+annotate no disease have an IC of 0
+
+Diseases with no phenotypes in the closures, eg only obsolete terms,
+cannot be scored and are left out of the output with a warning, their
+patients count as negatives for every other disease.  Patient phenotypes
+not in the closures are dropped, see multilabel.encode_synthetic_profiles
+
 https://scikit-learn.org/stable/modules/generated/sklearn.metrics.multilabel_confusion_matrix.html
 https://scikit-learn.org/stable/auto_examples/model_selection/plot_roc.html
 """
 import argparse
 import logging
 import multiprocessing
-from multiprocessing import Queue, Process
 from typing import Dict, Set, List
 import gzip
 from collections import defaultdict
 from pathlib import Path
 from phenom.model.synthetic import SyntheticProfile
+from phenom.similarity.closure_index import ClosureIndex, read_closures, annotation_ic
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.utils.multilabel import encode_synthetic_profiles, \
+    publish_multilabel_inputs, multilabel_confusion_worker
+from phenom.utils.pool import run_workers
 import numpy
-from pumpkin_py import ICSemSim, flat_to_annotations, build_ic_graph_from_closures
-
-
-def create_confusion_matrix_per_threshold(
-        synthetic_profiles: List[SyntheticProfile],
-        ic_sim: ICSemSim,
-        annotations: Dict
-):
-    # An object of diseases as keys
-    # values are tuples of threshold, confusion matrix
-    disease_confusion_matrices = {
-        disease: [(cutoff, [0, 0, 0, 0]) for cutoff in cutoffs]
-        for disease in annotations.keys()
-    }
-
-    logger.info("Generating confusion matrices")
-    for patient_index, syn_profile in enumerate(synthetic_profiles):
-        if patient_index % 100 == 0:
-            logger.info(f"Processed {patient_index} profiles out of {len(synthetic_profiles)}")
-
-        for test_disease, gold_standard in annotations.items():
-            phenodigm_score = ic_sim.phenodigm_compare(syn_profile.phenotypes, gold_standard)
-            for index, confusion in enumerate(disease_confusion_matrices[test_disease]):
-                confusion_threshold, confusion_matrix = confusion
-                true_pos, false_pos, false_neg, true_neg = confusion_matrix
-                if test_disease == syn_profile.disease:
-                    # if the score is greater than the threshold this is a true positive
-                    # else it's false negative
-                    if phenodigm_score >= confusion_threshold:
-                        true_pos += 1
-                    else:
-                        false_neg += 1
-                else:
-                    # if the score is greater than the threshold this is a false positive
-                    # else it's a true negative
-                    if phenodigm_score >= confusion_threshold:
-                        false_pos += 1
-                    else:
-                        true_neg += 1
-                confusion_matrix = [true_pos, false_pos, false_neg, true_neg]
-                disease_confusion_matrices[test_disease][index] = (confusion_threshold, confusion_matrix)
-
-    # some stuff
-    return disease_confusion_matrices
-
-
-def process_confusion_matrix_per_threshold(
-        synthetic_profiles: List[SyntheticProfile],
-        ic_sim: ICSemSim,
-        annotations: Dict,
-        queue: Queue
-) -> None:
-    """
-    Run create_confusion_matrix_per_threshold and put results in queue object
-    """
-    queue.put(create_confusion_matrix_per_threshold(
-        synthetic_profiles,
-        ic_sim,
-        annotations
-    ))
 
 
 logging.basicConfig(level=logging.INFO)
@@ -81,7 +37,9 @@ logger = logging.getLogger(__name__)
 
 parser = argparse.ArgumentParser(
     description='Create a table of true positive/neg and false pos/neg '
-                'for each rank in a binary classifier')
+                'for each disease and phenodigm score threshold, diseases '
+                'with no phenotypes in the HPO closures are left out',
+    epilog='Term IC is computed from the gold standard annotations')
 parser.add_argument('--simulated', '-s', type=str, required=True)
 parser.add_argument('--output', '-o', type=str, required=False,
                     help='Location of output file', default="./confusion-matrix.tsv")
@@ -99,24 +57,34 @@ root = "HP:0000118"
 
 logger.info("Loading closures")
 
+annotations: Dict[str, Set[str]] = defaultdict(set)
 with gzip.open(annotation_file, 'rt') as annot_file:
-    annotations = flat_to_annotations(annot_file)
+    for line in annot_file:
+        if line.startswith('#'): continue
+        disease, phenotype = line.rstrip("\n").split("\t")[0:2]
+        annotations[disease].add(phenotype)
 
-logger.info("Building graph")
 with open(closures, 'r') as closure_file:
-    graph = build_ic_graph_from_closures(closure_file, root, annotations)
-
-
-ic_sim = ICSemSim(graph)
+    hpo_closures = read_closures(closure_file, root)
+
+logger.info("Building closure index")
+closure_index = ClosureIndex(hpo_closures, annotation_ic(hpo_closures, annotations))
+gold_standard: Dict[str, Set[str]] = {}
+for disease, profile in annotations.items():
+    phenotypes = {pheno for pheno in profile if pheno in closure_index.term_index}
+    if not phenotypes:
+        # eg only annotated with obsolete terms, ProfileCorpus rejects empty profiles
+        logger.warning("Skipping {}, no phenotypes in the closures".format(disease))
+        continue
+    gold_standard[disease] = phenotypes
+corpus = ProfileCorpus(closure_index, gold_standard)
+corpus_sim = CorpusSim(corpus)
 
 # Dictionaries used for constructing synthetic patient objects
 simulated_profiles: Dict[str, Set[str]] = defaultdict(set)
 synth_to_disease: Dict[str, str] = {}
 synthetic_profiles: List[SyntheticProfile] = []
 
-# Confusion matrix per rank
-confusion_by_rank: Dict[int, List[int]] = {}
-
 with gzip.open(args.simulated, 'rb') as synth_profiles:
     for line in synth_profiles:
         line = line.decode()
@@ -137,52 +105,28 @@ cutoffs = numpy.arange(0, 100, 0.2)
 cutoffs = numpy.append(cutoffs, 100)
 cutoffs = numpy.flip(cutoffs)
 
-procs = []
-queue = Queue()
-result_list = []
-
-# Split into chunks depending on args.processes
-for chunk in [synthetic_profiles[i::args.processes] for i in range(args.processes)]:
-    proc = Process(target=process_confusion_matrix_per_threshold,
-                   args=(chunk, ic_sim, annotations, queue))
-    proc.start()
-    procs.append(proc)
+logger.info("Publishing closure index and profiles to worker processes")
+patients, labels = encode_synthetic_profiles(synthetic_profiles, corpus)
 
-for i in range(args.processes):
-    result_list.append(queue.get())
-
-for proc in procs:
-    proc.join()
-
-logger.info("Finished processing profiles, joining data into single table")
-
-# An object of diseases as keys
-# values are tuples of threshold, confusion matrix
-global_disease_confusion_matrices = {
-    disease: [(cutoff, [0, 0, 0, 0]) for cutoff in cutoffs]
-    for disease in annotations.keys()
-}
-
-for matrix_group in result_list:
-    for disease in annotations.keys():
-        for index, confusion in enumerate(matrix_group[disease]):
-            confusion_threshold, confusion_matrix = confusion
-            true_pos, false_pos, false_neg, true_neg = confusion_matrix
-
-            _, global_confusion_matrix = global_disease_confusion_matrices[disease][index]
+with publish_multilabel_inputs(patients, labels, corpus, cutoffs) as shared_arrays:
+    # Split into chunks depending on args.processes
+    run_workers(
+        multilabel_confusion_worker,
+        [range(i, len(patients), args.processes) for i in range(args.processes)],
+        shared_arrays,
+        (multiprocessing.Lock(),)
+    )
 
-            global_confusion_matrix[0] += true_pos
-            global_confusion_matrix[1] += false_pos
-            global_confusion_matrix[2] += false_neg
-            global_confusion_matrix[3] += true_neg
+    logger.info("Finished processing profiles")
 
-            global_disease_confusion_matrices[disease][index] = (confusion_threshold, global_confusion_matrix)
+    # diseases x cutoffs x (true_pos, false_pos, false_neg, true_neg)
+    disease_confusion_matrices = shared_arrays['confusion'].copy()
 
 logger.info(f"Writing data to {args.output}")
-for disease, confusions in global_disease_confusion_matrices.items():
-    for confusion in confusions:
-        confusion_threshold, confusion_matrix = confusion
-        true_pos, false_pos, false_neg, true_neg = confusion_matrix
+for disease_index, disease in enumerate(corpus.ids):
+    for cutoff_index, confusion_threshold in enumerate(cutoffs):
+        true_pos, false_pos, false_neg, true_neg = \
+            disease_confusion_matrices[disease_index, cutoff_index]
         output_line = "\t".join([
             disease,
             str(confusion_threshold),
@@ -3,7 +3,9 @@ A subsumption analysis that includes more data points than subsumption-counts.py
 """
 import argparse
 from collections import defaultdict
-from pumpkin_py import build_graph_from_rdflib, GraphSemSim
+from pumpkin_py import build_graph_from_rdflib
+from phenom.utils.bitset import TermIndex, pack_sets
+from phenom.utils.subsumption import stream_subsumed_counts, SUBSUMED_COLUMNS
 
 parser = argparse.ArgumentParser(
     description='Perform disease enrichment using fisher exact test'
@@ -20,6 +22,8 @@ parser.add_argument('--mondo_leaf', '-ml', type=str, required=False,
                     help='path to gc phenotypes 1 column txt')
 parser.add_argument('--output', '-o', type=str, required=False,
                     help='Location of output file', default="./enrichment.tsv")
+parser.add_argument('--processes', '-p', type=int, required=False,
+                    help='Number of processes', default=1)
 args = parser.parse_args()
 
 # i/o
@@ -53,7 +57,6 @@ with open(args.mondo_labels, 'r') as mondo_labels:
 
 root = "HP:0000118"
 hpo = build_graph_from_rdflib("../data/owl/hp.owl", root)
-hpo_sim = GraphSemSim(hpo)
 
 counter = 0
 
@@ -86,7 +89,6 @@ with open(args.mondo_assoc, 'r') as mondo_labels:
 
 print(f"Processed {counter} associations")
 
-results = []
 counter = 0
 hpo = None
 
@@ -95,99 +97,15 @@ hpo_with_five_or_more_annotations = {k for k,v in hpo_with_annotation.items() if
 
 # filter out diseases without phenotypes
 associations = {disease: associations for disease, associations in associations.items() if len(associations) > 0}
+diseases = list(associations.keys())
 
-for disease, association in associations.items():
-
-    if counter % 100 == 0:
-        print("Processed {} diseases".format(counter))
-
-    # phenotypes annotated to disease class
-    lay_annotated = set()
-    lay_other = set()
-    gc_other = set()
-    gc_annotated = set()
-    all_annot = set()
-
-    lay_subsumed_gt_25 = 0
-    lay_subsumed_gt_50 = 0
-    lay_subsumed_gt_75 = 0
-    lay_subsumed_100 = 0
-
-    gc_subsumed_gt_25 = 0
-    gc_subsumed_gt_50 = 0
-    gc_subsumed_gt_75 = 0
-    gc_subsumed_100 = 0
-
-    lay_in_disease = lay_phenotypes & association
-    gc_in_disease = gc_phenotypes & association
-    lay_annotated = lay_annotated | lay_in_disease
-    gc_annotated = gc_annotated | gc_in_disease
-    all_annot = all_annot | association
-
-    for other_disease, other_association in associations.items():
-        if other_disease == disease: continue
-
-        # len(intersection(lay, gold)) / len(lay)
-        lay_proportion_subsumed = hpo_sim.proportion_subset(lay_in_disease, other_association, False)
-
-        # len(intersection(lay, gold)) / len(gold)
-        # lay_proportion_subsumed = hpo_sim.proportion_subset(other_association, lay_in_disease, False)
-
-        # why is there no case switch
-        if lay_proportion_subsumed > .25:
-            lay_subsumed_gt_25 += 1
-
-        if lay_proportion_subsumed > .50:
-            lay_subsumed_gt_50 += 1
-
-        if lay_proportion_subsumed > .75:
-            lay_subsumed_gt_75 += 1
-
-        if lay_proportion_subsumed == 1.0:
-            lay_subsumed_100 += 1
-
-        # len(intersection(gc, gold)) / len(gc)
-        gc_proportion_subsumed = hpo_sim.proportion_subset(gc_in_disease, other_association, False)
-
-        # len(intersection(gc, gold)) / len(gold)
-        # gc_proportion_subsumed = hpo_sim.proportion_subset(other_association, gc_in_disease, False)
-
-        if gc_proportion_subsumed > .25:
-            gc_subsumed_gt_25 += 1
-
-        if gc_proportion_subsumed > .50:
-            gc_subsumed_gt_50 += 1
-
-        if gc_proportion_subsumed > .75:
-            gc_subsumed_gt_75 += 1
-
-        if gc_proportion_subsumed == 1.0:
-            gc_subsumed_100 += 1
-
-
-    results.append({
-        'id': disease,
-        'label': mondo_disease_labels[disease],
-        'clinical annotated to disease': len(all_annot),
-        'lay annotated to disease': len(lay_annotated),
-        'gc annotated to disease': len(gc_annotated),
-        'lay two': len(lay_annotated & hpo_with_three_or_more_annotations),
-        'gc two': len(gc_annotated & hpo_with_three_or_more_annotations),
-        'lay four': len(lay_annotated & hpo_with_five_or_more_annotations),
-        'gc four': len(gc_annotated & hpo_with_five_or_more_annotations),
-        'lay 25': lay_subsumed_gt_25,
-        'gc 25': gc_subsumed_gt_25,
-        'lay 50': lay_subsumed_gt_50,
-        'gc 50': gc_subsumed_gt_50,
-        'lay 75': lay_subsumed_gt_75,
-        'gc 75': gc_subsumed_gt_75,
-        'lay 100': lay_subsumed_100,
-        'gc 100': gc_subsumed_100,
-
-    })
-    counter += 1
-
-print("Processed {} diseases".format(counter))
+# lay and gc phenotypes in the closure of each disease, as bitsets over the
+# lay and gc vocabularies, so the proportion of one subsumed by another
+# disease, len(intersection(lay, gold)) / len(lay), is a popcount
+subsets = {
+    'lay': pack_sets(associations.values(), TermIndex(sorted(lay_phenotypes))),
+    'gc': pack_sets(associations.values(), TermIndex(sorted(gc_phenotypes))),
+}
 
 headers = [
     'id',
@@ -213,8 +131,37 @@ header_line = "\t".join(headers)
 
 output.write(f"{header_line}\n")
 
-for res in results:
+for row, subsumed in stream_subsumed_counts(subsets, processes=args.processes):
+
+    if counter % 100 == 0:
+        print("Processed {} diseases".format(counter))
+
+    disease = diseases[row]
+    association = associations[disease]
+
+    # phenotypes annotated to disease class
+    lay_annotated = lay_phenotypes & association
+    gc_annotated = gc_phenotypes & association
+
+    res = {
+        'id': disease,
+        'label': mondo_disease_labels[disease],
+        'clinical annotated to disease': len(association),
+        'lay annotated to disease': len(lay_annotated),
+        'gc annotated to disease': len(gc_annotated),
+        'lay two': len(lay_annotated & hpo_with_three_or_more_annotations),
+        'gc two': len(gc_annotated & hpo_with_three_or_more_annotations),
+        'lay four': len(lay_annotated & hpo_with_five_or_more_annotations),
+        'gc four': len(gc_annotated & hpo_with_five_or_more_annotations),
+    }
+    for name, counts in subsumed.items():
+        for column, count in zip(SUBSUMED_COLUMNS, counts):
+            res[f"{name} {column}"] = count
+
     result = "\t".join([
         str(res[field]) for field in headers
     ])
     output.write(f"{result}\n")
+    counter += 1
+
+print("Processed {} diseases".format(counter))
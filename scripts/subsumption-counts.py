@@ -1,4 +1,6 @@
-from phenom.utils.owl_utils import get_closure
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.inverted_index import InvertedIndex
 from rdflib import Graph
 from typing import Dict, Set
 import argparse
@@ -50,23 +52,26 @@ def load_map_from_file(file_path: str) -> Dict[str, Set[str]]:
                 profile_map[disease].add(phenotype)
             except KeyError:
                 profile_map[disease] = {phenotype}
-            for pheno in get_closure(hpo, phenotype, root='HP:0000118', reflexive=False):
-                profile_map[disease].add(pheno)
     return profile_map
 
 
 gold_standard = load_map_from_file(args.annotations)
 derived_profiles = load_map_from_file(args.derived_annotations)
 
+closure_index = ClosureIndex.from_graph(
+    hpo, 'HP:0000118',
+    terms={pheno for profiles in [gold_standard, derived_profiles]
+           for profile in profiles.values() for pheno in profile})
+gold_index = InvertedIndex.from_corpus(ProfileCorpus(closure_index, gold_standard))
+
+# a disease subsumes a profile if its closure has every
+# term in the closure of the profile
 for disease, profile in derived_profiles.items():
-    sub_count = 0
-    gold_count = 0
     gold_profile = gold_standard[disease]
-    for gold_disease, hpo_profile in gold_standard.items():
-        if len(profile & hpo_profile) == len(profile):
-            sub_count += 1
-        if len(gold_profile & hpo_profile) == len(gold_profile):
-            gold_count += 1
+    sub_count = len(gold_index.intersection(
+        closure_index.closure(closure_index.encode(profile))))
+    gold_count = len(gold_index.intersection(
+        closure_index.closure(closure_index.encode(gold_profile))))
     try:
         label = mondo_diseases[disease]
     except KeyError:
@@ -0,0 +1,56 @@
+import pytest
+import os
+from rdflib import Graph
+from phenom.utils import owl_utils
+from phenom.similarity.closure_index import ClosureIndex, annotation_ic
+from phenom.similarity.corpus import ProfileCorpus
+
+resources = os.path.join(os.path.dirname(__file__), 'resources')
+
+root = "HP:0000118"
+
+
+@pytest.fixture(scope='session')
+def hpo():
+    """
+    A small fragment of the HPO, see resources/mini-hp.ttl
+    """
+    graph = Graph()
+    graph.parse(os.path.join(resources, 'mini-hp.ttl'), format='turtle')
+    return graph
+
+
+@pytest.fixture(scope='session')
+def annotations():
+    disease2phen = {}
+    with open(os.path.join(resources, 'mini-annotations.tsv'), 'r') as annot_file:
+        for line in annot_file:
+            if line.startswith('#'): continue
+            disease, phenotype = line.rstrip("\n").split("\t")[0:2]
+            disease2phen.setdefault(disease, set()).add(phenotype)
+    return disease2phen
+
+
+@pytest.fixture(scope='session')
+def closures(hpo):
+    phenotypes = owl_utils.get_descendants(hpo, root)
+    return {pheno: owl_utils.get_closure(hpo, pheno, root=root)
+            for pheno in phenotypes}
+
+
+@pytest.fixture(scope='session')
+def ic_map(closures, annotations):
+    return annotation_ic(closures, annotations)
+
+
+@pytest.fixture(scope='session')
+def closure_index(closures, ic_map):
+    return ClosureIndex(closures, ic_map)
+
+
+@pytest.fixture(scope='session')
+def corpus(closure_index, annotations):
+    """
+    The annotations encoded against closure_index
+    """
+    return ProfileCorpus(closure_index, annotations)
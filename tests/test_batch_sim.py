@@ -0,0 +1,58 @@
+import pytest
+import itertools
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.semantic_dist import SemanticDist
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.batch_sim import BatchSim, PairwiseTable
+
+root = "HP:0000118"
+
+
+@pytest.fixture(scope='module')
+def pairs(corpus):
+    indices = list(itertools.product(range(len(corpus)), repeat=2))
+    queries = [corpus.profile(a) for a, _ in indices]
+    targets = [corpus.profile(b) for _, b in indices]
+    decoded = [(corpus.closure_index.decode(query), corpus.closure_index.decode(target))
+               for query, target in zip(queries, targets)]
+    return queries, targets, decoded
+
+
+@pytest.fixture(scope='module')
+def batch_sim(corpus):
+    # small batches to exercise batching and padding
+    return BatchSim(PairwiseTable(corpus.closure_index, CorpusSim(corpus).vocabulary),
+                    batch_size=7)
+
+
+@pytest.mark.parametrize("is_symmetric", [False, True])
+@pytest.mark.parametrize("sim_measure", ['geometric', 'ic'])
+def test_phenodigm(hpo, ic_map, batch_sim, pairs, is_symmetric, sim_measure):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    queries, targets, decoded = pairs
+    expected = [sem_sim.phenodigm_compare(a, b, is_symmetric, sim_measure=sim_measure)
+                for a, b in decoded]
+    assert batch_sim.phenodigm_scores(queries, targets, is_symmetric, sim_measure) \
+        == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("matrix_metric", ['bma', 'max', 'avg'])
+@pytest.mark.parametrize("is_symmetric", [False, True])
+@pytest.mark.parametrize("is_normalized", [False, True])
+def test_resnik(hpo, ic_map, batch_sim, pairs, matrix_metric, is_symmetric, is_normalized):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    queries, targets, decoded = pairs
+    expected = [sem_sim.resnik_sim(a, b, matrix_metric, is_symmetric, is_normalized)
+                for a, b in decoded]
+    assert batch_sim.resnik_scores(
+        queries, targets, matrix_metric, is_symmetric, is_normalized) \
+        == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("distance_measure", ['euclidean', 'jin_conrath'])
+def test_euclidean_matrix(hpo, ic_map, batch_sim, pairs, distance_measure):
+    sem_dist = SemanticDist(hpo, root, ic_map)
+    queries, targets, decoded = pairs
+    expected = [sem_dist.euclidean_matrix(a, b, distance_measure) for a, b in decoded]
+    assert batch_sim.euclidean_matrix_distances(queries, targets, distance_measure) \
+        == pytest.approx(expected)
@@ -0,0 +1,47 @@
+import pytest
+import math
+import numpy as np
+from phenom.utils import owl_utils
+from phenom.utils.bitset import TermIndex
+from phenom.similarity import metric
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.semantic_dist import SemanticDist
+
+root = "HP:0000118"
+
+
+def test_bitset_algebra():
+    term_index = TermIndex(['a', 'b', 'c'])
+    set_a = term_index.bitset(['a', 'b', 'd'])
+    set_b = term_index.bitset(['b', 'c'])
+    assert term_index.decode(set_a) == ['a', 'b', 'd']
+    assert term_index.decode(set_a & set_b) == ['b']
+    assert term_index.decode(set_a | set_b) == ['a', 'b', 'c', 'd']
+    assert term_index.decode(set_a ^ set_b) == ['a', 'c', 'd']
+    assert term_index.decode(set_a - set_b) == ['a', 'd']
+    assert len(set_a) == 3
+    assert metric.jaccard(set_a, set_b) == metric.jaccard({'a', 'b', 'd'}, {'b', 'c'})
+    assert (set_a & set_b).ic_sum(np.array([1.0, 2.0, 3.0, 4.0])) == 2.0
+
+
+def test_set_metrics(hpo, ic_map, annotations):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    sem_dist = SemanticDist(hpo, root, ic_map)
+    profiles = list(annotations.values())
+    closures = [owl_utils.get_profile_closure(profile, hpo, root) for profile in profiles]
+
+    for profile_a, closure_a in zip(profiles, closures):
+        for profile_b, closure_b in zip(profiles, closures):
+            assert sem_sim.jaccard_sim(profile_a, profile_b) == \
+                metric.jaccard(closure_a, closure_b)
+            assert sem_sim.sim_gic(profile_a, profile_b) == pytest.approx(
+                sum(ic_map[term] for term in closure_a & closure_b)
+                / sum(ic_map[term] for term in closure_a | closure_b))
+            assert sem_dist.euclidean_distance(profile_a, profile_b) == pytest.approx(
+                math.sqrt(sum(ic_map[term] ** 2 for term in closure_a ^ closure_b)))
+
+    intersection = set.intersection(*closures[:3])
+    union = set.union(*closures[:3])
+    assert sem_sim.groupwise_jaccard(profiles[:3]) == len(intersection) / len(union)
+    assert sem_sim.groupwise_sim_gic(profiles[:3]) == pytest.approx(
+        sum(ic_map[term] for term in intersection) / sum(ic_map[term] for term in union))
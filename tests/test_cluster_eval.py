@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+from scipy.cluster.hierarchy import linkage, fcluster
+from phenom.utils.cluster_eval import walk_clusters
+from phenom.similarity.semantic_sim import SemanticSim
+
+root = "HP:0000118"
+
+
+@pytest.fixture
+def clustering(hpo, ic_map, annotations):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    profiles = list(annotations.values())
+    closures = [sem_sim.profile_bitset(profile) for profile in profiles]
+    points = np.random.RandomState(0).rand(len(profiles), 2)
+    return sem_sim, profiles, closures, linkage(points, 'ward')
+
+
+def test_walk_clusters(clustering):
+    sem_sim, profiles, closures, linkage_matrix = clustering
+    distances = [0] + linkage_matrix[:, 2].tolist() + np.linspace(0, 2, 9).tolist()
+
+    levels = list(walk_clusters(linkage_matrix, closures, sem_sim.ic_vector, distances))
+    assert [level.distance for level in levels] == sorted(distances)
+
+    for level in levels:
+        clusters = fcluster(linkage_matrix, level.distance, 'distance')
+        expected = []
+        for cluster_id in np.unique(clusters):
+            group = [profiles[index] for index in np.flatnonzero(clusters == cluster_id)]
+            expected.append((len(group),
+                             sem_sim.groupwise_sim_gic(group),
+                             sem_sim.groupwise_jaccard(group)))
+        actual = list(zip(level.sizes.tolist(), level.sim_gic.tolist(), level.jaccard.tolist()))
+        for (size, sim_gic, jaccard), expected_cluster in zip(sorted(actual), sorted(expected)):
+            assert size == expected_cluster[0]
+            assert sim_gic == pytest.approx(expected_cluster[1])
+            assert jaccard == pytest.approx(expected_cluster[2])
+
+
+def test_walk_clusters_not_monotonic(clustering):
+    sem_sim, profiles, closures, linkage_matrix = clustering
+    with pytest.raises(ValueError):
+        list(walk_clusters(linkage_matrix, closures[1:], sem_sim.ic_vector, [1]))
+    points = np.array([[0, 0], [0, 1.1], [1, 0.5]])
+    with pytest.raises(ValueError):
+        list(walk_clusters(linkage(points, 'centroid'), closures[:3], sem_sim.ic_vector, [1]))
@@ -2,7 +2,9 @@ import pytest
 import os
 import json
 from phenom.model.synthetic import SyntheticProfile
-from phenom.utils.simulate import rerank_by_average, create_confusion_matrix_per_threshold
+from phenom.utils.simulate import rerank_by_average, batch_rerank_by_average, \
+    create_confusion_matrix_per_threshold, confusion_matrix_worker, publish_confusion_inputs
+from threading import Lock
 from unittest.mock import MagicMock, patch
 
 # Test files and data
@@ -43,6 +45,17 @@ def test_reranking(input_ranks, expected_ranks):
     assert rankings == expected_ranks
 
 
+def test_batch_reranking():
+    """
+    Test reranking a batch of rank lists at once
+    function: phenom.utils.simulate.batch_rerank_by_average
+    """
+    input_batch = [input_ranks for input_ranks, _ in test_rank_data]
+    rankings = batch_rerank_by_average(input_batch)
+    assert [list(ranks) for ranks in rankings] == \
+           [expected_ranks for _, expected_ranks in test_rank_data]
+
+
 @patch('phenom.utils.simulate.owlsim_classify', MagicMock(return_value=owlsim_output))
 def test_create_confusion_by_rank():
     """
@@ -109,3 +122,21 @@ def test_create_confusion_by_prob():
         fake_profiles, owlsim_url, classes_to_eval, thresholds, threshold_type)
 
     assert confusion_by_rank == expected_table
+
+
+@patch('phenom.utils.simulate.owlsim_classify', MagicMock(return_value=owlsim_output))
+def test_confusion_worker():
+    """
+    Test the worker adds batches into the shared table, emitting profile counts
+    """
+    thresholds = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+    fake_profiles = [SyntheticProfile(str(i), ['2'], "MONDO:0007924") for i in range(5)]
+    expected_table = create_confusion_matrix_per_threshold(
+        fake_profiles, '', 10, thresholds, 'rank')
+
+    emitted = []
+    with publish_confusion_inputs(thresholds) as shared_arrays:
+        confusion_matrix_worker(
+            shared_arrays, fake_profiles, emitted.append, Lock(), '', 10, 'rank', batch_size=2)
+        assert shared_arrays['confusion'].tolist() == list(expected_table.values())
+    assert emitted == [2, 2, 1]
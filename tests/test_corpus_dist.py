@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+from scipy.spatial.distance import squareform
+from phenom.similarity.corpus_dist import CorpusDist
+from phenom.similarity.semantic_dist import SemanticDist
+from phenom.make_matrix import condensed_row
+
+root = "HP:0000118"
+
+
+@pytest.fixture(scope='module')
+def profiles(corpus):
+    return [corpus.closure_index.decode(corpus.profile(index)) for index in range(len(corpus))]
+
+
+@pytest.mark.parametrize("distance_measure", ['euclidean', 'jin_conrath'])
+def test_euclidean_matrix_distances(hpo, ic_map, corpus, profiles, distance_measure):
+    sem_dist = SemanticDist(hpo, root, ic_map)
+    corpus_dist = CorpusDist(corpus)
+    for index, profile in enumerate(profiles):
+        expected = [
+            sem_dist.euclidean_matrix(profile, other, distance_measure)
+            for other in profiles[index + 1:]
+        ]
+        distances = corpus_dist.euclidean_matrix_distances(
+            profile, distance_measure, indices=range(index + 1, len(profiles)))
+        assert distances == pytest.approx(expected)
+
+    condensed = corpus_dist.euclidean_matrix_all_pairs(distance_measure)
+    for index in range(len(profiles)):
+        expected = corpus_dist.euclidean_matrix_distances(profiles[index], distance_measure)
+        expected[index] = 0
+        assert condensed_row(condensed, index, len(profiles)) == pytest.approx(expected)
+
+
+def test_euclidean_distances(hpo, ic_map, corpus, profiles):
+    sem_dist = SemanticDist(hpo, root, ic_map)
+    corpus_dist = CorpusDist(corpus)
+    expected = [
+        sem_dist.euclidean_distance(profile, other)
+        for index, profile in enumerate(profiles)
+        for other in profiles[index + 1:]
+    ]
+    assert corpus_dist.euclidean_distances() == pytest.approx(expected)
+    assert corpus_dist.euclidean_distances(block_size=3) == pytest.approx(expected)
+
+    subset = [6, 1, 4]
+    assert squareform(corpus_dist.euclidean_distances(indices=subset)) \
+        == pytest.approx(squareform(expected)[np.ix_(subset, subset)])
+
+
+def test_condensed_row():
+    size = 5
+    distances = np.arange(1, size * (size - 1) // 2 + 1, dtype=np.float64)
+    square = squareform(distances)
+    for index in range(size):
+        assert (condensed_row(distances, index, size) == square[index]).all()
+
+
+@pytest.mark.parametrize("distance_measure", [None, 'jin_conrath'])
+@pytest.mark.parametrize("k, radius", [(3, None), (None, 2.5), (4, 2.5), (20, None)])
+def test_neighbor_graph(corpus, distance_measure, k, radius):
+    corpus_dist = CorpusDist(corpus)
+    if distance_measure is None:
+        square = squareform(corpus_dist.euclidean_distances())
+    else:
+        square = squareform(corpus_dist.euclidean_matrix_all_pairs(distance_measure))
+    np.fill_diagonal(square, np.inf)
+
+    graph = corpus_dist.neighbor_graph(distance_measure, k, radius, block_size=3)
+    for index in range(len(corpus)):
+        neighbors = graph.indices[graph.indptr[index]:graph.indptr[index + 1]]
+        distances = graph.data[graph.indptr[index]:graph.indptr[index + 1]]
+        assert distances == pytest.approx(square[index, neighbors])
+        is_expected = np.isfinite(square[index])
+        if radius is not None:
+            is_expected &= square[index] <= radius
+        expected_count = is_expected.sum() if k is None else min(k, is_expected.sum())
+        assert len(neighbors) == expected_count
+        # no excluded profile is closer than an included one
+        excluded = np.setdiff1d(np.flatnonzero(is_expected), neighbors)
+        if len(excluded) and len(neighbors):
+            assert square[index, excluded].min() >= distances.max() - 1e-9
+
+
+def test_neighbor_graph_dbscan(corpus):
+    from sklearn.cluster import DBSCAN
+    corpus_dist = CorpusDist(corpus)
+    square = squareform(corpus_dist.euclidean_matrix_all_pairs('jin_conrath'))
+    graph = corpus_dist.neighbor_graph('jin_conrath', radius=1)
+    expected = DBSCAN(eps=1, min_samples=2, metric='precomputed').fit(square).labels_
+    labels = DBSCAN(eps=1, min_samples=2, metric='precomputed').fit(graph).labels_
+    assert (labels == expected).all()
+    assert (expected >= 0).any() and (expected == -1).any()
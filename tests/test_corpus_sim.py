@@ -0,0 +1,154 @@
+import pytest
+import numpy as np
+from phenom.similarity.semantic_sim import SemanticSim, PairwiseSim
+from phenom.math import matrix
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.model.synthetic import SyntheticProfile
+from phenom.utils.multilabel import create_multilabel_confusion, encode_synthetic_profiles
+
+root = "HP:0000118"
+
+query_profiles = [
+    ['HP:0000252', 'HP:0001250'],
+    ['HP:0000316', 'HP:0000505', 'HP:0004322', 'HP:0001249'],
+    ['HP:0002069'],
+    ['HP:0000118', 'HP:0001548', '-HP:0000478']
+]
+
+
+def test_index_from_graph(hpo, ic_map, closure_index):
+    from_graph = ClosureIndex.from_graph(hpo, root, ic_map)
+    assert from_graph.terms == closure_index.terms
+    assert (from_graph.ancestors != closure_index.ancestors).nnz == 0
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+@pytest.mark.parametrize("is_symmetric", [False, True])
+@pytest.mark.parametrize("sim_measure", ['geometric', 'ic'])
+def test_phenodigm_scores(hpo, ic_map, corpus, profile, is_symmetric, sim_measure):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    corpus_sim = CorpusSim(corpus)
+    expected = [
+        sem_sim.phenodigm_compare(profile, disease_profile, is_symmetric,
+                                  sim_measure=sim_measure)
+        for disease_profile in [corpus.closure_index.decode(corpus.profile(index))
+                                for index in range(len(corpus))]
+    ]
+    scores = corpus_sim.phenodigm_scores(
+        profile, is_symmetric=is_symmetric, sim_measure=sim_measure)
+    assert scores == pytest.approx(expected)
+
+    subset = [5, 0, 3]
+    subset_scores = corpus_sim.phenodigm_scores(
+        profile, is_symmetric=is_symmetric, sim_measure=sim_measure, indices=subset)
+    assert subset_scores == pytest.approx([expected[index] for index in subset])
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+def test_non_redundant(hpo, ic_map, closure_index, annotations, profile):
+    from phenom.utils import owl_utils
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    non_redundant = owl_utils.get_non_redundant_profile(profile, hpo, root)
+
+    phenotypes = {pheno for pheno in profile if not pheno.startswith("-")}
+    assert {pheno for pheno in non_redundant if not pheno.startswith("-")} \
+        == closure_index.decode(closure_index.non_redundant(closure_index.encode(phenotypes)))
+    assert owl_utils.get_profile_closure(non_redundant - {'-HP:0000478'}, hpo, root) \
+        == owl_utils.get_profile_closure(phenotypes, hpo, root)
+
+    corpus_sim = CorpusSim(ProfileCorpus(closure_index, annotations, is_non_redundant=True))
+    expected = [
+        sem_sim.phenodigm_compare(profile, disease_profile, is_non_redundant=True)
+        for disease_profile in annotations.values()
+    ]
+    assert corpus_sim.phenodigm_scores(profile, is_non_redundant=True) \
+        == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("sim_measure", [PairwiseSim.GEOMETRIC, PairwiseSim.IC])
+def test_optimal_summary(hpo, ic_map, corpus, sim_measure):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    summary = corpus.optimal_summary(sim_measure)
+    assert corpus.optimal_summary(sim_measure) is summary
+    for index in range(len(corpus)):
+        profile = corpus.closure_index.decode(corpus.profile(index))
+        expected = matrix.summarize(sem_sim._get_optimal_matrix(profile, True, sim_measure))
+        for field, value in expected._asdict().items():
+            assert getattr(summary, field)[index] == pytest.approx(value)
+
+
+def test_multilabel_confusion(corpus):
+    corpus_sim = CorpusSim(corpus)
+    patients = [
+        SyntheticProfile(str(index), profile, disease)
+        for index, (profile, disease) in enumerate(zip(
+            query_profiles, ['MONDO:0000006', 'MONDO:0000004',
+                             'MONDO:0000003', 'MONDO:9999999']))
+    ]
+    thresholds = np.flip(np.append(np.arange(0, 100, 5.0), 100))
+
+    confusion = create_multilabel_confusion(patients, corpus_sim, thresholds)
+
+    expected = np.zeros((len(corpus), len(thresholds), 4), dtype=np.int64)
+    for patient in patients:
+        scores = corpus_sim.phenodigm_scores(patient.phenotypes)
+        for disease_index, disease in enumerate(corpus.ids):
+            for threshold_index, threshold in enumerate(thresholds):
+                is_positive = scores[disease_index] >= threshold
+                if disease == patient.disease:
+                    expected[disease_index, threshold_index, 0 if is_positive else 2] += 1
+                else:
+                    expected[disease_index, threshold_index, 1 if is_positive else 3] += 1
+
+    assert (confusion == expected).all()
+
+
+def test_unknown_synthetic_terms(corpus):
+    patients = [
+        SyntheticProfile('known', ['HP:0000252', 'HP:9999999'], 'MONDO:0000006'),
+        SyntheticProfile('unknown', ['HP:9999999', '-HP:0000252'], 'MONDO:0000004')
+    ]
+    encoded, labels = encode_synthetic_profiles(patients, corpus)
+    assert encoded.ids == ['0']
+    assert encoded.closure_index.decode(encoded.profile(0)) == {'HP:0000252'}
+    assert labels.tolist() == [corpus.id_index['MONDO:0000006']]
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+@pytest.mark.parametrize("ic_weighted", [False, True])
+@pytest.mark.parametrize("negative_weight", [1, .1])
+def test_cosine_scores(hpo, ic_map, closure_index, annotations, profile, ic_weighted,
+                       negative_weight):
+    from phenom.utils import owl_utils
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    profiles = dict(annotations)
+    profiles['negated'] = ['HP:0000252', '-HP:0000478', '-HP:0001250']
+    corpus_sim = CorpusSim(ProfileCorpus(closure_index, profiles))
+
+    def vector(pheno_profile):
+        positive = owl_utils.get_profile_closure(
+            [pheno for pheno in pheno_profile if not pheno.startswith('-')], hpo, root)
+        negative = owl_utils.get_profile_closure(
+            [pheno[1:] for pheno in pheno_profile if pheno.startswith('-')], hpo, root,
+            negative=True)
+        weight = (lambda term: ic_map[term]) if ic_weighted else (lambda term: 1)
+        return {**{term: weight(term) for term in positive},
+                **{'-' + term: weight(term) * negative_weight for term in negative}}
+
+    query = vector(profile)
+    expected = []
+    for disease_profile in profiles.values():
+        disease = vector(disease_profile)
+        dot_product = sum(query[term] * disease[term] for term in query.keys() & disease.keys())
+        expected.append(dot_product / (
+            np.sqrt(sum(np.square(list(query.values()))))
+            * np.sqrt(sum(np.square(list(disease.values()))))))
+        assert sem_sim.cosine_sim(profile, disease_profile, ic_weighted, negative_weight) \
+            == pytest.approx(expected[-1])
+
+    assert corpus_sim.cosine_scores(profile, ic_weighted, negative_weight) \
+        == pytest.approx(expected)
+    assert corpus_sim.cosine_scores(profile, ic_weighted, negative_weight, indices=[8, 2]) \
+        == pytest.approx([expected[8], expected[2]])
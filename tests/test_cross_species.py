@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.cross_species import CrossSpeciesTable, CrossSpeciesSim
+from phenom.similarity.semantic_sim import SemanticSim, PairwiseSim
+
+root = "HP:0000118"
+
+
+@pytest.fixture(scope='module')
+def species(closures, ic_map, annotations):
+    """
+    Stand in for two species, splitting the terms of the mini ontology
+    """
+    closure_index = ClosureIndex(closures, ic_map)
+    query_terms = set(closure_index.terms[0::2])
+    target_terms = set(closure_index.terms[1::2])
+    table = CrossSpeciesTable.from_closure_index(closure_index, query_terms, target_terms)
+    queries = [profile & query_terms for profile in annotations.values()]
+    models = {disease: profile & target_terms for disease, profile in annotations.items()}
+    return closure_index, table, [query for query in queries if query], \
+        {model: profile for model, profile in models.items() if profile}
+
+
+def test_table(species, tmp_path):
+    closure_index, table, queries, models = species
+    mica, _ = closure_index.pairwise_mica_jaccard(
+        closure_index.encode(table.query_terms), closure_index.encode(table.target_terms))
+    assert table.table(PairwiseSim.IC) == pytest.approx(mica)
+    assert table.table(PairwiseSim.GEOMETRIC).dtype == np.float32
+    assert table.optimal_scores(table.query_terms[:2], PairwiseSim.IC) \
+        == pytest.approx(mica.max(axis=1)[:2])
+
+    table.save(str(tmp_path / 'table.npz'))
+    loaded = CrossSpeciesTable.load(str(tmp_path / 'table.npz'))
+    assert loaded.query_terms == table.query_terms
+    assert loaded.target_terms == table.target_terms
+    assert (loaded.mica == table.mica).all()
+
+    with pytest.raises(KeyError):
+        table.is_query_profile([table.query_terms[0], table.target_terms[0]])
+
+
+@pytest.mark.parametrize("is_symmetric", [False, True])
+@pytest.mark.parametrize("sim_measure", ['geometric', 'ic'])
+def test_phenodigm_scores(hpo, ic_map, species, is_symmetric, sim_measure):
+    closure_index, table, queries, models = species
+    sem_sim = SemanticSim(hpo, root, ic_map, cross_species_table=table)
+    cross_species_sim = CrossSpeciesSim(table, models)
+    for query in queries:
+        expected = [
+            sem_sim.phenodigm_compare(query, model, is_symmetric, False, sim_measure)
+            for model in models.values()
+        ]
+        assert cross_species_sim.phenodigm_scores(query, is_symmetric, sim_measure) \
+            == pytest.approx(expected)
+        if is_symmetric:
+            model = next(iter(models.values()))
+            assert sem_sim.phenodigm_compare(model, query, True, False, sim_measure) \
+                == pytest.approx(expected[0])
+
+
+def test_requires_table(hpo, ic_map):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    with pytest.raises(NotImplementedError):
+        sem_sim.phenodigm_compare(['HP:0000252'], ['HP:0001250'], is_same_species=False)
@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.search import SearchIndex
+from phenom.similarity.embedding import ProfileEmbedding, EmbeddingIndex
+
+root = "HP:0000118"
+
+query_profiles = [
+    ['HP:0000252', 'HP:0001250'],
+    ['HP:0000316', 'HP:0000505', 'HP:0004322', 'HP:0001249'],
+    ['HP:0002069'],
+    ['HP:0000118', 'HP:0001548', '-HP:0000478']
+]
+
+
+@pytest.mark.parametrize("method", ['svd', 'random'])
+def test_embedding(corpus, method):
+    embedding = ProfileEmbedding(corpus, dimensions=4, method=method)
+    assert embedding.embeddings.shape == (len(corpus), 4)
+    assert np.linalg.norm(embedding.embeddings, axis=1) == pytest.approx(1)
+    for index in range(len(corpus)):
+        profile = corpus.closure_index.decode(corpus.profile(index))
+        assert embedding.embed(profile) == pytest.approx(embedding.embeddings[index])
+
+    # dimensions are capped by the rank of the corpus
+    assert ProfileEmbedding(corpus, dimensions=64).dimensions == len(corpus) - 1
+
+
+def test_random_projection_cosine(hpo, ic_map, corpus):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    embedding = ProfileEmbedding(corpus, dimensions=2048, method='random')
+    profiles = [corpus.closure_index.decode(corpus.profile(index))
+                for index in range(len(corpus))]
+    for profile in query_profiles[:3]:
+        expected = [sem_sim.cosine_sim(profile, other, ic_weighted=True) for other in profiles]
+        estimates = embedding.embeddings @ embedding.embed(profile)
+        assert np.abs(estimates - expected).max() < .1
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+@pytest.mark.parametrize("metric", ['phenodigm', 'sim_gic'])
+def test_exhaustive_top_k(corpus, profile, metric):
+    corpus_sim = CorpusSim(corpus)
+    index = EmbeddingIndex(ProfileEmbedding(corpus, dimensions=4), corpus_sim, num_lists=3)
+    assert sorted(index.members.tolist()) == list(range(len(corpus)))
+
+    expected = SearchIndex(corpus_sim).top_k(profile, 3, metric)
+    results = index.top_k(profile, 3, metric, num_probes=3, shortlist=len(corpus))
+    assert [profile_id for profile_id, _ in results] == [profile_id for profile_id, _ in expected]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+
+def test_shortlist(corpus):
+    index = EmbeddingIndex(ProfileEmbedding(corpus, dimensions=4), num_lists=2)
+    profile = query_profiles[1]
+    candidates = index.candidates(profile, num_probes=1, shortlist=2)
+    assert len(candidates) <= 2
+    scores = dict(zip(corpus.ids, index.corpus_sim.phenodigm_scores(profile)))
+    for profile_id, score in index.top_k(profile, 5, num_probes=1, shortlist=2):
+        assert profile_id in [corpus.ids[candidate] for candidate in candidates]
+        assert score == pytest.approx(scores[profile_id])
+
+
+def test_query_terms(corpus):
+    index = EmbeddingIndex(ProfileEmbedding(corpus, dimensions=4), num_lists=2)
+    assert index.top_k(['-HP:0000478']) == []
+    assert index.top_k([]) == []
+    assert not index.embedding.embed(['-HP:0000478']).any()
+    with pytest.raises(KeyError):
+        index.top_k(['HP:0000252', 'HP:9999999'])
@@ -0,0 +1,31 @@
+import pytest
+from phenom.utils import owl_utils
+from phenom.similarity.group_closure import GroupClosure
+from phenom.similarity.semantic_sim import SemanticSim
+
+root = "HP:0000118"
+
+
+def test_group_closure(hpo, ic_map, annotations):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    profiles = list(annotations.values())
+    closures = [owl_utils.get_profile_closure(profile, hpo, root) for profile in profiles]
+
+    group = sem_sim.group_closure(profiles[:2])
+    other = sem_sim.group_closure().add(profiles[2]).add(
+        sem_sim.profile_bitset(profiles[3]))
+    group.merge(other).merge(sem_sim.group_closure())
+
+    intersection = set.intersection(*closures[:4])
+    union = set.union(*closures[:4])
+    assert len(group) == 4
+    assert sem_sim.term_index.decode(group.intersection) == sorted(intersection)
+    assert sem_sim.term_index.decode(group.union) == sorted(union)
+    assert group.jaccard() == len(intersection) / len(union)
+    assert group.sim_gic() == pytest.approx(
+        sum(ic_map[term] for term in intersection) / sum(ic_map[term] for term in union))
+
+
+def test_group_closure_requires_closure(ic_map):
+    with pytest.raises(ValueError):
+        GroupClosure(None).add(['HP:0000118'])
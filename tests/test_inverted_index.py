@@ -0,0 +1,42 @@
+import pytest
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.inverted_index import InvertedIndex
+from phenom.utils import owl_utils
+
+root = "HP:0000118"
+
+
+def test_postings(hpo, corpus, annotations):
+    inverted_index = InvertedIndex.from_corpus(corpus)
+    closure_index = corpus.closure_index
+    profile_closures = {
+        disease: owl_utils.get_profile_closure(profile, hpo, root)
+        for disease, profile in annotations.items()
+    }
+    for term_id, term in enumerate(closure_index.terms):
+        expected = {disease for disease, closure in profile_closures.items()
+                    if term in closure}
+        assert set(inverted_index.decode(inverted_index.term_postings(term_id))) == expected
+        assert inverted_index.counts[term_id] == len(expected)
+
+    terms = closure_index.encode(['HP:0000707', 'HP:0000478'])
+    assert set(inverted_index.decode(inverted_index.intersection(terms))) == {
+        disease for disease, closure in profile_closures.items()
+        if {'HP:0000707', 'HP:0000478'} <= closure}
+    assert set(inverted_index.decode(inverted_index.union(terms))) == {
+        disease for disease, closure in profile_closures.items()
+        if {'HP:0000707', 'HP:0000478'} & closure}
+
+
+def test_save_load(tmp_path, corpus):
+    inverted_index = InvertedIndex.from_corpus(corpus)
+    path = str(tmp_path / 'index.npz')
+    inverted_index.save(path)
+    loaded = InvertedIndex.load(path, corpus.closure_index)
+    assert loaded.ids == inverted_index.ids
+    assert (loaded.indptr == inverted_index.indptr).all()
+    assert (loaded.postings == inverted_index.postings).all()
+
+    other_index = ClosureIndex({'HP:0000001': {'HP:0000001'}})
+    with pytest.raises(ValueError):
+        InvertedIndex.load(path, other_index)
@@ -0,0 +1,39 @@
+import pytest
+import numpy as np
+from phenom.math import matrix
+
+query_matrix = [
+    [1.0, 4.5, 2.0],
+    [3.0, 0.5, 2.5]
+]
+
+
+def test_list_scores():
+    assert matrix.max_score(query_matrix) == 4.5
+    assert matrix.bma_score(query_matrix) == pytest.approx((4.5 + 3.0) / 2)
+    assert matrix.sym_bma_score(query_matrix) == pytest.approx(
+        (4.5 + 3.0 + 3.0 + 4.5 + 2.5) / 5)
+    assert matrix.best_min_avg(query_matrix) == pytest.approx((1.0 + 0.5) / 2)
+    assert matrix.avg_score(query_matrix) == pytest.approx(13.5 / 6)
+    assert matrix.flip_matrix(query_matrix).tolist() == [
+        [1.0, 3.0], [4.5, 0.5], [2.0, 2.5]]
+
+
+def test_summary_and_stacks():
+    rng = np.random.default_rng(0)
+    stack = rng.random((5, 3, 4))
+    summary = matrix.summarize(stack)
+    for index, score_matrix in enumerate(stack):
+        single = matrix.summarize(score_matrix.tolist())
+        assert isinstance(single.max, float)
+        assert summary.max[index] == pytest.approx(matrix.max_score(score_matrix))
+        assert summary.bma[index] == pytest.approx(matrix.bma_score(score_matrix))
+        assert summary.sym_bma[index] == pytest.approx(single.sym_bma)
+        assert summary.avg[index] == pytest.approx(single.avg)
+        assert summary.best_min_avg[index] == pytest.approx(single.best_min_avg)
+
+    assert matrix.sym_bma_score(stack) == pytest.approx(
+        matrix.sym_bma_score(matrix.flip_matrix(stack)))
+
+    with pytest.raises(ValueError):
+        matrix.max_score([1.0, 2.0])
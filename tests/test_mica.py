@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+from phenom.similarity.mica import MicaEngine
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.semantic_dist import SemanticDist
+
+root = "HP:0000118"
+
+
+def test_pairwise_mica_jaccard(closure_index):
+    engine = MicaEngine(closure_index, cache_size=16, closure_cache_size=4)
+    term_ids = np.arange(len(closure_index))
+    mica, jaccard = engine.pairwise_mica_jaccard(term_ids, term_ids)
+    expected_mica, expected_jaccard = closure_index.pairwise_mica_jaccard(term_ids, term_ids)
+    assert mica == pytest.approx(expected_mica)
+    assert jaccard == pytest.approx(expected_jaccard)
+    assert len(engine.pairs) == 16
+    assert len(engine.intersections) == 16
+    assert len(engine.closures) == 4
+
+    # a pair is cached once whatever the order of its terms,
+    # intersection sizes are only computed for the jaccard index
+    engine = MicaEngine(closure_index)
+    engine.pairwise_mica_jaccard(term_ids, term_ids, with_jaccard=False)
+    assert len(engine.pairs) == len(term_ids) * (len(term_ids) + 1) // 2
+    assert engine.pairs.stats()['misses'] == len(engine.pairs)
+    assert len(engine.intersections) == 0
+
+    ancestors = engine.ancestors(term_ids[-1])
+    assert (np.diff(closure_index.ic[ancestors]) <= 0).all()
+    assert set(ancestors) == set(closure_index.ancestors[term_ids[-1]].indices)
+
+
+def test_semantic_sim_backend(hpo, ic_map, annotations, closure_index):
+    engine = MicaEngine(closure_index)
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    engine_sim = SemanticSim(hpo, root, ic_map, mica_engine=engine)
+    sem_dist = SemanticDist(hpo, root, ic_map)
+    engine_dist = SemanticDist(hpo, root, ic_map, mica_engine=engine)
+    profiles = list(annotations.values())
+    for profile_a in profiles:
+        for profile_b in profiles:
+            for sim_measure in ['geometric', 'ic']:
+                assert engine_sim.phenodigm_compare(
+                    profile_a, profile_b, True, sim_measure=sim_measure) == pytest.approx(
+                    sem_sim.phenodigm_compare(profile_a, profile_b, True, sim_measure=sim_measure))
+            for distance_measure in ['euclidean', 'jin_conrath']:
+                assert engine_dist.euclidean_matrix(
+                    profile_a, profile_b, distance_measure) == pytest.approx(
+                    sem_dist.euclidean_matrix(profile_a, profile_b, distance_measure))
+    assert engine.pairs.hit_rate() > 0
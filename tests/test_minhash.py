@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.minhash import MinHashIndex, lsh_bands, candidate_probability
+
+root = "HP:0000118"
+
+query_profiles = [
+    ['HP:0000252', 'HP:0001250'],
+    ['HP:0000316', 'HP:0000505', 'HP:0004322', 'HP:0001249'],
+    ['HP:0002069'],
+    ['HP:0000118', 'HP:0001548', '-HP:0000478']
+]
+
+
+def exact_jaccard(hpo, ic_map, corpus, profile):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    return [sem_sim.jaccard_sim(profile, corpus.closure_index.decode(corpus.profile(index)))
+            for index in range(len(corpus))]
+
+
+def test_lsh_bands(corpus):
+    for threshold in [.3, .5, .8]:
+        bands = lsh_bands(128, threshold)
+        assert 128 % bands == 0
+        assert (1 / bands) ** (bands / 128) <= threshold
+        assert candidate_probability(threshold, bands, 128 // bands) > .8
+    assert candidate_probability(.5, 128, 1) == pytest.approx(1)
+    with pytest.raises(ValueError):
+        MinHashIndex(corpus, num_hashes=128, bands=3)
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+@pytest.mark.parametrize("threshold", [.2, .5])
+def test_query(hpo, ic_map, corpus, profile, threshold):
+    expected = exact_jaccard(hpo, ic_map, corpus, profile)
+    expected = sorted([(corpus.ids[index], score) for index, score in enumerate(expected)
+                       if score >= threshold], key=lambda result: -result[1])
+
+    # one hash per band finds every pair sharing any closure term
+    index = MinHashIndex(corpus, threshold, num_hashes=64, bands=64)
+    results = index.query(profile)
+    assert [profile_id for profile_id, _ in results] == [profile_id for profile_id, _ in expected]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    assert dict(index.query(profile, rerank=sem_sim.jaccard_sim)) == pytest.approx(dict(results))
+    assert index.query(profile, k=1) == results[:1]
+
+    # fewer bands only lose results, never add or misscore them
+    banded = dict(MinHashIndex(corpus, threshold).query(profile))
+    assert banded == pytest.approx({profile_id: dict(expected)[profile_id]
+                                    for profile_id in banded})
+
+
+def test_similar_pairs(hpo, ic_map, corpus):
+    index = MinHashIndex(corpus, .3, num_hashes=64, bands=64)
+    expected = [
+        (index_a, index_b, score)
+        for index_a in range(len(corpus))
+        for index_b, score in enumerate(exact_jaccard(
+            hpo, ic_map, corpus, corpus.closure_index.decode(corpus.profile(index_a))))
+        if index_a < index_b and score >= .3
+    ]
+    pairs = list(index.similar_pairs())
+    assert len(pairs) > 0
+    assert [pair[:2] for pair in pairs] == [pair[:2] for pair in expected]
+    assert [pair[2] for pair in pairs] == pytest.approx([pair[2] for pair in expected])
+
+
+def test_estimate(hpo, ic_map, corpus):
+    index = MinHashIndex(corpus, num_hashes=1024)
+    for profile in query_profiles:
+        expected = exact_jaccard(hpo, ic_map, corpus, profile)
+        estimates = index.estimate(profile, range(len(corpus)))
+        assert np.abs(estimates - expected).max() < .1
@@ -0,0 +1,123 @@
+import pytest
+import numpy as np
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.corpus_dist import CorpusDist
+from phenom.model.synthetic import SyntheticProfile
+from phenom.utils.multilabel import create_multilabel_confusion, \
+    encode_synthetic_profiles, publish_multilabel_inputs, multilabel_confusion_worker
+from phenom.utils.pool import SharedArrays, run_workers, stream_workers, with_prefix
+from phenom.make_matrix import condensed_row, get_matrix_distances, get_neighbor_graph, \
+    row_blocks
+import multiprocessing
+
+root = "HP:0000118"
+
+
+def add_chunk(arrays, chunk, lock):
+    with lock:
+        arrays['total'][...] += arrays['values'][chunk].sum()
+
+
+def fail(arrays, chunk, *args):
+    raise ValueError
+
+
+def emit_chunk(arrays, chunk, emit, batch_size):
+    for start in range(chunk.start, chunk.stop, batch_size):
+        emit(np.arange(start, min(start + batch_size, chunk.stop)))
+
+
+def test_shared_arrays(corpus):
+    arrays = {
+        **with_prefix('index', corpus.closure_index.to_arrays()),
+        **with_prefix('corpus', corpus.to_arrays())
+    }
+    with SharedArrays(arrays) as shared_arrays:
+        attached = SharedArrays.attach(shared_arrays.handles)
+        closure_index = ClosureIndex.from_arrays(attached.group('index'))
+        assert (closure_index.ancestors != corpus.closure_index.ancestors).nnz == 0
+        assert (closure_index.descendants != corpus.closure_index.descendants).nnz == 0
+        copy = ProfileCorpus.from_arrays(closure_index, attached.group('corpus'), corpus.ids)
+        assert (copy.terms == corpus.terms).all()
+        assert (copy.sizes == corpus.sizes).all()
+        del closure_index, copy
+        attached.close()
+
+
+def test_run_workers():
+    with SharedArrays({'values': np.arange(100), 'total': np.zeros(1, dtype=np.int64)}) \
+            as shared_arrays:
+        run_workers(add_chunk, [slice(i, 100, 3) for i in range(3)],
+                    shared_arrays, (multiprocessing.Lock(),))
+        assert shared_arrays['total'][0] == sum(range(100))
+
+        with pytest.raises(RuntimeError):
+            run_workers(fail, [0, 1], shared_arrays)
+
+
+def test_stream_workers():
+    batches = list(stream_workers(
+        emit_chunk, [range(0, 50), range(50, 100)], args=(7,)))
+    assert len(batches) == 16
+    assert sorted(np.concatenate(batches).tolist()) == list(range(100))
+
+    with pytest.raises(RuntimeError):
+        list(stream_workers(fail, [0, 1], timeout=0.1))
+
+
+def test_streamed_matrix(corpus):
+    corpus_dist = CorpusDist(corpus)
+    size = len(corpus)
+    distances = np.zeros(size * (size - 1) // 2)
+    arrays = {
+        **with_prefix('index', corpus.closure_index.to_arrays()),
+        **with_prefix('corpus', corpus.to_arrays()),
+        'table': corpus_dist.distance_table('jin_conrath')
+    }
+    with SharedArrays(arrays) as shared_arrays:
+        blocks = row_blocks(size - 1, block_size=2)
+        for offset, block in stream_workers(
+                get_matrix_distances, [blocks[i::3] for i in range(3)],
+                shared_arrays, ('jin_conrath',)):
+            distances[offset:offset + len(block)] = block
+
+    for index in range(size):
+        expected = corpus_dist.euclidean_matrix_id_distances(
+            corpus.profile(index), 'jin_conrath')
+        expected[index] = 0
+        assert condensed_row(distances, index, size) == pytest.approx(expected)
+
+
+def test_multilabel_workers(corpus):
+    corpus_sim = CorpusSim(corpus)
+    patients = [
+        SyntheticProfile(str(index), set(profile), disease)
+        for index, (disease, profile) in enumerate(annotations_items(corpus))
+    ]
+    thresholds = np.flip(np.append(np.arange(0, 100, 10.0), 100))
+    expected = create_multilabel_confusion(patients, corpus_sim, thresholds)
+
+    encoded, labels = encode_synthetic_profiles(patients, corpus)
+    with publish_multilabel_inputs(encoded, labels, corpus, thresholds) as shared_arrays:
+        run_workers(multilabel_confusion_worker,
+                    [range(i, len(patients), 3) for i in range(3)],
+                    shared_arrays, (multiprocessing.Lock(),))
+        assert (shared_arrays['confusion'] == expected).all()
+
+
+def annotations_items(corpus):
+    return [
+        (disease, corpus.closure_index.decode(corpus.profile(index)))
+        for index, disease in enumerate(corpus.ids)
+    ]
+
+
+@pytest.mark.parametrize("distance_measure", [None, 'jin_conrath'])
+def test_streamed_neighbor_graph(corpus, distance_measure):
+    corpus_dist = CorpusDist(corpus)
+    expected = corpus_dist.neighbor_graph(distance_measure, k=3, radius=2.5)
+    graph = get_neighbor_graph(corpus_dist, distance_measure, 3, 2.5, 3)
+    assert (graph != expected).nnz == 0
+    assert graph.nnz == expected.nnz
@@ -0,0 +1,66 @@
+import pytest
+from phenom import monarch
+from phenom.utils.cache import ResponseCache
+from unittest.mock import MagicMock, patch
+
+scigraph_response = {
+    'nodes': [{'id': 'HP:0001250', 'lbl': 'Seizure'}]
+}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    yield str(tmp_path / 'responses.sqlite')
+    monarch.configure_cache(None)
+
+
+def test_key_ignores_param_order():
+    key_a = ResponseCache.make_key('http://solr', {'q': '*:*', 'rows': 10})
+    key_b = ResponseCache.make_key('http://solr', {'rows': 10, 'q': '*:*'})
+    assert key_a == key_b
+
+
+def test_ttl_expiry(cache_path):
+    cache = ResponseCache(cache_path, ttl=60)
+    cache.set('http://solr', {'q': '*:*'}, {'a': 1})
+    assert cache.get('http://solr', {'q': '*:*'}) == {'a': 1}
+    with patch('phenom.utils.cache.time.time', MagicMock(return_value=1e12)):
+        assert cache.get('http://solr', {'q': '*:*'}) is None
+        cache.offline = True
+        # stale entries are still served offline
+        assert cache.get('http://solr', {'q': '*:*'}) == {'a': 1}
+
+
+def test_label_fetched_once(cache_path):
+    monarch.configure_cache(cache_path)
+    mock_get = MagicMock()
+    mock_get.return_value.json.return_value = scigraph_response
+    with patch.object(monarch.session, 'get', mock_get):
+        assert monarch.get_label('HP:0001250') == 'Seizure'
+        assert monarch.get_label('HP:0001250') == 'Seizure'
+    assert mock_get.call_count == 1
+
+    # responses persist across runs and can be used offline
+    monarch.configure_cache(cache_path, offline=True)
+    with patch.object(monarch.session, 'get', mock_get):
+        assert monarch.get_label('HP:0001250') == 'Seizure'
+        with pytest.raises(LookupError):
+            monarch.get_label('HP:0000118')
+    assert mock_get.call_count == 1
+
+
+def test_errors_not_cached(cache_path):
+    from requests import HTTPError
+    monarch.configure_cache(cache_path)
+    mock_get = MagicMock()
+    mock_get.return_value.raise_for_status.side_effect = HTTPError('429 Too Many Requests')
+    with patch.object(monarch.session, 'get', mock_get):
+        with pytest.raises(HTTPError):
+            monarch.get_label('HP:0001250')
+    assert monarch.response_cache.get(*mock_get.call_args[0], **mock_get.call_args[1]) is None
+
+    mock_get.return_value.raise_for_status.side_effect = None
+    mock_get.return_value.json.return_value = scigraph_response
+    with patch.object(monarch.session, 'get', mock_get):
+        assert monarch.get_label('HP:0001250') == 'Seizure'
+    assert mock_get.call_count == 2
@@ -0,0 +1,65 @@
+import pytest
+from phenom.utils.cache import LRUCache, ScoreCache
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.semantic_dist import SemanticDist
+
+root = "HP:0000118"
+
+
+def test_lru_eviction():
+    cache = LRUCache(max_size=2)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    assert cache.get_or_compute('a', lambda: None) == 1
+    cache.get_or_compute('c', lambda: 3)
+    # b was least recently used
+    assert len(cache) == 2
+    assert cache.get_or_compute('b', lambda: 4) == 4
+    assert cache.stats() == {'size': 2, 'hits': 1, 'misses': 4, 'hit_rate': 0.2}
+
+
+def test_cached_scores(hpo, ic_map, annotations):
+    cache = ScoreCache()
+    sem_sim = SemanticSim(hpo, root, ic_map, score_cache=cache)
+    uncached = SemanticSim(hpo, root, ic_map)
+    profile_a, profile_b = list(annotations.values())[:2]
+
+    score = sem_sim.phenodigm_compare(profile_a, profile_b, is_symmetric=True)
+    assert score == uncached.phenodigm_compare(profile_a, profile_b, is_symmetric=True)
+    # same profiles in another order, and reversed in symmetric mode
+    assert sem_sim.phenodigm_compare(
+        reversed(sorted(profile_b)), profile_a, True) == score
+    assert cache.hits == 1
+
+    # asymmetric and differently parameterized scores are distinct
+    assert sem_sim.phenodigm_compare(profile_b, profile_a) == \
+        pytest.approx(uncached.phenodigm_compare(profile_b, profile_a))
+    sem_sim.phenodigm_compare(profile_a, profile_b)
+    sem_sim.phenodigm_compare(profile_a, profile_b, sim_measure='ic')
+    assert cache.hits == 1
+    assert cache.misses == 4
+
+    sem_dist = SemanticDist(hpo, root, ic_map, score_cache=cache)
+    distance = sem_dist.euclidean_matrix(profile_a, profile_b)
+    assert sem_dist.euclidean_matrix(profile_b, profile_a) == distance
+    assert cache.hit_rate() == 2 / 7
+
+
+def test_closure_bitset_cache(hpo, ic_map, annotations):
+    from phenom.utils import owl_utils
+    profile_a, profile_b = list(annotations.values())[:2]
+    phenotypes = set(profile_a) | set(profile_b)
+    scores = []
+    for _ in range(3):
+        sem_sim = SemanticSim(hpo, root, ic_map)
+        scores.append(sem_sim.sim_gic(profile_a, profile_b))
+        # each instance caches the closure of each phenotype once
+        assert len(sem_sim._closure_bitsets) == len(phenotypes)
+        assert sem_sim.profile_bitset(profile_a) == owl_utils.get_profile_bitset(
+            profile_a, hpo, root, sem_sim.term_index)
+    assert scores == [scores[0]] * 3
+
+    sem_sim = SemanticSim(hpo, root, ic_map, closure_cache_size=1)
+    assert sem_sim.sim_gic(profile_a, profile_b) == scores[0]
+    assert len(sem_sim._closure_bitsets) == 1
+    assert not hasattr(owl_utils._get_closure_bitset, 'cache')
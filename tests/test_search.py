@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+from phenom.similarity.semantic_sim import SemanticSim
+from phenom.similarity.closure_index import ClosureIndex
+from phenom.similarity.corpus import ProfileCorpus
+from phenom.similarity.corpus_sim import CorpusSim
+from phenom.similarity.search import SearchIndex
+
+root = "HP:0000118"
+
+query_profiles = [
+    ['HP:0000252', 'HP:0001250'],
+    ['HP:0000316', 'HP:0000505', 'HP:0004322', 'HP:0001249'],
+    ['HP:0002069'],
+    ['HP:0000118', 'HP:0001548', '-HP:0000478']
+]
+
+
+@pytest.fixture(scope='module')
+def search_index(closures, ic_map, annotations):
+    corpus = ProfileCorpus(ClosureIndex(closures, ic_map), annotations)
+    return SearchIndex(CorpusSim(corpus), block_size=2)
+
+
+def ranked(ids, scores, k):
+    order = np.lexsort((np.arange(len(scores)), -np.asarray(scores)))[:k]
+    return [ids[index] for index in order], [scores[index] for index in order]
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+@pytest.mark.parametrize("k", [1, 3, 20])
+@pytest.mark.parametrize("is_symmetric", [False, True])
+def test_phenodigm_top_k(search_index, profile, k, is_symmetric):
+    corpus_sim = search_index.corpus_sim
+    scores = corpus_sim.phenodigm_scores(profile, is_symmetric=is_symmetric).tolist()
+    expected_ids, expected_scores = ranked(corpus_sim.corpus.ids, scores, k)
+
+    results = search_index.top_k(profile, k, 'phenodigm', is_symmetric=is_symmetric)
+    assert [profile_id for profile_id, _ in results] == expected_ids
+    assert [score for _, score in results] == pytest.approx(expected_scores)
+
+
+@pytest.mark.parametrize("metric", ['phenodigm', 'sim_gic'])
+def test_top_zero(search_index, metric):
+    assert search_index.top_k(query_profiles[0], 0, metric) == []
+    assert search_index.top_k(query_profiles[0], -1, metric) == []
+
+
+@pytest.mark.parametrize("metric", ['phenodigm', 'sim_gic'])
+def test_negated_query(search_index, metric):
+    assert search_index.top_k(['-HP:0000478'], 3, metric) == []
+    assert search_index.top_k([], 3, metric) == []
+
+
+@pytest.mark.parametrize("profile", query_profiles)
+def test_sim_gic_top_k(hpo, ic_map, search_index, profile):
+    sem_sim = SemanticSim(hpo, root, ic_map)
+    corpus = search_index.corpus
+    scores = [sem_sim.sim_gic(profile, corpus.closure_index.decode(corpus.profile(index)))
+              for index in range(len(corpus))]
+    results = search_index.top_k(profile, len(corpus), 'sim_gic')
+    assert dict(results) == pytest.approx(dict(zip(corpus.ids, scores)))
+    assert [score for _, score in results] == pytest.approx(sorted(scores, reverse=True))
@@ -0,0 +1,76 @@
+import pytest
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+from phenom import monarch
+
+# Fake solr index, 2,345 associations with a unique id field
+solr_docs = [
+    {'id': 'assoc:{:05d}'.format(index), 'subject': 'MONDO:{:07d}'.format(index)}
+    for index in range(2345)
+]
+
+
+class FakeSolrHandler(BaseHTTPRequestHandler):
+    """
+    Implements start/rows and cursorMark paging over solr_docs
+    """
+    requested_offsets = []
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        rows = int(params['rows'][0])
+        response = {'response': {'numFound': len(solr_docs)}}
+        if 'cursorMark' in params:
+            cursor = params['cursorMark'][0]
+            start = 0 if cursor == '*' else int(cursor)
+            next_cursor = min(start + rows, len(solr_docs))
+            response['nextCursorMark'] = \
+                cursor if next_cursor == start else str(next_cursor)
+        else:
+            start = int(params['start'][0])
+            FakeSolrHandler.requested_offsets.append(start)
+        response['response']['docs'] = solr_docs[start:start + rows]
+
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def fake_solr():
+    server = HTTPServer(('127.0.0.1', 0), FakeSolrHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}/solr/golr/select'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_offset_paging(fake_solr, workers):
+    FakeSolrHandler.requested_offsets = []
+    params = {'q': '*:*', 'rows': 100, 'fq': ['a:b', 'c:d']}
+    docs = list(monarch.get_solr_results(fake_solr, params, workers))
+    assert docs == solr_docs
+    assert sorted(FakeSolrHandler.requested_offsets) == list(range(0, 2345, 100))
+    assert 'start' not in params
+
+
+def test_offset_paging_with_start(fake_solr):
+    params = {'q': '*:*', 'rows': 1000, 'start': 500}
+    docs = list(monarch.get_solr_results(fake_solr, params))
+    assert docs == solr_docs[500:]
+
+
+def test_cursor_paging(fake_solr):
+    params = {'q': '*:*', 'rows': 100, 'start': 0}
+    docs = list(monarch.get_solr_cursor_results(fake_solr, params))
+    assert docs == solr_docs
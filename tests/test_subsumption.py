@@ -0,0 +1,64 @@
+from phenom.utils.bitset import TermIndex, pack_sets, popcount_words
+from phenom.utils.subsumption import subsumed_counts, stream_subsumed_counts
+import numpy as np
+import pytest
+
+
+def proportion_counts(subset, others):
+    counts = [0, 0, 0, 0]
+    for other in others:
+        proportion = len(subset & other) / len(subset) if subset else 0
+        counts[0] += proportion > .25
+        counts[1] += proportion > .50
+        counts[2] += proportion > .75
+        counts[3] += proportion == 1.0
+    return counts
+
+
+@pytest.fixture
+def profiles(closures, annotations):
+    return [set().union(*[closures[pheno] for pheno in phenos])
+            for phenos in annotations.values()]
+
+
+@pytest.fixture
+def vocabulary(profiles):
+    # a subset of the terms, including some unused by any profile
+    return sorted(set().union(*profiles))[::2] + ['HP:9999999']
+
+
+def test_popcount_words():
+    words = np.array([0, 1, 2**64 - 1, 0b1011], dtype=np.uint64)
+    assert popcount_words(words).tolist() == [0, 1, 64, 3]
+
+
+def test_subsumed_counts(profiles, vocabulary):
+    packed = pack_sets(profiles, TermIndex(vocabulary))
+    subsets = [profile & set(vocabulary) for profile in profiles]
+    expected = [proportion_counts(subset, subsets[:index] + subsets[index + 1:])
+                for index, subset in enumerate(subsets)]
+    assert subsumed_counts(packed).tolist() == expected
+    assert subsumed_counts(packed, 2, 5).tolist() == expected[2:5]
+
+
+def test_subsumed_counts_empty_profile():
+    packed = pack_sets([set(), {'a'}, {'a', 'b'}], TermIndex(['a', 'b']))
+    assert subsumed_counts(packed).tolist() == [
+        [0, 0, 0, 0],
+        [1, 1, 1, 1],
+        [1, 0, 0, 0]
+    ]
+
+
+def test_stream_subsumed_counts(profiles, vocabulary):
+    packed = {
+        'all': pack_sets(profiles, TermIndex(sorted(set().union(*profiles)))),
+        'some': pack_sets(profiles, TermIndex(vocabulary))
+    }
+    serial = list(stream_subsumed_counts(packed, block_size=3))
+    parallel = list(stream_subsumed_counts(packed, processes=2, block_size=3))
+    assert [row for row, _ in parallel] == list(range(len(profiles)))
+    for (row, expected), (_, counts) in zip(serial, parallel):
+        for name in packed:
+            assert expected[name].tolist() == subsumed_counts(packed[name])[row].tolist()
+            assert counts[name].tolist() == expected[name].tolist()